@@ -0,0 +1,108 @@
+"""
+Benchmark per-request CPU time of the pydantic, the fast-path and the binary request handling.
+
+All paths decode the same update, run the decision and encode the response,
+mirroring what /calculateControl/ and /calculateControlRaw/ (JSON or binary) do per request.
+
+Usage:
+    python -m benchmarks.bench_decode [--requests N]
+"""
+
+import argparse
+import json
+import os
+import time
+
+# Measure the codec, not the log sink
+os.environ.setdefault("STUDENTTASK_LOG_MODE", "off")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from studenttask.api_client import SimulatorUpdateData  # noqa: E402
+from studenttask.fast_codec import (  # noqa: E402
+    FastDecoder,
+    decode_update_binary,
+    encode_control_result,
+    encode_control_result_binary,
+    encode_update_binary,
+)
+from studenttask.StudentTask import StudentTask  # noqa: E402
+
+BODY = json.dumps(
+    {
+        "task": "4",
+        "matriculation_number": "11814638",
+        "upper_voltage_band": 253.0,
+        "lower_voltage_band": 207.0,
+        "upper_voltage_safety": 250.0,
+        "lower_voltage_safety": 210.0,
+        "min_step_position": -8,
+        "max_step_position": 8,
+        "nominal_voltage": 230.0,
+        "current_tapchanger_position": 0,
+        "tapchanger_voltage_factors": {str(p): 1.0 + p * 0.0125 for p in range(-8, 9)},
+        "current_rangecontrol_factor": 0.8,
+        "min_street_voltage": 214.3,
+        "max_street_voltage": 244.9,
+    }
+).encode()
+
+
+def bench_pydantic(student_task: StudentTask, requests: int) -> float:
+    """Validate with pydantic and encode through the FastAPI response path"""
+    start = time.process_time()
+    for _ in range(requests):
+        simulator = SimulatorUpdateData.model_validate_json(BODY)
+        result = student_task.calculate_control(simulator)
+        json.dumps(jsonable_encoder(result)).encode()
+    return time.process_time() - start
+
+
+def bench_fast(student_task: StudentTask, requests: int) -> float:
+    """Decode with the FastDecoder and encode from precomputed fragments"""
+    decoder = FastDecoder()
+    start = time.process_time()
+    for _ in range(requests):
+        simulator = decoder.decode(BODY)
+        result = student_task.calculate_control(simulator)
+        encode_control_result(result)
+    return time.process_time() - start
+
+
+def bench_binary(student_task: StudentTask, requests: int) -> float:
+    """Decode and encode the fixed binary layout"""
+    body = encode_update_binary(SimulatorUpdateData.model_validate_json(BODY))
+    start = time.process_time()
+    for _ in range(requests):
+        simulator = decode_update_binary(body)
+        result = student_task.calculate_control(simulator)
+        encode_control_result_binary(result)
+    return time.process_time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    student_task = StudentTask()
+    # Warm up caches (tap model, pydantic schema) before measuring
+    bench_pydantic(student_task, 100)
+    bench_fast(student_task, 100)
+    bench_binary(student_task, 100)
+
+    results = {
+        "pydantic": bench_pydantic(student_task, args.requests),
+        "fast": bench_fast(student_task, args.requests),
+        "binary": bench_binary(student_task, args.requests),
+    }
+    for name, seconds in results.items():
+        print(f"{name:>9}: {seconds / args.requests * 1e6:8.2f} us CPU/request")
+    for name in ("fast", "binary"):
+        print(f"{name:>9}: {results['pydantic'] / results[name]:8.2f}x speedup")
+    body = encode_update_binary(SimulatorUpdateData.model_validate_json(BODY))
+    print(f"    bytes: {len(BODY)} JSON, {len(body)} binary per update")
+
+
+if __name__ == "__main__":
+    main()
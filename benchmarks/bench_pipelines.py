@@ -0,0 +1,73 @@
+"""
+Benchmark the compiled decision pipeline of every task against the generic kernel.
+
+Both run the same randomized decisions; the kernel looks up the task flags
+per call, the pipeline has them compiled in.
+
+Usage:
+    python -m benchmarks.bench_pipelines [--decisions N]
+"""
+
+import argparse
+import random
+import time
+
+from studenttask.control import TASK_SETTINGS, decide
+from studenttask.pipelines import PipelineRegistry
+
+LIMITS = (253.0, 207.0, 250.0, 210.0)
+
+
+def make_inputs(decisions: int) -> list[tuple]:
+    """Draw (min voltage, max voltage, tap, range control factor, delta higher, delta lower) tuples"""
+    rng = random.Random(0)
+    inputs = []
+    for _ in range(decisions):
+        min_voltage = rng.uniform(200.0, 235.0)
+        inputs.append(
+            (
+                min_voltage,
+                min_voltage + rng.uniform(0.0, 30.0),
+                rng.randint(-8, 8),
+                rng.random(),
+                -rng.uniform(0.0, 6.0),
+                rng.uniform(0.0, 6.0),
+            )
+        )
+    return inputs
+
+
+def bench_decide(task: str, inputs: list[tuple]) -> float:
+    """Run the generic kernel"""
+    start = time.process_time()
+    for min_voltage, max_voltage, tap, factor, higher, lower in inputs:
+        decide(task, min_voltage, max_voltage, tap, -8, 8, *LIMITS, factor, higher, lower)
+    return time.process_time() - start
+
+
+def bench_pipeline(task: str, inputs: list[tuple]) -> float:
+    """Run the compiled pipeline of the task"""
+    pipeline = PipelineRegistry()[task]
+    start = time.process_time()
+    for min_voltage, max_voltage, tap, factor, higher, lower in inputs:
+        pipeline(min_voltage, max_voltage, tap, -8, 8, LIMITS, factor, higher, lower, None)
+    return time.process_time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--decisions", type=int, default=200000)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.decisions)
+    for task in sorted(TASK_SETTINGS):
+        kernel = bench_decide(task, inputs)
+        pipeline = bench_pipeline(task, inputs)
+        print(
+            f"task {task}: decide {kernel / args.decisions * 1e9:7.0f} ns, "
+            f"pipeline {pipeline / args.decisions * 1e9:7.0f} ns, {kernel / pipeline:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
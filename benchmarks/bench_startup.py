@@ -0,0 +1,70 @@
+"""
+Benchmark import and startup time of the core and the web service.
+
+Every measurement runs in a fresh interpreter, so module caches of earlier
+measurements do not hide import costs.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--max-core-ms MS]
+
+Exits with status 1 if importing studenttask.core takes longer than
+--max-core-ms (median), so it can guard the light import path in CI.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Statement timed in a fresh interpreter, printing milliseconds
+MEASUREMENTS: dict[str, str] = {
+    "import studenttask.core": "import studenttask.core",
+    "import studenttask.StudentTask": "import studenttask.StudentTask",
+    "StudentTask()": "studenttask.StudentTask.StudentTask()",
+    "StudentTask().app": "studenttask.StudentTask.StudentTask().app",
+}
+
+# Modules imported before timing a statement that is not an import itself
+SETUP: dict[str, str] = {
+    "StudentTask()": "import studenttask.StudentTask",
+    "StudentTask().app": "import studenttask.StudentTask",
+}
+
+SCRIPT = """
+import os, time
+os.environ["STUDENTTASK_LOG_MODE"] = "off"
+{setup}
+start = time.perf_counter()
+{statement}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure(name: str, runs: int) -> float:
+    """Median milliseconds of one statement over fresh interpreters"""
+    script = SCRIPT.format(setup=SETUP.get(name, ""), statement=MEASUREMENTS[name])
+    times = [
+        float(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout)
+        for _ in range(runs)
+    ]
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-core-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    results = {name: measure(name, args.runs) for name in MEASUREMENTS}
+    for name, milliseconds in results.items():
+        print(f"{name:>32}: {milliseconds:8.2f} ms")
+
+    core = results["import studenttask.core"]
+    if args.max_core_ms is not None and core > args.max_core_ms:
+        print(f"studenttask.core import took {core:.2f} ms, limit is {args.max_core_ms:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
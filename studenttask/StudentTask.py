@@ -3,13 +3,81 @@ Name: Michel Hadwiger
 Matriculation number: 11814638
 """
 
+import asyncio
+import json
 import os
+import secrets
+import struct
+from functools import partial
+from time import perf_counter, time
 
-import uvicorn
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
+from pydantic import ValidationError
 
-from .api_client import APIClient, SimulatorUpdateData
-from .eSteps import eSteps
+from .api_client import (
+    APIClient,
+    SessionConfigData,
+    SessionInfo,
+    SessionStepData,
+    SimulatorUpdateData,
+)
+from .control import (
+    RANGE_CONTROL_INCREASE_BUFFER,
+    RANGE_CONTROL_MODIFIER,
+    RANGE_CONTROL_WINDOW,
+    TASK_SETTINGS,
+    VIOLATION_LOWER,
+    VIOLATION_UPPER,
+    ControlDecision,
+)
+from .control_batch import STEP_BY_CODE, decide_batch
+from .decision_cache import DECISION_CACHE_RESOLUTION, DecisionCache
+from .deadline import (
+    MAX_IN_FLIGHT,
+    REQUEST_BUDGET,
+    AdmissionMiddleware,
+    fallback_decision,
+    request_deadline,
+)
+from .decision_log import configure_logging, get_structured_logger
+from .fast_codec import (
+    BINARY_CONTENT_TYPE,
+    FastDecoder,
+    decode_update_binary,
+    encode_control_result,
+    encode_control_result_binary,
+    validation_error_detail,
+    wants_binary,
+)
+from .fleet import DEFAULT_TRANSFORMER_ID, FleetRegistry, TransformerState
+from .metrics import ControlMetrics, StageTimedRoute
+from .pipelines import PipelineRegistry
+from .planner import TapPlanner
+from .profiling import PROFILE_INTERVAL, PROFILE_TOP_ALLOCATIONS, Profiler
+from .session import SESSION_CAPACITY, SessionRegistry
+from .shared_state import SharedStateTable, SharedTrends, shared_fleet
+from .snapshot import (
+    SNAPSHOT_INTERVAL,
+    SnapshotError,
+    SnapshotWriter,
+    encode_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+from .tap_model import TapModel, tap_model_for
+from .trace import TRACE_FILE_RECORDS, TraceWriter
+
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# Environment variable passing the shared state segment name to worker processes
+SHARED_STATE_ENV: str = "STUDENTTASK_SHARED_STATE"
 
 
 class StudentTask:
@@ -25,14 +93,71 @@ class StudentTask:
     STUDENTTASK_PORT: int = 7777
     SIMULATOR_PORT: int = 8000
 
+    # Seconds without heartbeat before re-registering with the simulator
+    HEARTBEAT_TIMEOUT: float = float(os.environ.get("HEARTBEAT_TIMEOUT", "30"))
+
+    # Number of uvicorn worker processes, state is shared through shared memory if > 1
+    WORKERS: int = int(os.environ.get("STUDENTTASK_WORKERS", "1"))
+    # Maximum number of transformers in the shared state table
+    SHARED_STATE_CAPACITY: int = int(os.environ.get("STUDENTTASK_SHARED_STATE_CAPACITY", "4096"))
+
+    # Time budget per request [s] (0 disables deadlines) and control requests handled at
+    # once before further ones are rejected with 503 (0 disables shedding)
+    REQUEST_BUDGET: float = float(os.environ.get("STUDENTTASK_REQUEST_BUDGET", str(REQUEST_BUDGET)))
+    MAX_IN_FLIGHT: int = int(os.environ.get("STUDENTTASK_MAX_IN_FLIGHT", str(MAX_IN_FLIGHT)))
+
+    # Frames buffered per streaming connection before reading from the socket pauses
+    STREAM_QUEUE_SIZE: int = int(os.environ.get("STUDENTTASK_STREAM_QUEUE_SIZE", "64"))
+
+    # Decisions cached per transformer (0 disables caching) and voltage quantization [V]
+    DECISION_CACHE_SIZE: int = int(os.environ.get("STUDENTTASK_DECISION_CACHE_SIZE", "0"))
+    DECISION_CACHE_RESOLUTION: float = float(
+        os.environ.get("STUDENTTASK_DECISION_CACHE_RESOLUTION", str(DECISION_CACHE_RESOLUTION))
+    )
+
+    # Maximum number of open control sessions
+    SESSION_CAPACITY: int = int(os.environ.get("STUDENTTASK_SESSION_CAPACITY", str(SESSION_CAPACITY)))
+
+    # Directory of the binary decision trace (unset disables tracing) and records per trace file
+    TRACE_DIR: str = os.environ.get("STUDENTTASK_TRACE_DIR", "")
+    TRACE_FILE_RECORDS: int = int(
+        os.environ.get("STUDENTTASK_TRACE_FILE_RECORDS", str(TRACE_FILE_RECORDS))
+    )
+
+    # Token guarding the admin endpoints such as /admin/profile/ (unset disables them)
+    ADMIN_TOKEN: str = os.environ.get("STUDENTTASK_ADMIN_TOKEN", "")
+
+    # Snapshot file of the controller state for warm restarts (unset disables snapshots) and
+    # seconds between snapshots
+    SNAPSHOT_PATH: str = os.environ.get("STUDENTTASK_SNAPSHOT_PATH", "")
+    SNAPSHOT_INTERVAL: float = float(os.environ.get("STUDENTTASK_SNAPSHOT_INTERVAL", str(SNAPSHOT_INTERVAL)))
+
+    # Forecast steps searched by the tap planner (0 keeps the one-step kernel decision)
+    PLANNER_HORIZON: int = int(os.environ.get("STUDENTTASK_PLANNER_HORIZON", "0"))
+
+    # Range control tuning, see studenttask.sweep for finding better values. RANGE_CONTROL_LIMITS
+    # "band" uses the voltage band in place of the safety limits, like the sweep's limit choice.
+    RANGE_CONTROL_MODIFIER: float = float(os.environ.get("RANGE_CONTROL_MODIFIER", str(RANGE_CONTROL_MODIFIER)))
+    RANGE_CONTROL_INCREASE_BUFFER: float = float(
+        os.environ.get("RANGE_CONTROL_INCREASE_BUFFER", str(RANGE_CONTROL_INCREASE_BUFFER))
+    )
+    RANGE_CONTROL_WINDOW: int = int(os.environ.get("RANGE_CONTROL_WINDOW", str(RANGE_CONTROL_WINDOW)))
+    RANGE_CONTROL_LIMITS: str = os.environ.get("RANGE_CONTROL_LIMITS", "safety")
+
     def __init__(self) -> None:
         """
         Initialize StudentTask with connection settings and API endpoints.
 
-        Sets up URLs for simulator and own service connections, initializes API client
-        and registers control calculation endpoint.
+        Sets up URLs for simulator and own service connections and initializes the API
+        client and controller state. Routes are registered when the app is first used.
         """
         logger.info("Initializing StudentTask")
+        logger.info(
+            "Name: Hadwiger, MatrNr: 11814638"
+        )
+
+        # One structured, sampled record per decision instead of free-text lines
+        self.structured_log = get_structured_logger()
 
         # Set up URLs for local connections, allowing override of simulator URL via environment variable
         if not (backend_url := os.environ.get("BACKEND_URL")):
@@ -62,13 +187,222 @@ class StudentTask:
         self.api_client = APIClient(
             self.backend_url, self.own_studenttask_url, self.TIMEOUT_DURATION
         )
-        self.app = self.api_client.get_app()
         logger.info("API client initialized")
 
-        # Register the calculate_control endpoint to handle POST requests
-        self.app.post("/calculateControl/")(self.calculate_control)
+        # Optional model-predictive planner replacing the one-step tap decision
+        self.planner = TapPlanner(self.PLANNER_HORIZON) if self.PLANNER_HORIZON > 0 else None
+
+        # Per-transformer state, keyed by transformer ID. Worker processes started by
+        # run() attach to the shared state table created by the parent process.
+        self.shared_state: SharedStateTable | None = None
+        if shared_state_name := os.environ.get(SHARED_STATE_ENV):
+            self._use_shared_state(SharedStateTable.attach(shared_state_name))
+        else:
+            self.fleet = FleetRegistry(partial(TransformerState, window_length=self.RANGE_CONTROL_WINDOW))
+
+        # Optional per-transformer decision caches, see DECISION_CACHE_SIZE
+        self.decision_caches: dict[str, DecisionCache] = {}
+
+        # IDs of the transformers registered with the simulator in fleet mode
+        self.transformer_ids = [
+            transformer_id.strip()
+            for transformer_id in os.environ.get("TRANSFORMER_IDS", "").split(",")
+            if transformer_id.strip()
+        ]
+
+        # Decision pipeline per task mode, compiled once; register further modes here
+        if self.RANGE_CONTROL_LIMITS not in ("safety", "band"):
+            raise ValueError(f"RANGE_CONTROL_LIMITS must be 'safety' or 'band', got '{self.RANGE_CONTROL_LIMITS}'")
+        task_settings = TASK_SETTINGS
+        if self.RANGE_CONTROL_LIMITS == "band":
+            task_settings = {task: (False, *flags[1:]) for task, flags in TASK_SETTINGS.items()}
+        self.pipelines = PipelineRegistry(
+            task_settings, self.RANGE_CONTROL_MODIFIER, self.RANGE_CONTROL_INCREASE_BUFFER
+        )
+
+        # Control sessions holding the static configuration of a run, see open_session
+        self.sessions = SessionRegistry(self.SESSION_CAPACITY, self.pipelines)
+
+        # Warm start from the last snapshot; with several workers the state lives in shared memory instead
+        self.snapshot_writer: SnapshotWriter | None = None
+        if self.SNAPSHOT_PATH and self.WORKERS <= 1 and self.shared_state is None:
+            self.restore_snapshot()
+            self.snapshot_writer = SnapshotWriter(self.save_snapshot, self.SNAPSHOT_INTERVAL)
+
+        # Optional memory-mapped trace of every decision, see studenttask.trace
+        self.trace = TraceWriter(self.TRACE_DIR, self.TRACE_FILE_RECORDS) if self.TRACE_DIR else None
+
+        self.fast_decoder = FastDecoder()
+        self.metrics = ControlMetrics()
+
+        # Idle until an admin requests a profile, see profile
+        self.profiler = Profiler(self.metrics.handled_requests)
+
+        # The web layer is only built when the app is first used, see app
+        self._app: FastAPI | None = None
+
+    @property
+    def app(self) -> FastAPI:
+        """
+        Get the FastAPI app, building it and registering all routes on first access.
+
+        Returns:
+            FastAPI: App serving the control endpoints
+        """
+        if self._app is None:
+            self._app = self._build_app()
+        return self._app
+
+    def _build_app(self) -> FastAPI:
+        app = self.api_client.get_app()
+
+        # Register the calculate_control endpoint to handle POST requests, timing decode and encode
+        timed_route = partial(StageTimedRoute, metrics=self.metrics)
+        app.router.add_api_route(
+            "/calculateControl/", self.calculate_control, methods=["POST"], route_class_override=timed_route
+        )
         logger.info("Registered calculateControl endpoint")
 
+        # Register the batch endpoint deciding a whole fleet per request
+        app.post("/calculateControlBatch/")(self.calculate_control_batch)
+        logger.info("Registered calculateControlBatch endpoint")
+
+        # Register the fleet endpoint routing updates by transformer ID
+        app.router.add_api_route(
+            "/fleet/{transformer_id}/calculateControl/",
+            self.calculate_transformer_control,
+            methods=["POST"],
+            route_class_override=timed_route,
+        )
+        logger.info("Registered fleet calculateControl endpoint")
+
+        # The simulator sends the heartbeats of a fleet transformer to its registered URL
+        app.get("/fleet/{transformer_id}/heartbeat/")(self.api_client.return_if_alive)
+        logger.info("Registered fleet heartbeat endpoint")
+
+        # Register the fast-path endpoints decoding raw bodies without per-request validation
+        app.post("/calculateControlRaw/")(self.calculate_control_raw)
+        app.post("/fleet/{transformer_id}/calculateControlRaw/")(
+            self.calculate_transformer_control_raw
+        )
+        logger.info("Registered calculateControlRaw endpoints")
+
+        # Register the session endpoints sending the static configuration only once per run
+        app.post("/session/")(self.open_session)
+        app.post("/session/{session_id}/calculateControl/")(self.calculate_session_control)
+        app.delete("/session/{session_id}/")(self.close_session)
+        logger.info("Registered session endpoints")
+
+        # Register the streaming endpoints keeping one WebSocket open for all steps
+        app.websocket("/ws/calculateControl/")(self.stream_control)
+        app.websocket("/fleet/{transformer_id}/ws/calculateControl/")(
+            self.stream_transformer_control
+        )
+        logger.info("Registered streaming calculateControl endpoints")
+
+        # Register the Prometheus metrics endpoint and count rejected requests
+        app.get("/metrics/")(self.get_metrics)
+        app.add_exception_handler(RequestValidationError, self.handle_validation_error)
+        logger.info("Registered metrics endpoint")
+
+        # Register the profiling endpoint only if a token guards it
+        if self.ADMIN_TOKEN:
+            app.post("/admin/profile/", response_model=None)(self.profile)
+            logger.info("Registered admin profile endpoint")
+
+        # Stamp request deadlines and shed control requests beyond MAX_IN_FLIGHT
+        app.add_middleware(
+            AdmissionMiddleware,
+            budget=self.REQUEST_BUDGET,
+            max_in_flight=self.MAX_IN_FLIGHT,
+            on_shed=self.metrics.shed_requests.inc,
+        )
+        return app
+
+    def decision_cache(self, transformer_id: str) -> DecisionCache | None:
+        """
+        Get the decision cache of a transformer, creating it on first access.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            DecisionCache | None: Cache of the transformer, None if caching is disabled
+        """
+        if self.DECISION_CACHE_SIZE <= 0:
+            return None
+        cache = self.decision_caches.get(transformer_id)
+        if cache is None:
+            cache = self.decision_caches[transformer_id] = DecisionCache(
+                self.DECISION_CACHE_SIZE, self.DECISION_CACHE_RESOLUTION
+            )
+        return cache
+
+    def restore_snapshot(self) -> bool:
+        """
+        Restore transformer states, tap models and decision caches from SNAPSHOT_PATH.
+
+        A missing, incompatible or corrupt snapshot is skipped and the controller starts cold.
+
+        Returns:
+            bool: True if the snapshot was restored
+        """
+        start = perf_counter()
+        try:
+            snapshot = read_snapshot(self.SNAPSHOT_PATH, self.RANGE_CONTROL_WINDOW)
+        except FileNotFoundError:
+            logger.info(f"No snapshot at {self.SNAPSHOT_PATH}, starting cold")
+            return False
+        except (OSError, SnapshotError) as error:
+            logger.warning(f"Ignoring snapshot {self.SNAPSHOT_PATH}: {error}")
+            return False
+
+        for state in snapshot.states:
+            self.fleet.add(state)
+        if self.DECISION_CACHE_SIZE > 0:
+            for transformer_id, cache in snapshot.caches.items():
+                # Keys quantized with another resolution would never match
+                if cache.tap_model is not None and cache.resolution == self.DECISION_CACHE_RESOLUTION:
+                    self.decision_cache(transformer_id).load(cache.tap_model, cache.entries)
+        logger.info(
+            f"Restored {len(snapshot.states)} transformer states from {self.SNAPSHOT_PATH} "
+            f"({time() - snapshot.created:.0f} s old) in {(perf_counter() - start) * 1e3:.1f} ms"
+        )
+        return True
+
+    def save_snapshot(self) -> None:
+        """
+        Write the transformer states, tap models and decision caches to SNAPSHOT_PATH.
+
+        Failures are logged, the service keeps running with the previous snapshot on disk.
+        States that could not be copied consistently are logged and left out.
+        """
+        try:
+            write_snapshot(
+                self.SNAPSHOT_PATH,
+                # list() copies the states at once, requests may add transformers meanwhile
+                encode_snapshot(
+                    list(self.fleet),
+                    self.decision_caches,
+                    self.RANGE_CONTROL_WINDOW,
+                    on_skip=lambda transformer_id: logger.warning(
+                        f"Left '{transformer_id}' out of the snapshot, it changed during every copy"
+                    ),
+                ),
+            )
+        except (OSError, ValueError, struct.error) as error:
+            # ValueError and struct.error: a state that does not fit the layout, e.g. a
+            # transformer ID or task longer than its length field
+            logger.warning(f"Writing snapshot {self.SNAPSHOT_PATH} failed: {error}")
+
+    def _use_shared_state(self, table: SharedStateTable) -> None:
+        self.shared_state = table
+        self.fleet = shared_fleet(table)
+        if self.planner is not None:
+            self.planner.trends = SharedTrends(table)
+        self.api_client.heartbeat_clock = table.heartbeat
+        logger.info(f"Using shared state table '{table.name}'")
+
     def calculate_control(self, simulator: SimulatorUpdateData) -> dict:
         """
         This is where you, the student, write your own algorithm for the tapchanger!
@@ -105,143 +439,586 @@ class StudentTask:
                 simulator.task                    - str
         """
 
-        logger.info(
-            "Name: Hadwiger, MatrNr: 11814638"
-        )
+        return self.calculate_transformer_control(DEFAULT_TRANSFORMER_ID, simulator)
 
-        # Variables needed to return at end of algorithm
-        is_spreading = False
-        new_pos = eSteps.STAY
-        range_control_factor = simulator.get_range_control_factor()
-
-        # ============================================
-        # TODO: WRITE YOUR OWN ALGORITHM HERE
-        # This can be deleted befor you start programming
-        task_nr = simulator.task
-
-        settings_dict = {
-            "1": (False, False, False),
-            "2": (True, False, False),
-            "3": (True, True, False),
-            "4": (True, True, True)
-        }
-        use_safety_limits, spreading_control, range_control = settings_dict[str(task_nr)]
+    def calculate_transformer_control(
+        self, transformer_id: str, simulator: SimulatorUpdateData
+    ) -> dict:
+        """
+        Calculate the control decision for one transformer of the fleet.
 
-        # Get current values
-        upper_hard = simulator.upper_voltage_band
-        lower_hard = simulator.lower_voltage_band
+        Looks up the transformer's state in the fleet registry, runs the decision
+        kernel and records the result in that state.
 
-        upper_safety = simulator.upper_voltage_safety
-        lower_safety = simulator.lower_voltage_safety
+        Args:
+            transformer_id: Identifier of the transformer the update belongs to
+            simulator: Update data sent by the simulator
 
-        min_street_voltage = simulator.get_min_street_voltage()
-        max_street_voltage = simulator.get_max_street_voltage()
+        Returns:
+            dict: Tap changer behavior, spreading flag and range control factor
 
-        current_tap_position = int(simulator.get_current_tapchanger_position())
-        min_step = simulator.min_step_position
-        max_step = simulator.max_step_position
+        Raises:
+            HTTPException: 422 if the task is unknown or the factor table is not a valid tap model
+        """
+        start = perf_counter()
+        return self._control(
+            transformer_id,
+            str(simulator.task),
+            valid_tap_model(simulator),
+            simulator.min_step_position,
+            simulator.max_step_position,
+            (
+                simulator.upper_voltage_band,
+                simulator.lower_voltage_band,
+                simulator.upper_voltage_safety,
+                simulator.lower_voltage_safety,
+            ),
+            int(simulator.get_current_tapchanger_position()),
+            simulator.get_range_control_factor(),
+            simulator.get_min_street_voltage(),
+            simulator.get_max_street_voltage(),
+            start,
+        )
 
-        # Default
-        txt_V_delta = None 
-        # tapchanger_voltage_factor = simulator.get_tapchanger_voltage_factor()
-        range_control_modifier = 0.1 # [V]
-        range_control_increase_buffer = 0.5 # [V]
+    def _control(
+        self,
+        transformer_id: str,
+        task_nr: str,
+        tap_model: TapModel,
+        min_step: int,
+        max_step: int,
+        limits: tuple[float, float, float, float],
+        current_tap_position: int,
+        range_control_factor: float,
+        min_street_voltage: float,
+        max_street_voltage: float,
+        start: float,
+    ) -> dict:
+        # Shared by the per-step and the session endpoints, start is the perf_counter() of the request
+        deadline = request_deadline.get()
+        if deadline is not None and start >= deadline:
+            # Waited too long for a worker thread, the simulator is about to give up
+            self.metrics.fallbacks.inc()
+            return fallback_decision(range_control_factor)
 
-        # Determine limits based on settings
-        if use_safety_limits:
-            upper_limit = upper_safety
-            lower_limit = lower_safety
-        else:
-            upper_limit = upper_hard
-            lower_limit = lower_hard 
+        # Looked up before the state changes, so a rejected update leaves no trace in the window
+        try:
+            pipeline = self.pipelines[task_nr]
+        except KeyError:
+            raise HTTPException(status_code=422, detail=f"Unknown task '{task_nr}'") from None
 
-        logger.info(f"Aufgabe {task_nr}")
-        logger.info(f"Safety limits: [{str(use_safety_limits)}] -> Limits: ({lower_limit:.2f}, {upper_limit:.2f})V")
-        logger.info(f"Spreading control: [{str(spreading_control)}]")
-        logger.info(f"Range control: [{str(range_control)}]")
+        state = self.fleet.get(transformer_id)
+        state.tap_model = tap_model
 
-        logger.info(f"Status: U_min = {min_street_voltage:.2f} V, U_max = {max_street_voltage:.2f} V @ Tap {current_tap_position}")
+        # The factor is only increased once U_max stayed clear of the upper limit for a whole window
+        state.observe(max_street_voltage)
+        range_increase_voltage = state.max_voltage_window.max
 
-        if min_street_voltage < lower_limit:
-            txt_limit = f"Lower Limit Violation: U_min ({min_street_voltage:.2f}V) < lower limit ({lower_limit:.2f} V). "
-            if (current_tap_position + 1 <= max_step):
-                new_pos = eSteps.SWITCHHIGHER
-                txt_switch = f"Switching [HIGHER]"
-            else:
-                new_pos = eSteps.STAY
-                txt_switch = f"Tap {current_tap_position} at max Tap ({max_step}). [STAY]"
-            if spreading_control:
-                V_delta = calc_V_delta(current_tap_position, current_tap_position + 1)
-                txt_V_delta = f"V_delta: {V_delta:.2f}V -> New max: {max_street_voltage - V_delta:.2f} V. "
-                if max_street_voltage - V_delta > upper_limit:
-                    is_spreading = True
-            
-        elif max_street_voltage > upper_limit:
-            txt_limit = f"Upper Limit Violation: U_max ({max_street_voltage:.2f}V) > upper limit ({upper_limit:.2f}V). "
-            if (current_tap_position - 1 >= min_step):
-                new_pos = eSteps.SWITCHLOWER
-                txt_switch = f"Switching [LOWER]"
-            else:
-                new_pos = eSteps.STAY
-                txt_switch = f"Tap {current_tap_position} at min Tap ({max_step}). [STAY]"
-            if spreading_control:
-                V_delta = calc_V_delta(current_tap_position, current_tap_position - 1)
-                txt_V_delta = f"V_delta: {V_delta:.2f}V -> New min: {min_street_voltage - V_delta:.2f}V. "
-                if min_street_voltage - V_delta < lower_limit:
-                    is_spreading = True
-        else:
-            new_pos = eSteps.STAY
-            txt_limit = f"No Limit Violation. "
-            txt_switch = f"[STAY]"
-        
-        logger.info(txt_limit + txt_switch)
-        if spreading_control: 
-            if txt_V_delta is not None:
-                logger.info(txt_V_delta)
-            if is_spreading:
-                new_pos = eSteps.STAY
-                logger.info(f"Spreading detected -> [STAY] at Tap {current_tap_position}")
-            elif new_pos != eSteps.STAY:
-                logger.info(f"No Spreading detected -> Proceed with switch [{txt_switch.split('[')[1]} Tap {current_tap_position}->{current_tap_position + (1 if new_pos == eSteps.SWITCHHIGHER else -1)}")
-            
-            if range_control:
-                txt_change = ""
-                range_control_factor_new = range_control_factor # default
-                if is_spreading:
-                    range_control_factor_new = range_control_factor - range_control_modifier
-                    range_control_factor_new = max(0.0, range_control_factor_new)
-                elif new_pos == eSteps.SWITCHHIGHER:
-                    txt_change = "(no increase due to Tap [HIGHER])"
-                elif max_street_voltage > (upper_limit - range_control_increase_buffer):
-                    txt_change = f"(no increase due to insufficient buffer ({range_control_increase_buffer:.2f} V) to upper limit)"
-                else:
-                    range_control_factor_new = range_control_factor + range_control_modifier
-                    range_control_factor_new = min(1.0, range_control_factor_new)
-                    
-                if range_control_factor_new != range_control_factor:
-                    txt_change = f"(changed by {range_control_factor_new - range_control_factor:.1f})"
-                    range_control_factor = range_control_factor_new
-                logger.info(f"Range control factor: {range_control_factor:.1f}" + " " + txt_change)
-                    
-
-        # ============================================
+        decision = None
+        cache = self.decision_cache(transformer_id)
+        if cache is not None:
+            key = cache.key(
+                task_nr,
+                current_tap_position,
+                min_step,
+                max_step,
+                *limits,
+                range_control_factor,
+                min_street_voltage,
+                max_street_voltage,
+                range_increase_voltage,
+            )
+            decision = cache.get(tap_model, key)
+            self.metrics.decision_cache[decision is not None].inc()
+        if decision is None:
+            delta_higher, delta_lower = tap_model.neighbour_deltas(current_tap_position, min_step, max_step)
+            decision = pipeline(
+                min_street_voltage,
+                max_street_voltage,
+                current_tap_position,
+                min_step,
+                max_step,
+                limits,
+                range_control_factor,
+                delta_higher,
+                delta_lower,
+                range_increase_voltage,
+            )
+            if cache is not None:
+                cache.put(key, decision)
+        if self.planner is not None:
+            decision = self.planner.plan(
+                transformer_id,
+                tap_model,
+                current_tap_position,
+                min_step,
+                max_step,
+                min_street_voltage,
+                max_street_voltage,
+                decision,
+                deadline,
+                range_control_factor,
+            )
+        state.record(decision, range_control_factor)
+        latency = perf_counter() - start
+        self.metrics.record_decision(
+            task_nr,
+            decision.tapchanger_behavior,
+            decision.spreading_detected,
+            range_control_factor,
+            decision.range_control_factor,
+            latency,
+        )
+        if self.trace is not None:
+            self.trace.append(
+                transformer_id,
+                task_nr,
+                current_tap_position,
+                min_street_voltage,
+                max_street_voltage,
+                range_control_factor,
+                decision,
+                latency,
+                time(),
+            )
+
+        # A slow log sink must not push the answer past the deadline
+        if (deadline is None or perf_counter() < deadline) and self.structured_log.should_log("decision"):
+            delta_higher, delta_lower = tap_model.neighbour_deltas(current_tap_position, min_step, max_step)
+            self.structured_log.write(
+                "decision",
+                {
+                    "transformer": transformer_id,
+                    "task": task_nr,
+                    "u_min": min_street_voltage,
+                    "u_max": max_street_voltage,
+                    "tap": current_tap_position,
+                    "lower_limit": decision.lower_limit,
+                    "upper_limit": decision.upper_limit,
+                    "violation": decision.violation,
+                    "steps_needed": steps_needed(
+                        tap_model, current_tap_position, min_street_voltage, max_street_voltage, decision
+                    ),
+                    "delta_higher": delta_higher,
+                    "delta_lower": delta_lower,
+                    "behavior": decision.tapchanger_behavior.name,
+                    "spreading": decision.spreading_detected,
+                    "range_control_factor": decision.range_control_factor,
+                },
+            )
 
         # Do NOT change this return.
         # Only change the value of the variables themself
-        # logger.info(
-        #     f"Final decisions - Position: {new_pos}, Spreading: {is_spreading}, Factor: {range_control_factor}"
-        # )
         return {
-            "tapchanger_behavior": new_pos,
-            "spreading_detected": is_spreading,
-            "range_control_factor": range_control_factor,
+            "tapchanger_behavior": decision.tapchanger_behavior,
+            "spreading_detected": decision.spreading_detected,
+            "range_control_factor": decision.range_control_factor,
         }
 
+    def open_session(self, config: SessionConfigData) -> SessionInfo:
+        """
+        Open a control session for the static configuration of a run.
+
+        Opening the same configuration again returns the same session ID.
+
+        Args:
+            config: Static fields of the run
+
+        Returns:
+            SessionInfo: ID to send the steps of the run to
+
+        Raises:
+            HTTPException: 422 if the task is unknown or the factor table is invalid
+        """
+        try:
+            session = self.sessions.open(config)
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error)) from error
+        logger.info(f"Opened session {session.session_id} for transformer {session.transformer_id}")
+        return SessionInfo(session_id=session.session_id)
+
+    def calculate_session_control(self, session_id: str, step: SessionStepData) -> dict:
+        """
+        Variant of calculate_control taking only the changing fields of a step.
+
+        Args:
+            session_id: ID returned by open_session
+            step: Measurements, tap position and range control factor of the step
+
+        Returns:
+            dict: Tap changer behavior, spreading flag and range control factor
+
+        Raises:
+            HTTPException: 404 if the session is unknown, the client should open it again
+        """
+        start = perf_counter()
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Unknown session '{session_id}'")
+        return self._control(
+            session.transformer_id,
+            session.task,
+            session.tap_model,
+            session.min_step,
+            session.max_step,
+            session.limits,
+            step.current_tapchanger_position,
+            step.current_rangecontrol_factor,
+            step.min_street_voltage,
+            step.max_street_voltage,
+            start,
+        )
+
+    def close_session(self, session_id: str) -> Response:
+        """
+        Close a control session.
+
+        Args:
+            session_id: ID returned by open_session
+
+        Returns:
+            Response: 204 if the session was closed, 404 if it was unknown
+        """
+        return Response(status_code=204 if self.sessions.close(session_id) else 404)
+
+    async def calculate_control_raw(self, request: Request) -> Response:
+        """
+        Fast-path variant of calculate_control working on the raw request body.
+
+        Args:
+            request: Request carrying a JSON or binary encoded SimulatorUpdateData
+
+        Returns:
+            Response: Control result encoded as negotiated, or 422 if the body is invalid
+        """
+        return await self.calculate_transformer_control_raw(DEFAULT_TRANSFORMER_ID, request)
+
+    async def calculate_transformer_control_raw(
+        self, transformer_id: str, request: Request
+    ) -> Response:
+        """
+        Fast-path variant of calculate_transformer_control working on the raw request body.
+
+        The body is decoded by the FastDecoder, which only validates strictly when the
+        message schema changes, and the result is encoded from precomputed fragments.
+        A body sent with Content-Type BINARY_CONTENT_TYPE is decoded from the binary
+        layout instead. The result is binary if the Accept header asks for it, or if
+        the body was binary and the Accept header does not ask for JSON.
+
+        Args:
+            transformer_id: Identifier of the transformer the update belongs to
+            request: Request carrying a JSON or binary encoded SimulatorUpdateData
+
+        Returns:
+            Response: Control result encoded as negotiated, or 422 if the body is invalid
+        """
+        binary_request = request.headers.get("content-type", "").startswith(BINARY_CONTENT_TYPE)
+        binary_response = wants_binary(request.headers.get("accept"), binary_request)
+        try:
+            content = self._decide_body(
+                transformer_id, await request.body(), binary_request, binary_response
+            )
+        except ValidationError as error:
+            return JSONResponse(
+                status_code=422, content={"detail": validation_error_detail(error)}
+            )
+        except ValueError as error:
+            # Malformed binary body
+            return JSONResponse(status_code=422, content={"detail": str(error)})
+        if binary_response:
+            return Response(content, media_type=BINARY_CONTENT_TYPE)
+        return Response(content, media_type="application/json")
+
+    def _decide_body(
+        self,
+        transformer_id: str,
+        body: bytes | str,
+        binary_request: bool = False,
+        binary_response: bool = False,
+    ) -> bytes:
+        """
+        Decode a raw update, decide and encode the result.
+
+        Args:
+            transformer_id: Identifier of the transformer the update belongs to
+            body: JSON or binary encoded SimulatorUpdateData
+            binary_request: Whether the body is in the binary layout
+            binary_response: Whether to encode the result in the binary layout
+
+        Returns:
+            bytes: Encoded control result
+
+        Raises:
+            ValidationError: If the JSON body is not a valid update
+            ValueError: If the binary body is malformed
+        """
+        start = perf_counter()
+        try:
+            if binary_request:
+                simulator = decode_update_binary(body)
+            else:
+                simulator = self.fast_decoder.decode(body)
+        except ValueError:
+            self.metrics.validation_failures.inc()
+            raise
+        self.metrics.decode_seconds.observe(perf_counter() - start)
+
+        result = self.calculate_transformer_control(transformer_id, simulator)
+
+        start = perf_counter()
+        if binary_response:
+            content = encode_control_result_binary(result)
+        else:
+            content = encode_control_result(result)
+        self.metrics.encode_seconds.observe(perf_counter() - start)
+        return content
+
+    async def stream_control(self, websocket: WebSocket) -> None:
+        """
+        Streaming variant of calculate_control over a persistent WebSocket.
+
+        Args:
+            websocket: Connection carrying measurement frames
+        """
+        await self.stream_transformer_control(DEFAULT_TRANSFORMER_ID, websocket)
+
+    async def stream_transformer_control(self, transformer_id: str, websocket: WebSocket) -> None:
+        """
+        Answer measurement frames of one transformer over a persistent WebSocket.
+
+        Every frame holds one JSON encoded SimulatorUpdateData, or several as
+        newline-delimited JSON. Each frame is answered by one frame with one decision
+        per line, in order, so the simulator may pipeline frames without waiting for
+        answers. Lines that cannot be decided (invalid updates, unknown tasks, invalid
+        factor tables, unexpected errors, which are logged) are answered with a
+        {"detail": ...} line instead and the connection stays open, empty frames are not answered. Each frame has REQUEST_BUDGET from its arrival,
+        lines decided after that get the fallback decision.
+        Frames are read into a bounded queue; once it is full, reading from the socket
+        pauses until decisions catch up, which pushes back on the sender.
+
+        Args:
+            transformer_id: Identifier of the transformer the updates belong to
+            websocket: Connection carrying measurement frames
+        """
+        await websocket.accept()
+        frames: asyncio.Queue[tuple[float, bytes | str] | None] = asyncio.Queue(self.STREAM_QUEUE_SIZE)
+        reader = asyncio.create_task(self._read_frames(websocket, frames))
+        try:
+            while (item := await frames.get()) is not None:
+                received, frame = item
+                if self.REQUEST_BUDGET > 0:
+                    request_deadline.set(received + self.REQUEST_BUDGET)
+                answers = []
+                for line in frame.splitlines():
+                    if not line.strip():
+                        continue
+                    # A bad line is answered with its error, the stream stays open for the next ones
+                    try:
+                        answers.append(self._decide_body(transformer_id, line))
+                        continue
+                    except ValidationError as error:
+                        detail = validation_error_detail(error)
+                    except HTTPException as error:
+                        detail = error.detail
+                    except KeyError as error:
+                        detail = f"Unknown task {error}"
+                    except ValueError as error:
+                        detail = str(error)
+                    except Exception as error:
+                        # A bug hit by one line must not end a session carrying many pipelined steps
+                        logger.exception(f"Deciding a streamed update of '{transformer_id}' failed")
+                        detail = f"Internal error: {type(error).__name__}"
+                    answers.append(json.dumps({"detail": detail}).encode())
+                if answers:
+                    await websocket.send_text(b"\n".join(answers).decode())
+        except WebSocketDisconnect:
+            # Client left while pipelined frames were still being answered
+            pass
+        finally:
+            reader.cancel()
+
+    @staticmethod
+    async def _read_frames(websocket: WebSocket, frames: asyncio.Queue) -> None:
+        # Runs until the client disconnects, then signals the end of the stream with None
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                await frames.put((perf_counter(), message.get("text") or message.get("bytes") or ""))
+        finally:
+            await frames.put(None)
+
+    def get_metrics(self) -> PlainTextResponse:
+        """
+        Handle metrics endpoint requests.
+
+        Returns:
+            PlainTextResponse: All metrics in the Prometheus text exposition format
+        """
+        return PlainTextResponse(
+            self.metrics.registry.exposition(), media_type=PROMETHEUS_CONTENT_TYPE
+        )
+
+    def profile(
+        self,
+        seconds: float = 10.0,
+        requests: int | None = None,
+        interval: float = PROFILE_INTERVAL,
+        top: int = PROFILE_TOP_ALLOCATIONS,
+        allocations: bool = True,
+        output: str = "json",
+        x_admin_token: str | None = Header(default=None),
+    ) -> dict | PlainTextResponse:
+        """
+        Handle admin profile requests, profiling the live service for a bounded window.
+
+        Args:
+            seconds: Length of the window [s]
+            requests: Stop earlier once this many control requests have been answered
+            interval: Seconds between stack samples
+            top: Number of source lines in the allocation report
+            allocations: Whether to track allocations with tracemalloc
+            output: "json" for the full report, "collapsed" for the flamegraph input only
+            x_admin_token: Must equal ADMIN_TOKEN
+
+        Returns:
+            dict | PlainTextResponse: Report of the window, see studenttask.profiling
+
+        Raises:
+            HTTPException: 403 if the token is wrong, 409 if a profile is already running,
+                422 if the bounds are invalid
+        """
+        if x_admin_token is None or not secrets.compare_digest(x_admin_token, self.ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+        if output not in ("json", "collapsed"):
+            raise HTTPException(status_code=422, detail=f"Unknown output '{output}'")
+        try:
+            report = self.profiler.profile(seconds, requests, interval, top, allocations)
+        except RuntimeError as error:
+            raise HTTPException(status_code=409, detail=str(error)) from error
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error)) from error
+        logger.info(f"Profiled {report.requests} requests in {report.duration:.1f} s")
+        if output == "collapsed":
+            return PlainTextResponse(report.collapsed)
+        return report.to_dict()
+
+    async def handle_validation_error(
+        self, request: Request, error: RequestValidationError
+    ) -> JSONResponse:
+        """
+        Count requests rejected by FastAPI's validation and return the default 422 response.
+
+        Args:
+            request: Rejected request
+            error: Validation error raised by FastAPI
+
+        Returns:
+            JSONResponse: FastAPI's default validation error response
+        """
+        self.metrics.validation_failures.inc()
+        return await request_validation_exception_handler(request, error)
+
+    def calculate_control_batch(self, simulators: list[SimulatorUpdateData]) -> list[dict]:
+        """
+        Calculate control decisions for many transformers in a single request.
+
+        Collects the measurements into arrays and runs the vectorized decision
+        kernel once for the whole fleet instead of one HTTP round trip per transformer.
+
+        Updates carry no transformer ID, so the batch is stateless: range control
+        compares the current U_max instead of the rolling window maximum, like a
+        RANGE_CONTROL_WINDOW of 1, and no fleet state is updated. Use the fleet
+        endpoints where the window should hold off factor increases.
+
+        Args:
+            simulators: One update per transformer
+
+        Returns:
+            list[dict]: One decision per update, in request order
+
+        Raises:
+            HTTPException: 422 if an update has a task the vectorized kernel does not know
+                or an invalid factor table
+        """
+        count = len(simulators)
+        self.structured_log.emit("batch", lambda: {"size": count})
+        if count == 0:
+            return []
+        if unknown := sorted({str(s.task) for s in simulators} - TASK_SETTINGS.keys()):
+            raise HTTPException(status_code=422, detail=f"Unknown task(s) {unknown}")
+        start = perf_counter()
+
+        taps = np.fromiter(
+            (int(s.get_current_tapchanger_position()) for s in simulators), np.int64, count
+        )
+        min_steps = np.fromiter((s.min_step_position for s in simulators), np.int64, count)
+        max_steps = np.fromiter((s.max_step_position for s in simulators), np.int64, count)
+        deltas = np.array(
+            [
+                valid_tap_model(s).neighbour_deltas(int(tap), int(lo), int(hi))
+                for s, tap, lo, hi in zip(simulators, taps, min_steps, max_steps)
+            ],
+            dtype=np.float64,
+        ).reshape(count, 2)
+
+        upper_band = np.fromiter((s.upper_voltage_band for s in simulators), np.float64, count)
+        lower_band = np.fromiter((s.lower_voltage_band for s in simulators), np.float64, count)
+        if self.RANGE_CONTROL_LIMITS == "band":
+            upper_safety, lower_safety = upper_band, lower_band
+        else:
+            upper_safety = np.fromiter((s.upper_voltage_safety for s in simulators), np.float64, count)
+            lower_safety = np.fromiter((s.lower_voltage_safety for s in simulators), np.float64, count)
+
+        result = decide_batch(
+            np.fromiter((int(s.task) for s in simulators), np.intp, count),
+            np.fromiter((s.get_min_street_voltage() for s in simulators), np.float64, count),
+            np.fromiter((s.get_max_street_voltage() for s in simulators), np.float64, count),
+            taps,
+            min_steps,
+            max_steps,
+            upper_band,
+            lower_band,
+            upper_safety,
+            lower_safety,
+            np.fromiter((s.get_range_control_factor() for s in simulators), np.float64, count),
+            deltas[:, 0],
+            deltas[:, 1],
+            self.RANGE_CONTROL_MODIFIER,
+            self.RANGE_CONTROL_INCREASE_BUFFER,
+        )
+        self.metrics.decision_seconds.observe(perf_counter() - start)
+        for code, decisions in enumerate(np.bincount(result.tapchanger_behavior, minlength=len(STEP_BY_CODE))):
+            self.metrics.decisions[code].inc(int(decisions))
+        self.metrics.spreading.inc(int(np.count_nonzero(result.spreading_detected)))
+
+        return [
+            {
+                "tapchanger_behavior": STEP_BY_CODE[int(step)],
+                "spreading_detected": bool(spreading),
+                "range_control_factor": float(factor),
+            }
+            for step, spreading, factor in zip(*result)
+        ]
+
+    def fleet_url(self, transformer_id: str) -> str:
+        """
+        Get the URL under which the simulator reaches a transformer of the fleet.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            str: Base URL of the transformer's fleet endpoints
+        """
+        return f"{self.own_studenttask_url.rstrip('/')}/fleet/{transformer_id}/"
+
     def run(self) -> None:
         """
         Start the StudentTask service.
 
-        Registers with simulator and starts FastAPI server to handle control requests.
+        Registers with simulator in the background and starts FastAPI server to handle control requests.
 
         Returns:
             None
@@ -250,24 +1027,111 @@ class StudentTask:
             None
         """
         logger.info("Starting StudentTask")
-        # Register this instance with the simulator before starting
-        self.api_client.register_with_simulator()
-        logger.info("Registered with simulator")
-
-        # Start the FastAPI server
-        logger.info(f"Starting FastAPI server on port {self.STUDENTTASK_PORT}")
-        uvicorn.run(self.app, host="0.0.0.0", port=self.STUDENTTASK_PORT)
-
-
-def calc_V_delta(tap_current, tap_new, V_nominal=230):
-    tapposition_dict = {
-        "2": 1.050,
-        "1": 1.020,
-        "0": 1.000,
-        "-1": 0.980,
-        "-2": 0.950}
-    V_delta = (tapposition_dict[str(tap_current)] - tapposition_dict[str(tap_new)]) * V_nominal
-    return V_delta
+        # Move log formatting and sink I/O off the request path
+        configure_logging(enqueue=True)
+        if self.WORKERS > 1 and self.shared_state is None:
+            # Created before the watchdog starts, heartbeats are answered by the workers
+            table = SharedStateTable(capacity=self.SHARED_STATE_CAPACITY, window_length=self.RANGE_CONTROL_WINDOW)
+            os.environ[SHARED_STATE_ENV] = table.name
+            self._use_shared_state(table)
+        # Register this instance (or every fleet transformer) with the simulator in the
+        # background, re-registering automatically if the simulator restarts and stops
+        # sending heartbeats
+        registration_urls = [self.fleet_url(t) for t in self.transformer_ids] or [None]
+        self.api_client.start_watchdog(registration_urls, self.HEARTBEAT_TIMEOUT)
+        logger.info(f"Registering {len(registration_urls)} URL(s) with simulator")
+
+        # Imported here, only serving needs the ASGI server
+        import uvicorn
+
+        if self.WORKERS <= 1:
+            # Start the FastAPI server, snapshotting the state periodically and on shutdown
+            if self.snapshot_writer is not None:
+                self.snapshot_writer.start()
+            logger.info(f"Starting FastAPI server on port {self.STUDENTTASK_PORT}")
+            try:
+                uvicorn.run(self.app, host="0.0.0.0", port=self.STUDENTTASK_PORT)
+            finally:
+                if self.snapshot_writer is not None:
+                    self.snapshot_writer.stop()
+            return
+
+        if self.SNAPSHOT_PATH:
+            logger.warning("Snapshots are only written with a single worker")
+
+        # Start the worker processes, each builds its own app through create_app and
+        # attaches to the shared state table created here
+        logger.info(f"Starting {self.WORKERS} FastAPI workers on port {self.STUDENTTASK_PORT}")
+        try:
+            uvicorn.run(
+                "studenttask.StudentTask:create_app",
+                factory=True,
+                host="0.0.0.0",
+                port=self.STUDENTTASK_PORT,
+                workers=self.WORKERS,
+            )
+        finally:
+            self.api_client.stop_watchdog()
+            self.shared_state.close()
+
+
+def valid_tap_model(simulator: SimulatorUpdateData) -> TapModel:
+    """
+    Get the TapModel of an update, rejecting invalid factor tables like a validation error.
+
+    Args:
+        simulator: Update data sent by the simulator
+
+    Returns:
+        TapModel: Shared immutable model for the update's factor table
+
+    Raises:
+        HTTPException: 422 if the factor table is not contiguous or not strictly monotonic
+    """
+    try:
+        return tap_model_for(simulator)
+    except (TypeError, ValueError) as error:
+        raise HTTPException(status_code=422, detail=str(error)) from error
+
+
+def steps_needed(
+    tap_model: TapModel,
+    tap_position: int,
+    min_voltage: float,
+    max_voltage: float,
+    decision: ControlDecision,
+) -> int | None:
+    """
+    Get the number of tap steps needed to clear the limit violation of a decision.
+
+    Args:
+        tap_model: Tap model of the transformer
+        tap_position: Current tap position
+        min_voltage: Minimum measured street voltage [V]
+        max_voltage: Maximum measured street voltage [V]
+        decision: Decision including the limits and the violation
+
+    Returns:
+        int | None: Signed number of steps, 0 without violation or None if not reachable
+    """
+    if not tap_model.has_position(tap_position):
+        return None
+    if decision.violation == VIOLATION_LOWER:
+        return tap_model.steps_for_shift(tap_position, decision.lower_limit - min_voltage)
+    if decision.violation == VIOLATION_UPPER:
+        return tap_model.steps_for_shift(tap_position, decision.upper_limit - max_voltage)
+    return 0
+
+
+def create_app() -> FastAPI:
+    """
+    Build the app of one worker process when serving with several uvicorn workers.
+
+    Returns:
+        FastAPI: App of a new StudentTask attached to the shared state table
+    """
+    configure_logging(enqueue=True)
+    return StudentTask().app
 
 
 def main() -> None:
@@ -1,8 +1,23 @@
+import random
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+
 import requests
 from fastapi import FastAPI
 from loguru import logger
 from pydantic import BaseModel, ConfigDict
 
+from .decision_log import get_structured_logger
+from .fleet import DEFAULT_TRANSFORMER_ID
+
+# Fields of the sampled heartbeat log record
+HEARTBEAT_FIELDS: dict = {"endpoint": "/heartbeat/"}
+
+# Size of the keep-alive connection pool to the simulator
+CONNECTION_POOL_SIZE: int = 16
+
 
 class SimulatorUpdateData(BaseModel):
     """
@@ -101,6 +116,55 @@ class SimulatorUpdateData(BaseModel):
         return self.max_street_voltage
 
 
+class SessionConfigData(BaseModel):
+    """
+    Pydantic model for the static configuration opening a control session.
+
+    Holds the fields of SimulatorUpdateData that stay constant during a run.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    # Transformer whose state the session's steps update
+    transformer_id: str = DEFAULT_TRANSFORMER_ID
+
+    task: str = ""
+    matriculation_number: str = ""
+    upper_voltage_band: float
+    lower_voltage_band: float
+    upper_voltage_safety: float
+    lower_voltage_safety: float
+    min_step_position: int
+    max_step_position: int
+    nominal_voltage: float
+    tapchanger_voltage_factors: dict[str, float]
+
+
+class SessionStepData(BaseModel):
+    """
+    Pydantic model for one step of a control session.
+
+    Holds the fields of SimulatorUpdateData that change from step to step.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    current_tapchanger_position: int
+    current_rangecontrol_factor: float
+    min_street_voltage: float
+    max_street_voltage: float
+
+
+class SessionInfo(BaseModel):
+    """
+    Model for the response opening a control session.
+
+    Contains the ID to send the session's steps to.
+    """
+
+    session_id: str
+
+
 class HeartbeatInfo(BaseModel):
     """
     Model for heartbeat response payload.
@@ -142,30 +206,160 @@ class APIClient:
         self.simulator_url = simulator_url
         self.studenttask_url = studenttask_url
         self.timeout = timeout
-        self.app = FastAPI()
+        self._app: FastAPI | None = None
         self.is_registered = False
+        self.structured_log = get_structured_logger()
 
-        # Register heartbeat endpoint
-        self.app.get("/heartbeat/")(self.return_if_alive)
+        # Pooled keep-alive session reused for all requests to the simulator
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=CONNECTION_POOL_SIZE, pool_maxsize=CONNECTION_POOL_SIZE
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Heartbeat watchdog state. The time of the last heartbeat lives in a one-element
+        # buffer, which multi-worker serving replaces by a shared-memory slot so the
+        # watchdog in the parent process sees heartbeats answered by any worker
+        self.heartbeat_clock = array("d", (time.monotonic(),))
+        self._stop_watchdog = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    @property
+    def last_heartbeat(self) -> float:
+        """
+        Get the time of the last heartbeat.
 
-    def register_with_simulator(self) -> None:
+        Returns:
+            float: time.monotonic() of the last heartbeat (or registration)
+        """
+        return float(self.heartbeat_clock[0])
+
+    @last_heartbeat.setter
+    def last_heartbeat(self, value: float) -> None:
+        self.heartbeat_clock[0] = value
+
+    def register_with_simulator(self, studenttask_url: str | None = None) -> bool:
         """
         Register this studenttask instance with the simulator.
 
         Makes POST request to simulator's registration endpoint with this service's URL.
         Sets is_registered flag on successful registration.
 
+        Args:
+            studenttask_url: URL to register instead of the instance URL, e.g. a fleet endpoint
+
+        Returns:
+            bool: True if the simulator accepted the registration
+
         Raises:
             requests.RequestException: If registration request fails
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.simulator_url}/api/register/task",
-            json={"studenttask_url": self.studenttask_url},
+            json={"studenttask_url": studenttask_url or self.studenttask_url},
             timeout=self.timeout,
         )
         if response.status_code == 200:
             self.is_registered = True
             logger.info(f"Registered with Simulator at: '{self.simulator_url}'")
+            return True
+        logger.warning(f"Registration rejected by simulator with status {response.status_code}")
+        return False
+
+    def register_with_backoff(
+        self,
+        studenttask_urls: Sequence[str | None] = (None,),
+        max_attempts: int | None = None,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ) -> bool:
+        """
+        Register all URLs, retrying failed registrations with jittered exponential backoff.
+
+        Args:
+            studenttask_urls: URLs to register, None for the instance URL
+            max_attempts: Give up after this many rounds, retry forever if None
+            base_delay: Upper bound of the first backoff delay [s]
+            max_delay: Cap of the backoff delay [s]
+
+        Returns:
+            bool: True once every URL is registered, False if giving up or stopped
+        """
+        pending = list(studenttask_urls)
+        attempt = 0
+        while True:
+            for url in list(pending):
+                try:
+                    if self.register_with_simulator(url):
+                        pending.remove(url)
+                except requests.RequestException as error:
+                    logger.warning(f"Registration with simulator failed: {error}")
+            if not pending:
+                return True
+
+            attempt += 1
+            if max_attempts is not None and attempt >= max_attempts:
+                logger.error(f"Giving up registration after {attempt} attempts")
+                return False
+            # Full jitter keeps many replicas from retrying in lockstep
+            delay = random.uniform(0.0, min(max_delay, base_delay * 2**attempt))
+            if self._stop_watchdog.wait(delay):
+                return False
+
+    def start_watchdog(
+        self,
+        studenttask_urls: Sequence[str | None] = (None,),
+        heartbeat_timeout: float = 30.0,
+        check_interval: float = 1.0,
+    ) -> None:
+        """
+        Start a background thread registering and re-registering when heartbeats stop arriving.
+
+        The thread first registers all URLs with backoff, so the web server can start
+        without waiting for the simulator. The simulator sends heartbeats to registered
+        tasks, so missing heartbeats afterwards mean it restarted and forgot the registration.
+
+        Args:
+            studenttask_urls: URLs to re-register, None for the instance URL
+            heartbeat_timeout: Seconds without heartbeat before re-registering
+            check_interval: Seconds between checks
+        """
+        if self._watchdog is not None and self._watchdog.is_alive():
+            return
+        self._stop_watchdog.clear()
+        self.last_heartbeat = time.monotonic()
+        self._watchdog = threading.Thread(
+            target=self._watch_heartbeats,
+            args=(list(studenttask_urls), heartbeat_timeout, check_interval),
+            name="simulator-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    def stop_watchdog(self) -> None:
+        """
+        Stop the watchdog thread and any running registration backoff.
+        """
+        self._stop_watchdog.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _watch_heartbeats(
+        self, studenttask_urls: list[str | None], heartbeat_timeout: float, check_interval: float
+    ) -> None:
+        if self.register_with_backoff(studenttask_urls):
+            self.last_heartbeat = time.monotonic()
+        while not self._stop_watchdog.wait(check_interval):
+            silence = time.monotonic() - self.last_heartbeat
+            if silence < heartbeat_timeout:
+                continue
+            logger.warning(f"No heartbeat for {silence:.1f}s, re-registering with simulator")
+            self.is_registered = False
+            if self.register_with_backoff(studenttask_urls):
+                # Give the simulator a full timeout to resume heartbeats
+                self.last_heartbeat = time.monotonic()
 
     def return_if_alive(self) -> HeartbeatInfo:
         """
@@ -174,14 +368,23 @@ class APIClient:
         Returns:
             HeartbeatInfo: Response indicating service is alive
         """
-        logger.info("Received GET request for heartbeat")
+        self.last_heartbeat = time.monotonic()
+        self.structured_log.emit("heartbeat", HEARTBEAT_FIELDS)
         return HeartbeatInfo(is_alive=True)
 
     def get_app(self) -> FastAPI:
         """
-        Get the FastAPI application instance.
+        Get the FastAPI application instance, creating it on first use.
 
         Returns:
             FastAPI: The configured FastAPI application
         """
-        return self.app
+        if self._app is None:
+            self._app = FastAPI()
+            # Register heartbeat endpoint
+            self._app.get("/heartbeat/")(self.return_if_alive)
+        return self._app
+
+    @property
+    def app(self) -> FastAPI:
+        return self.get_app()
@@ -0,0 +1,147 @@
+"""
+Side-effect free decision kernel for the tap changer controller.
+
+The functions in this module only operate on plain numbers and never log,
+touch pydantic models or perform I/O, so they can be reused by the web
+service, batch endpoints and offline tooling alike.
+"""
+
+from typing import NamedTuple
+
+from .eSteps import eSteps
+
+# Feature flags per task: (use_safety_limits, spreading_control, range_control)
+TASK_SETTINGS: dict[str, tuple[bool, bool, bool]] = {
+    "1": (False, False, False),
+    "2": (True, False, False),
+    "3": (True, True, False),
+    "4": (True, True, True),
+}
+
+# Step size of a single range control factor adjustment [V]
+RANGE_CONTROL_MODIFIER: float = 0.1
+
+# Required distance of U_max to the upper limit before the factor is increased [V]
+RANGE_CONTROL_INCREASE_BUFFER: float = 0.5
+
+# Number of U_max measurements whose maximum must stay below the buffer before the factor is increased
+RANGE_CONTROL_WINDOW: int = 16
+
+# Limit violation codes reported in ControlDecision.violation
+VIOLATION_NONE: int = 0
+VIOLATION_LOWER: int = -1
+VIOLATION_UPPER: int = 1
+
+# Enum members bound once, attribute access on the enum class is slow in the hot path
+_SWITCHLOWER = eSteps.SWITCHLOWER
+_SWITCHHIGHER = eSteps.SWITCHHIGHER
+_STAY = eSteps.STAY
+
+
+class ControlDecision(NamedTuple):
+    """
+    Result of a single control decision.
+
+    The first three fields map one to one onto the response expected by the
+    simulator, the remaining fields describe how the decision was reached.
+    """
+
+    tapchanger_behavior: eSteps
+    spreading_detected: bool
+    range_control_factor: float
+    lower_limit: float
+    upper_limit: float
+    violation: int
+
+
+def decide(
+    task: str,
+    min_voltage: float,
+    max_voltage: float,
+    tap_position: int,
+    min_step: int,
+    max_step: int,
+    upper_band: float,
+    lower_band: float,
+    upper_safety: float,
+    lower_safety: float,
+    range_control_factor: float,
+    delta_higher: float,
+    delta_lower: float,
+    range_control_modifier: float = RANGE_CONTROL_MODIFIER,
+    range_control_increase_buffer: float = RANGE_CONTROL_INCREASE_BUFFER,
+    range_increase_voltage: float | None = None,
+) -> ControlDecision:
+    """
+    Decide the tap changer action, spreading flag and new range control factor.
+
+    Args:
+        task: Task identifier selecting the enabled features (see TASK_SETTINGS)
+        min_voltage: Minimum measured street voltage [V]
+        max_voltage: Maximum measured street voltage [V]
+        tap_position: Current tap changer position
+        min_step: Lowest valid tap changer position
+        max_step: Highest valid tap changer position
+        upper_band: Upper voltage band limit [V]
+        lower_band: Lower voltage band limit [V]
+        upper_safety: Upper safety voltage limit [V]
+        lower_safety: Lower safety voltage limit [V]
+        range_control_factor: Current range control factor
+        delta_higher: Voltage delta when switching one tap higher, see TapModel.delta [V]
+        delta_lower: Voltage delta when switching one tap lower, see TapModel.delta [V]
+        range_control_modifier: Step size of a range control factor adjustment
+        range_control_increase_buffer: Required buffer to the upper limit before increasing the factor [V]
+        range_increase_voltage: Voltage compared against the buffer before increasing the
+            factor, e.g. the rolling maximum of U_max [V]. Defaults to max_voltage.
+
+    Returns:
+        ControlDecision: The decision and the limits it was based on
+
+    Raises:
+        KeyError: If the task identifier is unknown
+    """
+    use_safety_limits, spreading_control, range_control = TASK_SETTINGS[task]
+
+    # Determine limits based on settings
+    if use_safety_limits:
+        upper_limit = upper_safety
+        lower_limit = lower_safety
+    else:
+        upper_limit = upper_band
+        lower_limit = lower_band
+
+    is_spreading = False
+    new_pos = _STAY
+
+    if min_voltage < lower_limit:
+        violation = VIOLATION_LOWER
+        if tap_position + 1 <= max_step:
+            new_pos = _SWITCHHIGHER
+        # Switching higher must not push U_max over the upper limit
+        if spreading_control and max_voltage - delta_higher > upper_limit:
+            is_spreading = True
+    elif max_voltage > upper_limit:
+        violation = VIOLATION_UPPER
+        if tap_position - 1 >= min_step:
+            new_pos = _SWITCHLOWER
+        # Switching lower must not push U_min under the lower limit
+        if spreading_control and min_voltage - delta_lower < lower_limit:
+            is_spreading = True
+    else:
+        violation = VIOLATION_NONE
+
+    if is_spreading:
+        new_pos = _STAY
+
+    if spreading_control and range_control:
+        if is_spreading:
+            range_control_factor = max(0.0, range_control_factor - range_control_modifier)
+        elif new_pos != _SWITCHHIGHER and not (
+            (max_voltage if range_increase_voltage is None else range_increase_voltage)
+            > upper_limit - range_control_increase_buffer
+        ):
+            range_control_factor = min(1.0, range_control_factor + range_control_modifier)
+
+    return ControlDecision(
+        new_pos, is_spreading, range_control_factor, lower_limit, upper_limit, violation
+    )
@@ -0,0 +1,151 @@
+"""
+Vectorized variant of the decision kernel for deciding many transformers at once.
+
+All inputs are broadcast against each other, so scalars (e.g. one shared set of
+limits) can be mixed freely with per-transformer arrays.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from .control import (
+    RANGE_CONTROL_INCREASE_BUFFER,
+    RANGE_CONTROL_MODIFIER,
+    TASK_SETTINGS,
+)
+from .eSteps import eSteps
+
+# Feature flag lookup tables indexed by the numeric task identifier
+_MAX_TASK = max(int(task) for task in TASK_SETTINGS)
+_USE_SAFETY = np.zeros(_MAX_TASK + 1, dtype=bool)
+_SPREADING = np.zeros(_MAX_TASK + 1, dtype=bool)
+_RANGE = np.zeros(_MAX_TASK + 1, dtype=bool)
+for _task, (_safety, _spreading, _range) in TASK_SETTINGS.items():
+    _USE_SAFETY[int(_task)] = _safety
+    _SPREADING[int(_task)] = _spreading
+    _RANGE[int(_task)] = _range
+
+# eSteps values as plain integers for use inside numpy arrays
+STEP_LOWER: int = eSteps.SWITCHLOWER.value
+STEP_HIGHER: int = eSteps.SWITCHHIGHER.value
+STEP_STAY: int = eSteps.STAY.value
+
+# Lookup from integer code back to the enum member
+STEP_BY_CODE: dict[int, eSteps] = {step.value: step for step in eSteps}
+
+
+class BatchDecision(NamedTuple):
+    """
+    Result arrays of a batch decision, one entry per transformer.
+
+    tapchanger_behavior holds eSteps values as int8 codes, use STEP_BY_CODE
+    to map them back onto the enum.
+    """
+
+    tapchanger_behavior: NDArray[np.int8]
+    spreading_detected: NDArray[np.bool_]
+    range_control_factor: NDArray[np.float64]
+
+
+def decide_batch(
+    task: ArrayLike,
+    min_voltage: ArrayLike,
+    max_voltage: ArrayLike,
+    tap_position: ArrayLike,
+    min_step: ArrayLike,
+    max_step: ArrayLike,
+    upper_band: ArrayLike,
+    lower_band: ArrayLike,
+    upper_safety: ArrayLike,
+    lower_safety: ArrayLike,
+    range_control_factor: ArrayLike,
+    delta_higher: ArrayLike,
+    delta_lower: ArrayLike,
+    range_control_modifier: ArrayLike = RANGE_CONTROL_MODIFIER,
+    range_control_increase_buffer: ArrayLike = RANGE_CONTROL_INCREASE_BUFFER,
+    range_increase_voltage: ArrayLike | None = None,
+) -> BatchDecision:
+    """
+    Decide tap changer actions for many transformers in one vectorized pass.
+
+    Semantics are identical to control.decide, applied element-wise.
+
+    Args:
+        task: Numeric task identifiers (1-4)
+        min_voltage: Minimum measured street voltages [V]
+        max_voltage: Maximum measured street voltages [V]
+        tap_position: Current tap changer positions
+        min_step: Lowest valid tap changer positions
+        max_step: Highest valid tap changer positions
+        upper_band: Upper voltage band limits [V]
+        lower_band: Lower voltage band limits [V]
+        upper_safety: Upper safety voltage limits [V]
+        lower_safety: Lower safety voltage limits [V]
+        range_control_factor: Current range control factors
+        delta_higher: Voltage deltas when switching one tap higher [V]
+        delta_lower: Voltage deltas when switching one tap lower [V]
+        range_control_modifier: Step size of a range control factor adjustment
+        range_control_increase_buffer: Required buffer to the upper limit before increasing the factor [V]
+        range_increase_voltage: Voltages compared against the buffer before increasing the
+            factor, e.g. the rolling maxima of U_max [V]. Defaults to max_voltage.
+
+    Returns:
+        BatchDecision: Decision arrays broadcast to the common input shape
+
+    Raises:
+        IndexError: If a task identifier is unknown
+    """
+    task_idx = np.asarray(task, dtype=np.intp)
+    if np.any((task_idx < 1) | (task_idx > _MAX_TASK)):
+        raise IndexError(f"Task identifiers must be between 1 and {_MAX_TASK}")
+    use_safety = _USE_SAFETY[task_idx]
+    spreading_control = _SPREADING[task_idx]
+    range_control = _RANGE[task_idx] & spreading_control
+
+    min_v = np.asarray(min_voltage, dtype=np.float64)
+    max_v = np.asarray(max_voltage, dtype=np.float64)
+    tap = np.asarray(tap_position, dtype=np.int64)
+    factor = np.asarray(range_control_factor, dtype=np.float64)
+    increase_v = max_v if range_increase_voltage is None else np.asarray(range_increase_voltage, dtype=np.float64)
+
+    # Determine limits based on settings
+    upper_limit = np.where(use_safety, upper_safety, upper_band)
+    lower_limit = np.where(use_safety, lower_safety, lower_band)
+
+    lower_violation = min_v < lower_limit
+    upper_violation = ~lower_violation & (max_v > upper_limit)
+
+    is_spreading = spreading_control & (
+        (lower_violation & (max_v - delta_higher > upper_limit))
+        | (upper_violation & (min_v - delta_lower < lower_limit))
+    )
+
+    switch_higher = lower_violation & (tap + 1 <= np.asarray(max_step)) & ~is_spreading
+    switch_lower = upper_violation & (tap - 1 >= np.asarray(min_step)) & ~is_spreading
+    steps = np.where(
+        switch_higher, STEP_HIGHER, np.where(switch_lower, STEP_LOWER, STEP_STAY)
+    ).astype(np.int8)
+
+    decrease = range_control & is_spreading
+    increase = (
+        range_control
+        & ~is_spreading
+        & ~switch_higher
+        & ~(increase_v > upper_limit - range_control_increase_buffer)
+    )
+    new_factor = np.where(
+        decrease,
+        np.maximum(0.0, factor - range_control_modifier),
+        np.where(increase, np.minimum(1.0, factor + range_control_modifier), factor),
+    )
+
+    shape = np.broadcast_shapes(
+        steps.shape, is_spreading.shape, new_factor.shape
+    )
+    return BatchDecision(
+        np.broadcast_to(steps, shape).copy(),
+        np.broadcast_to(is_spreading, shape).copy(),
+        np.broadcast_to(new_factor, shape).astype(np.float64),
+    )
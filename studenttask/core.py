@@ -0,0 +1,49 @@
+"""
+Dependency-light core of the controller.
+
+Re-exports the decision kernel and pipelines, tap model, rolling statistics and fleet
+state. None of these import FastAPI, pydantic, requests, uvicorn, loguru or
+NumPy, so offline tools and embedding applications can use the controller
+without paying for the web stack:
+
+    from studenttask.core import decide, get_tap_model
+"""
+
+from .control import (
+    RANGE_CONTROL_INCREASE_BUFFER,
+    RANGE_CONTROL_MODIFIER,
+    RANGE_CONTROL_WINDOW,
+    TASK_SETTINGS,
+    VIOLATION_LOWER,
+    VIOLATION_NONE,
+    VIOLATION_UPPER,
+    ControlDecision,
+    decide,
+)
+from .eSteps import eSteps
+from .fleet import DEFAULT_TRANSFORMER_ID, FleetRegistry, TransformerState
+from .pipelines import PipelineRegistry, compile_pipeline
+from .rolling import RollingWindow
+from .tap_model import TapModel, get_tap_model, tap_model_for
+
+__all__ = [
+    "DEFAULT_TRANSFORMER_ID",
+    "RANGE_CONTROL_INCREASE_BUFFER",
+    "RANGE_CONTROL_MODIFIER",
+    "RANGE_CONTROL_WINDOW",
+    "TASK_SETTINGS",
+    "VIOLATION_LOWER",
+    "VIOLATION_NONE",
+    "VIOLATION_UPPER",
+    "ControlDecision",
+    "FleetRegistry",
+    "PipelineRegistry",
+    "RollingWindow",
+    "TapModel",
+    "TransformerState",
+    "compile_pipeline",
+    "decide",
+    "eSteps",
+    "get_tap_model",
+    "tap_model_for",
+]
@@ -0,0 +1,103 @@
+"""
+Per-request deadlines and admission control for the control endpoints.
+
+The simulator gives up on a request after its timeout, so a decision that
+arrives late is as useless as none. AdmissionMiddleware stamps every HTTP
+request with a deadline when it arrives; the time it then waits for a worker
+thread counts against it. The decision path reads the deadline from
+request_deadline and answers with a fallback decision once it has passed.
+
+Control requests (POST) beyond max_in_flight are rejected right away with
+503 and Retry-After instead of queueing without bound. Heartbeats and
+metrics (GET) are never rejected, so a loaded service is not mistaken for a
+dead one.
+"""
+
+import json
+from collections.abc import Callable
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any
+
+from .eSteps import eSteps
+
+# Default time budget of a request [s], half of the simulator's 1 s timeout
+REQUEST_BUDGET: float = 0.5
+
+# Default maximum number of control requests in flight per process
+MAX_IN_FLIGHT: int = 64
+
+# perf_counter() deadline of the request being handled, None outside of requests
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+_SHED_BODY = json.dumps({"detail": "Too many requests in flight"}).encode()
+_SHED_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_SHED_BODY)).encode()),
+    (b"retry-after", b"1"),
+]
+
+
+def fallback_decision(range_control_factor: float) -> dict:
+    """
+    Get the safe decision returned when the deadline has passed.
+
+    Args:
+        range_control_factor: Range control factor sent with the request
+
+    Returns:
+        dict: STAY without spreading, keeping the range control factor
+    """
+    return {
+        "tapchanger_behavior": eSteps.STAY,
+        "spreading_detected": False,
+        "range_control_factor": range_control_factor,
+    }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware setting request deadlines and shedding excess control requests.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        budget: float = REQUEST_BUDGET,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        on_shed: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Wrap an ASGI app.
+
+        Args:
+            app: Wrapped ASGI app
+            budget: Time budget per request [s], 0 disables deadlines
+            max_in_flight: Control requests handled at once, 0 disables shedding
+            on_shed: Called for every rejected request, e.g. to count it
+        """
+        self.app = app
+        self.budget = budget
+        self.max_in_flight = max_in_flight
+        self.on_shed = on_shed
+        # Only changed on the event loop thread, so no lock is needed
+        self.in_flight = 0
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        if 0 < self.max_in_flight <= self.in_flight:
+            if self.on_shed is not None:
+                self.on_shed()
+            await send({"type": "http.response.start", "status": 503, "headers": _SHED_HEADERS})
+            await send({"type": "http.response.body", "body": _SHED_BODY})
+            return
+
+        self.in_flight += 1
+        token = request_deadline.set(perf_counter() + self.budget if self.budget > 0 else None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+            self.in_flight -= 1
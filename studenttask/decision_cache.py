@@ -0,0 +1,182 @@
+"""
+Bounded LRU cache of control decisions keyed on quantized grid state.
+
+Consecutive steps often arrive with the same tap position and limits and
+nearly the same voltages. Quantizing the voltages to a configurable
+resolution lets those steps reuse the previous decision instead of running
+the neighbour delta lookup and the decision kernel again.
+
+Quantizing trades exactness for hits: a step whose voltage lies within half
+a resolution of a decision threshold may get the decision of a neighbouring
+voltage. Keep the resolution well below the tap step size.
+"""
+
+from collections import OrderedDict
+from typing import NamedTuple
+
+from .control import ControlDecision
+from .tap_model import TapModel
+
+# Default number of cached decisions
+DECISION_CACHE_SIZE: int = 4096
+
+# Default voltage quantization [V]
+DECISION_CACHE_RESOLUTION: float = 0.01
+
+DecisionKey = tuple[str, int, int, int, float, float, float, float, float, int, int, int]
+
+
+class CacheStats(NamedTuple):
+    """
+    Hit and miss counters of a decision cache.
+    """
+
+    hits: int
+    misses: int
+    invalidations: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class DecisionCache:
+    """
+    LRU cache of decisions for one tap changer configuration.
+
+    The cache is bound to the tap model of the entries it holds and clears
+    itself when a lookup arrives with a different factor table.
+    """
+
+    def __init__(
+        self, maxsize: int = DECISION_CACHE_SIZE, resolution: float = DECISION_CACHE_RESOLUTION
+    ) -> None:
+        """
+        Create an empty cache.
+
+        Args:
+            maxsize: Maximum number of cached decisions
+            resolution: Voltage quantization step [V]
+
+        Raises:
+            ValueError: If maxsize or resolution are not positive
+        """
+        if maxsize <= 0 or resolution <= 0:
+            raise ValueError("Decision cache size and resolution must be positive")
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self._scale = 1.0 / resolution
+        self._entries: OrderedDict[DecisionKey, ControlDecision] = OrderedDict()
+        self._tap_model: TapModel | None = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(
+        self,
+        task: str,
+        tap_position: int,
+        min_step: int,
+        max_step: int,
+        upper_band: float,
+        lower_band: float,
+        upper_safety: float,
+        lower_safety: float,
+        range_control_factor: float,
+        min_voltage: float,
+        max_voltage: float,
+        range_increase_voltage: float,
+    ) -> DecisionKey:
+        """
+        Build the cache key of a step.
+
+        Returns:
+            DecisionKey: Exact configuration values and quantized voltages
+        """
+        return (
+            task,
+            tap_position,
+            min_step,
+            max_step,
+            upper_band,
+            lower_band,
+            upper_safety,
+            lower_safety,
+            range_control_factor,
+            round(min_voltage * self._scale),
+            round(max_voltage * self._scale),
+            round(range_increase_voltage * self._scale),
+        )
+
+    def get(self, tap_model: TapModel, key: DecisionKey) -> ControlDecision | None:
+        """
+        Look up a decision, clearing the cache if the tap configuration changed.
+
+        Args:
+            tap_model: Tap model of the current update
+            key: Key built by key()
+
+        Returns:
+            ControlDecision | None: Cached decision or None on a miss
+        """
+        if tap_model is not self._tap_model:
+            # Tap models are cached, so a different object usually means different factors
+            if self._tap_model is not None and tap_model.fingerprint != self._tap_model.fingerprint:
+                self._entries.clear()
+                self.invalidations += 1
+            self._tap_model = tap_model
+
+        decision = self._entries.get(key)
+        if decision is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, key: DecisionKey, decision: ControlDecision) -> None:
+        """
+        Store a decision, evicting the least recently used one if full.
+
+        Args:
+            key: Key built by key()
+            decision: Decision computed for the key
+        """
+        self._entries[key] = decision
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def entries(self) -> tuple[TapModel | None, list[tuple[DecisionKey, ControlDecision]]]:
+        """
+        Get the cached decisions, e.g. to write them to a snapshot.
+
+        Returns:
+            tuple: Tap model the entries belong to and the entries, least recently used first
+        """
+        # list() copies the entries without running Python code, so concurrent puts cannot interleave
+        return self._tap_model, list(self._entries.items())
+
+    def load(self, tap_model: TapModel, entries: list[tuple[DecisionKey, ControlDecision]]) -> None:
+        """
+        Replace the cached decisions, e.g. with those restored from a snapshot.
+
+        Args:
+            tap_model: Tap model the entries belong to
+            entries: Keys and decisions, least recently used first; only the last maxsize are kept
+        """
+        self._tap_model = tap_model
+        self._entries = OrderedDict(entries[-self.maxsize:])
+
+    def stats(self) -> CacheStats:
+        """
+        Get the hit and miss counters.
+
+        Returns:
+            CacheStats: Current counters and number of cached decisions
+        """
+        return CacheStats(self.hits, self.misses, self.invalidations, len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,173 @@
+"""
+Structured, sampled logging for the control hot path.
+
+Instead of several formatted text lines per decision, one record with all
+fields bound as structured extras is emitted. Records are gated by level
+and per-category sampling before any field is built, and the sink can be
+enqueued so formatting and I/O happen on a background thread.
+
+Configured via environment variables:
+    STUDENTTASK_LOG_MODE    - "full" (default), "sampled" or "off"
+    STUDENTTASK_LOG_LEVEL   - Minimum level of emitted records (default: INFO)
+    STUDENTTASK_LOG_SAMPLE  - Per-category sampling, e.g. "decision=10,heartbeat=100"
+    STUDENTTASK_LOG_FORMAT  - "text" (default) or "json" for serialized records
+"""
+
+import os
+import sys
+from collections.abc import Callable
+
+from loguru import logger
+
+# Log level of each record category
+CATEGORY_LEVELS: dict[str, str] = {
+    "decision": "INFO",
+    "batch": "INFO",
+    "heartbeat": "DEBUG",
+}
+
+# Default "log every n-th record" rates per mode
+MODE_SAMPLE_RATES: dict[str, dict[str, int]] = {
+    "full": {"decision": 1, "batch": 1, "heartbeat": 1},
+    "sampled": {"decision": 100, "batch": 10, "heartbeat": 1000},
+    "off": {},
+}
+
+# Text format showing the structured fields of a record
+TEXT_FORMAT: str = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan> - <level>{message}</level> {extra}"
+)
+
+
+class StructuredLogger:
+    """
+    Level gated, sampled emitter of one structured record per event.
+    """
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        sample_rates: dict[str, int] | None = None,
+        enabled: bool = True,
+    ) -> None:
+        """
+        Initialize the logger.
+
+        Args:
+            level: Minimum level of emitted records
+            sample_rates: Emit only every n-th record per category, 1 = every record
+            enabled: If False every record is dropped after a single attribute check
+        """
+        self.enabled = enabled
+        self.level_no = logger.level(level).no
+        self.sample_rates = dict(MODE_SAMPLE_RATES["full"])
+        if sample_rates:
+            self.sample_rates.update(sample_rates)
+        self._seen = dict.fromkeys(CATEGORY_LEVELS, 0)
+        self._category_level_no = {
+            category: logger.level(category_level).no
+            for category, category_level in CATEGORY_LEVELS.items()
+        }
+
+    @classmethod
+    def from_env(cls) -> "StructuredLogger":
+        """
+        Create a logger configured from the STUDENTTASK_LOG_* environment variables.
+
+        Returns:
+            StructuredLogger: Configured logger
+
+        Raises:
+            ValueError: If the mode or a sample rate is invalid
+        """
+        mode = os.environ.get("STUDENTTASK_LOG_MODE", "full").lower()
+        if mode not in MODE_SAMPLE_RATES:
+            raise ValueError(f"Unknown STUDENTTASK_LOG_MODE '{mode}'")
+        sample_rates = dict(MODE_SAMPLE_RATES[mode])
+        for entry in os.environ.get("STUDENTTASK_LOG_SAMPLE", "").split(","):
+            if entry.strip():
+                category, rate = entry.split("=")
+                sample_rates[category.strip()] = max(1, int(rate))
+        return cls(
+            level=os.environ.get("STUDENTTASK_LOG_LEVEL", "INFO").upper(),
+            sample_rates=sample_rates,
+            enabled=mode != "off",
+        )
+
+    def should_log(self, category: str) -> bool:
+        """
+        Check level and sampling gates for a record of the given category.
+
+        Args:
+            category: Record category, see CATEGORY_LEVELS
+
+        Returns:
+            bool: True if the record should be built and emitted
+        """
+        if not self.enabled or self._category_level_no[category] < self.level_no:
+            return False
+        seen = self._seen[category]
+        self._seen[category] = seen + 1
+        return seen % self.sample_rates[category] == 0
+
+    def emit(self, category: str, fields: Callable[[], dict] | dict) -> None:
+        """
+        Emit one structured record if it passes the gates.
+
+        Args:
+            category: Record category, see CATEGORY_LEVELS
+            fields: Record fields, or a callable building them only if the record is emitted
+        """
+        if not self.should_log(category):
+            return
+        self.write(category, fields() if callable(fields) else fields)
+
+    def write(self, category: str, fields: dict) -> None:
+        """
+        Emit one structured record without checking the gates.
+
+        Meant for callers that checked should_log themselves to avoid building
+        the fields of dropped records.
+
+        Args:
+            category: Record category, see CATEGORY_LEVELS
+            fields: Record fields
+        """
+        logger.bind(category=category, **fields).log(CATEGORY_LEVELS[category], category)
+
+
+_structured_logger: StructuredLogger | None = None
+
+
+def get_structured_logger() -> StructuredLogger:
+    """
+    Get the process wide structured logger, creating it from the environment on first use.
+
+    Returns:
+        StructuredLogger: Shared logger instance
+    """
+    global _structured_logger
+    if _structured_logger is None:
+        _structured_logger = StructuredLogger.from_env()
+    return _structured_logger
+
+
+def configure_logging(enqueue: bool = True) -> None:
+    """
+    Replace the default loguru sink with the hot path sink.
+
+    Args:
+        enqueue: Hand records to a background thread instead of writing synchronously
+    """
+    serialize = os.environ.get("STUDENTTASK_LOG_FORMAT", "text").lower() == "json"
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=os.environ.get("STUDENTTASK_LOG_LEVEL", "INFO").upper(),
+        format=TEXT_FORMAT,
+        serialize=serialize,
+        enqueue=enqueue,
+        backtrace=False,
+        diagnose=False,
+    )
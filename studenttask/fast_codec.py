@@ -0,0 +1,351 @@
+"""
+Fast-path decoding of simulator updates and encoding of control results.
+
+FastDecoder validates an update strictly with pydantic only when the shape
+of the message (keys and value types, including the values of the factor
+table) changes, e.g. for the first message of a run. All following messages
+with the same shape are parsed with json.loads and wrapped without
+re-validation. Only shapes pydantic keeps unchanged (apart from widening int
+to float) are remembered, so a coerced string never opens the fast path.
+
+Updates and results can also be exchanged in a compact fixed-layout binary
+format (BINARY_CONTENT_TYPE), all values little-endian:
+
+    update: version (B), task (B, 0 for none), 2 pad bytes,
+            min step, max step, current tap position (3 x i),
+            upper band, lower band, upper safety, lower safety, nominal voltage,
+            range control factor, min street voltage, max street voltage (8 x d),
+            first factor position (i), factor count (H), factors (count x d)
+    result: version (B), tap changer behavior (B), spreading detected (?),
+            range control factor (d)
+"""
+
+import json
+import struct
+from typing import Any
+
+from pydantic import ValidationError
+
+from .api_client import SimulatorUpdateData
+from .eSteps import eSteps
+
+# Shape of a message: its keys and the types of their values, in order; for dict
+# values (the factor table) the types of the dict's values
+Schema = tuple[tuple[str, type | tuple[type, ...]], ...]
+
+# Names of all fields of an update
+_FIELD_NAMES = SimulatorUpdateData.model_fields.keys()
+
+# Bypass the frozen model's __setattr__ when wrapping fast-path messages
+_new_model = object.__new__
+_set_attribute = object.__setattr__
+
+# Precomputed response prefixes per tap changer behavior and spreading flag
+_BEHAVIOR_PREFIX: dict[eSteps, bytes] = {
+    step: b'{"tapchanger_behavior":%d,"spreading_detected":' % step.value for step in eSteps
+}
+_SPREADING_PREFIX: dict[bool, bytes] = {
+    True: b'true,"range_control_factor":',
+    False: b'false,"range_control_factor":',
+}
+
+
+# Media type of the binary encoding
+BINARY_CONTENT_TYPE: str = "application/x-studenttask-binary"
+
+# Version byte of the binary layout
+BINARY_VERSION: int = 1
+
+_UPDATE_HEADER = struct.Struct("<BB2x3i8diH")
+_RESULT = struct.Struct("<BB?d")
+_STEP_BY_VALUE: dict[int, eSteps] = {step.value: step for step in eSteps}
+
+
+class FastDecoder:
+    """
+    Decoder for raw update bodies with validation only on schema changes.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the decoder without a known schema.
+        """
+        self._schema: Schema | None = None
+        self.validations = 0
+        self.fast_decodes = 0
+
+    def decode(self, body: bytes | str) -> SimulatorUpdateData:
+        """
+        Decode a JSON update body.
+
+        Args:
+            body: Raw request body
+
+        Returns:
+            SimulatorUpdateData: Decoded update
+
+        Raises:
+            ValidationError: If the body is not a valid update
+        """
+        try:
+            data = json.loads(body)
+        except ValueError:
+            # Let pydantic produce the same error as the validated endpoint
+            return SimulatorUpdateData.model_validate_json(body)
+        if not isinstance(data, dict):
+            return SimulatorUpdateData.model_validate(data)
+        return self.decode_dict(data)
+
+    def decode_dict(self, data: dict[str, Any]) -> SimulatorUpdateData:
+        """
+        Wrap an already parsed update, validating it if its schema is new.
+
+        Args:
+            data: Parsed update fields
+
+        Returns:
+            SimulatorUpdateData: Decoded update
+
+        Raises:
+            ValidationError: If the data is not a valid update
+        """
+        schema = tuple(
+            (key, tuple(map(type, value.values())) if type(value) is dict else type(value))
+            for key, value in data.items()
+        )
+        if schema == self._schema:
+            self.fast_decodes += 1
+            return _construct(data)
+
+        model = SimulatorUpdateData.model_validate(data)
+        self.validations += 1
+        # Only messages carrying every field can skip validation, so defaults never need filling in
+        trusted = data.keys() == _FIELD_NAMES and _conforms(data, model.__dict__)
+        self._schema = schema if trusted else None
+        return model
+
+    def reset(self) -> None:
+        """
+        Forget the known schema, forcing strict validation of the next message.
+        """
+        self._schema = None
+
+
+def _conforms(raw: Any, validated: Any) -> bool:
+    # Whether pydantic kept the raw value as it is, allowing int where it produced a float
+    if type(raw) is dict:
+        return (
+            type(validated) is dict
+            and raw.keys() == validated.keys()
+            and all(_conforms(value, validated[key]) for key, value in raw.items())
+        )
+    return type(raw) is type(validated) or (type(raw) is int and type(validated) is float)
+
+
+def _construct(data: dict[str, Any]) -> SimulatorUpdateData:
+    """
+    Wrap a complete, already validated field dict without copying it.
+
+    Equivalent to SimulatorUpdateData.model_construct for messages carrying every
+    field, but skips its default handling and per-field copying.
+    """
+    model = _new_model(SimulatorUpdateData)
+    _set_attribute(model, "__dict__", data)
+    _set_attribute(model, "__pydantic_fields_set__", set(data))
+    _set_attribute(model, "__pydantic_extra__", None)
+    _set_attribute(model, "__pydantic_private__", None)
+    return model
+
+
+def encode_control_result(result: dict) -> bytes:
+    """
+    Encode a control result as JSON bytes from precomputed fragments.
+
+    Args:
+        result: Control result as returned by StudentTask.calculate_control
+
+    Returns:
+        bytes: JSON encoded response body
+    """
+    return b"".join(
+        (
+            _BEHAVIOR_PREFIX[result["tapchanger_behavior"]],
+            _SPREADING_PREFIX[bool(result["spreading_detected"])],
+            repr(float(result["range_control_factor"])).encode(),
+            b"}",
+        )
+    )
+
+
+def validation_error_detail(error: ValidationError) -> list[dict]:
+    """
+    Convert a validation error into the detail list FastAPI returns on 422.
+
+    Args:
+        error: Error raised while decoding an update
+
+    Returns:
+        list[dict]: JSON serializable error details
+    """
+    return json.loads(error.json(include_url=False))
+
+
+def decode_update_binary(body: bytes) -> SimulatorUpdateData:
+    """
+    Decode a binary update.
+
+    The layout fixes every field's type, so the update is wrapped without validation.
+
+    Args:
+        body: Update in the binary layout
+
+    Returns:
+        SimulatorUpdateData: Decoded update
+
+    Raises:
+        ValueError: If the body has the wrong version or length
+    """
+    if len(body) < _UPDATE_HEADER.size:
+        raise ValueError(f"Binary update too short: {len(body)} bytes")
+    (
+        version,
+        task,
+        min_step,
+        max_step,
+        tap_position,
+        upper_band,
+        lower_band,
+        upper_safety,
+        lower_safety,
+        nominal_voltage,
+        range_control_factor,
+        min_voltage,
+        max_voltage,
+        first_position,
+        count,
+    ) = _UPDATE_HEADER.unpack_from(body)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary update version {version}")
+    if len(body) != _UPDATE_HEADER.size + 8 * count:
+        raise ValueError(f"Binary update with {count} factors must be {_UPDATE_HEADER.size + 8 * count} bytes")
+    factors = struct.unpack_from(f"<{count}d", body, _UPDATE_HEADER.size)
+    return _construct(
+        {
+            "task": str(task) if task else "",
+            "matriculation_number": "",
+            "upper_voltage_band": upper_band,
+            "lower_voltage_band": lower_band,
+            "upper_voltage_safety": upper_safety,
+            "lower_voltage_safety": lower_safety,
+            "min_step_position": min_step,
+            "max_step_position": max_step,
+            "nominal_voltage": nominal_voltage,
+            "current_tapchanger_position": tap_position,
+            "tapchanger_voltage_factors": {
+                str(first_position + offset): factor for offset, factor in enumerate(factors)
+            },
+            "current_rangecontrol_factor": range_control_factor,
+            "min_street_voltage": min_voltage,
+            "max_street_voltage": max_voltage,
+        }
+    )
+
+
+def encode_update_binary(update: SimulatorUpdateData) -> bytes:
+    """
+    Encode an update in the binary layout, e.g. on the simulator side.
+
+    Args:
+        update: Update with a numeric task and contiguous tap positions
+
+    Returns:
+        bytes: Update in the binary layout
+
+    Raises:
+        ValueError: If the task is not numeric or the tap positions have gaps
+    """
+    positions = sorted(int(position) for position in update.tapchanger_voltage_factors)
+    if positions and positions[-1] - positions[0] + 1 != len(positions):
+        raise ValueError("Binary updates need contiguous tap positions")
+    if update.task and not update.task.isdigit():
+        raise ValueError(f"Binary updates need a numeric task, got '{update.task}'")
+    factors = [update.tapchanger_voltage_factors[str(position)] for position in positions]
+    return _UPDATE_HEADER.pack(
+        BINARY_VERSION,
+        int(update.task or 0),
+        update.min_step_position,
+        update.max_step_position,
+        update.current_tapchanger_position,
+        update.upper_voltage_band,
+        update.lower_voltage_band,
+        update.upper_voltage_safety,
+        update.lower_voltage_safety,
+        update.nominal_voltage,
+        update.current_rangecontrol_factor,
+        update.min_street_voltage,
+        update.max_street_voltage,
+        positions[0] if positions else 0,
+        len(factors),
+    ) + struct.pack(f"<{len(factors)}d", *factors)
+
+
+def encode_control_result_binary(result: dict) -> bytes:
+    """
+    Encode a control result in the binary layout.
+
+    Args:
+        result: Control result as returned by StudentTask.calculate_control
+
+    Returns:
+        bytes: Result in the binary layout
+    """
+    return _RESULT.pack(
+        BINARY_VERSION,
+        result["tapchanger_behavior"].value,
+        bool(result["spreading_detected"]),
+        float(result["range_control_factor"]),
+    )
+
+
+def decode_control_result_binary(body: bytes) -> dict:
+    """
+    Decode a binary control result, e.g. on the simulator side.
+
+    Args:
+        body: Result in the binary layout
+
+    Returns:
+        dict: Tap changer behavior, spreading flag and range control factor
+
+    Raises:
+        ValueError: If the body has the wrong version or length
+    """
+    if len(body) != _RESULT.size:
+        raise ValueError(f"Binary result must be {_RESULT.size} bytes, got {len(body)}")
+    version, behavior, spreading, factor = _RESULT.unpack(body)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary result version {version}")
+    return {
+        "tapchanger_behavior": _STEP_BY_VALUE[behavior],
+        "spreading_detected": spreading,
+        "range_control_factor": factor,
+    }
+
+
+def wants_binary(accept: str | None, binary_request: bool) -> bool:
+    """
+    Decide whether to answer in the binary layout.
+
+    Args:
+        accept: Accept header of the request
+        binary_request: Whether the request body was binary
+
+    Returns:
+        bool: True if the client accepts binary explicitly, or sent binary and
+            accepts anything
+    """
+    if not accept:
+        return binary_request
+    if BINARY_CONTENT_TYPE in accept:
+        return True
+    return binary_request and "application/json" not in accept
@@ -0,0 +1,156 @@
+"""
+Per-transformer state for hosting many transformers in one process.
+"""
+
+from array import array
+from collections.abc import Callable, Iterator
+
+from .control import RANGE_CONTROL_WINDOW, ControlDecision
+from .rolling import RollingWindow
+from .tap_model import TapModel
+
+# Identifier used for the single transformer served by /calculateControl/
+DEFAULT_TRANSFORMER_ID: str = "default"
+
+
+class TransformerState:
+    """
+    Compact state record of a single transformer.
+
+    Keeps the tap model, a fixed-size ring buffer of recent range control
+    factors, a rolling window of the measured maximum street voltage and
+    decision counters. All buffers are preallocated arrays so recording a step does
+    not allocate.
+    """
+
+    # Number of range control factors kept per transformer
+    HISTORY_LENGTH: int = 64
+
+    # Default number of measurements in the rolling voltage window
+    WINDOW_LENGTH: int = RANGE_CONTROL_WINDOW
+
+    __slots__ = (
+        "transformer_id",
+        "tap_model",
+        "range_factor_history",
+        "max_voltage_window",
+        "decision_counts",
+        "step_count",
+        "spreading_count",
+        "range_factor_changes",
+        "_history_index",
+    )
+
+    def __init__(self, transformer_id: str, window_length: int = WINDOW_LENGTH) -> None:
+        """
+        Create an empty state record.
+
+        Args:
+            transformer_id: Identifier of the transformer
+            window_length: Number of measurements in the rolling voltage window
+        """
+        self.transformer_id = transformer_id
+        self.tap_model: TapModel | None = None
+        self.range_factor_history = array("d", bytes(8 * self.HISTORY_LENGTH))
+        self.max_voltage_window = RollingWindow(window_length)
+        # Indexed by eSteps value (SWITCHLOWER, SWITCHHIGHER, STAY)
+        self.decision_counts = array("Q", (0, 0, 0))
+        self.step_count = 0
+        self.spreading_count = 0
+        self.range_factor_changes = 0
+        self._history_index = 0
+
+    def observe(self, max_voltage: float) -> None:
+        """
+        Add the measured maximum street voltage of a step to the rolling window.
+
+        Args:
+            max_voltage: Maximum measured street voltage [V]
+        """
+        self.max_voltage_window.push(max_voltage)
+
+    def record(self, decision: ControlDecision, previous_range_factor: float) -> None:
+        """
+        Update counters and history with a finished decision.
+
+        Args:
+            decision: Decision returned to the simulator
+            previous_range_factor: Range control factor sent with the update
+        """
+        self.decision_counts[decision.tapchanger_behavior.value] += 1
+        self.spreading_count += decision.spreading_detected
+        if decision.range_control_factor != previous_range_factor:
+            self.range_factor_changes += 1
+        self.range_factor_history[self._history_index % self.HISTORY_LENGTH] = (
+            decision.range_control_factor
+        )
+        self._history_index += 1
+        self.step_count += 1
+
+    def recent_range_factors(self) -> list[float]:
+        """
+        Get the recorded range control factors, oldest first.
+
+        Returns:
+            list[float]: Up to HISTORY_LENGTH most recent factors
+        """
+        count = min(self._history_index, self.HISTORY_LENGTH)
+        start = self._history_index - count
+        return [
+            self.range_factor_history[i % self.HISTORY_LENGTH]
+            for i in range(start, self._history_index)
+        ]
+
+
+class FleetRegistry:
+    """
+    Registry of transformer states keyed by transformer ID.
+
+    States are created on first access, so new transformers can start
+    sending updates without any prior configuration.
+    """
+
+    def __init__(self, state_factory: Callable[[str], TransformerState] = TransformerState) -> None:
+        """
+        Initialize an empty registry.
+
+        Args:
+            state_factory: Creates the state of a new transformer from its ID,
+                e.g. a state backed by shared memory (see studenttask.shared_state)
+        """
+        self._state_factory = state_factory
+        self._states: dict[str, TransformerState] = {}
+
+    def get(self, transformer_id: str) -> TransformerState:
+        """
+        Get the state of a transformer, creating it on first access.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            TransformerState: State record of the transformer
+        """
+        state = self._states.get(transformer_id)
+        if state is None:
+            # setdefault inserts atomically, threads racing on a new transformer all get the same state
+            state = self._states.setdefault(transformer_id, self._state_factory(transformer_id))
+        return state
+
+    def add(self, state: TransformerState) -> None:
+        """
+        Add an existing state record, e.g. one restored from a snapshot.
+
+        Args:
+            state: State record, replaces any state with the same transformer ID
+        """
+        self._states[state.transformer_id] = state
+
+    def __contains__(self, transformer_id: object) -> bool:
+        return transformer_id in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __iter__(self) -> Iterator[TransformerState]:
+        return iter(self._states.values())
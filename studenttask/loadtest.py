@@ -0,0 +1,336 @@
+"""
+Load generator and latency benchmark for /calculateControl/.
+
+Replays realistic update payloads, either from a closed-loop feeder
+simulation or from a recorded log (see studenttask.replay), with a number
+of concurrent clients. Every client sends its next request once the previous
+one is answered, like the simulator does.
+
+Targets:
+    inprocess - Validate, decide and encode like the endpoint, without HTTP
+    http      - POST to a running service, e.g. http://localhost:7777
+
+Reports throughput and latency percentiles and can write them as JSON.
+Passing an earlier result as --baseline compares against it and exits with
+status 1 if throughput or p99 latency regressed by more than --tolerance.
+
+Usage:
+    python -m studenttask.loadtest [--target inprocess|http] [--url URL]
+        [--requests N] [--concurrency N] [--log FILE] [--output FILE]
+        [--baseline FILE] [--tolerance 0.1]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from importlib import metadata
+from itertools import islice
+from typing import Any, NamedTuple
+
+import numpy as np
+
+# Latency percentiles reported
+PERCENTILES: tuple[float, ...] = (50.0, 90.0, 99.0, 99.9)
+
+# Relative regression tolerated when comparing against a baseline
+REGRESSION_TOLERANCE: float = 0.1
+
+# Sends one body and returns True if it was answered successfully
+Sender = Callable[[bytes], bool]
+
+
+class LoadResult(NamedTuple):
+    """
+    Throughput and latency of one load test run.
+    """
+
+    target: str
+    requests: int
+    concurrency: int
+    errors: int
+    duration: float
+    throughput: float
+    latency_mean: float
+    latency_max: float
+    latency_percentiles: dict[str, float]
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the result into a JSON serializable dict with run metadata.
+
+        Returns:
+            dict: Result fields, latencies in seconds
+        """
+        try:
+            version = metadata.version("studenttask")
+        except metadata.PackageNotFoundError:
+            version = "unknown"
+        return {
+            **self._asdict(),
+            "version": version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.time(),
+        }
+
+
+def simulated_payloads(count: int, task: str = "4", seed: int = 0) -> list[bytes]:
+    """
+    Record the update bodies of a closed-loop feeder simulation.
+
+    Args:
+        count: Number of steps
+        task: Task identifier sent with the updates
+        seed: Seed of the load and PV profiles
+
+    Returns:
+        list[bytes]: JSON encoded SimulatorUpdateData, one per step
+    """
+    from .simulation import FeederSimulator, FeederUpdate, KernelController, daily_profiles
+
+    controller = KernelController()
+    payloads: list[bytes] = []
+
+    def record(update: FeederUpdate) -> dict:
+        payloads.append(json.dumps({name: getattr(update, name) for name in FeederUpdate.__slots__}).encode())
+        return controller(update)
+
+    load, pv = daily_profiles(count, seed)
+    FeederSimulator(load, pv, task=task).run(record)
+    return payloads
+
+
+def logged_payloads(path: str, count: int | None = None) -> list[bytes]:
+    """
+    Read update bodies from a recorded log, see studenttask.replay.
+
+    Args:
+        path: JSONL or CSV log file
+        count: Maximum number of steps read
+
+    Returns:
+        list[bytes]: JSON encoded SimulatorUpdateData, one per step
+    """
+    from .api_client import SimulatorUpdateData
+    from .replay import iter_records
+
+    fields = SimulatorUpdateData.model_fields.keys()
+    return [
+        json.dumps({name: record[name] for name in fields if name in record}).encode()
+        for record in islice(iter_records(path), count)
+    ]
+
+
+def inprocess_sender() -> Sender:
+    """
+    Create a sender running the work of /calculateControl/ on a StudentTask in this process.
+
+    Returns:
+        Sender: Validates the body, decides and JSON encodes the result; rejected bodies are failures
+    """
+    from fastapi.encoders import jsonable_encoder
+
+    from .api_client import SimulatorUpdateData
+    from .StudentTask import StudentTask
+
+    student_task = StudentTask()
+    validate = SimulatorUpdateData.model_validate_json
+
+    def send(body: bytes) -> bool:
+        # Answered with an error status by the endpoint, e.g. invalid updates or unknown tasks
+        try:
+            json.dumps(jsonable_encoder(student_task.calculate_control(validate(body))))
+        except Exception:
+            return False
+        return True
+
+    return send
+
+
+def http_sender(url: str, concurrency: int, timeout: float = 5.0) -> Sender:
+    """
+    Create a sender posting to a running service over pooled keep-alive connections.
+
+    Args:
+        url: Endpoint URL, e.g. http://localhost:7777/calculateControl/
+        concurrency: Number of clients sharing the connection pool
+        timeout: Request timeout [s]
+
+    Returns:
+        Sender: Posts the body and checks for status 200
+    """
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    headers = {"Content-Type": "application/json"}
+
+    def send(body: bytes) -> bool:
+        try:
+            return session.post(url, data=body, headers=headers, timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    return send
+
+
+def run_load(
+    send: Sender,
+    payloads: Iterable[bytes],
+    requests: int,
+    concurrency: int = 1,
+    target: str = "",
+) -> LoadResult:
+    """
+    Send payloads from concurrent closed-loop clients and measure every request.
+
+    Payloads are dealt to the clients round-robin and repeated until the requested
+    number of requests is sent. A sender raising counts as a failed request, so a
+    client keeps going. Throughput counts the successfully answered requests only.
+
+    Args:
+        send: Sender used by all clients
+        payloads: Update bodies to replay
+        requests: Total number of requests
+        concurrency: Number of concurrent clients
+        target: Name of the target, only reported
+
+    Returns:
+        LoadResult: Throughput and latency over all requests
+
+    Raises:
+        ValueError: If there are no payloads or requests and concurrency are not positive
+    """
+    payloads = list(payloads)
+    if not payloads or requests <= 0 or concurrency <= 0:
+        raise ValueError("Load test needs payloads and a positive number of requests and clients")
+    latencies = [array("d") for _ in range(concurrency)]
+    errors = [0] * concurrency
+    barrier = threading.Barrier(concurrency + 1)
+
+    def client(index: int) -> None:
+        timings = latencies[index]
+        failed = 0
+        barrier.wait()
+        for number in range(index, requests, concurrency):
+            body = payloads[number % len(payloads)]
+            start = time.perf_counter()
+            try:
+                ok = send(body)
+            except Exception:
+                ok = False
+            timings.append(time.perf_counter() - start)
+            failed += not ok
+        errors[index] = failed
+
+    threads = [threading.Thread(target=client, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    merged = np.concatenate([np.frombuffer(timings, dtype=np.float64) for timings in latencies])
+    return LoadResult(
+        target=target,
+        requests=requests,
+        concurrency=concurrency,
+        errors=sum(errors),
+        duration=duration,
+        throughput=(len(merged) - sum(errors)) / duration,
+        latency_mean=float(merged.mean()),
+        latency_max=float(merged.max()),
+        latency_percentiles={
+            f"p{percentile:g}": float(value)
+            for percentile, value in zip(PERCENTILES, np.percentile(merged, PERCENTILES))
+        },
+    )
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any], tolerance: float = REGRESSION_TOLERANCE) -> list[str]:
+    """
+    Compare a result against a baseline result.
+
+    Args:
+        result: Result as written by to_dict
+        baseline: Earlier result as written by to_dict
+        tolerance: Relative regression tolerated
+
+    Returns:
+        list[str]: Descriptions of the regressions, empty if there are none
+    """
+    regressions = []
+    if result["throughput"] < baseline["throughput"] * (1.0 - tolerance):
+        regressions.append(
+            f"throughput {result['throughput']:.0f}/s < baseline {baseline['throughput']:.0f}/s"
+        )
+    p99, baseline_p99 = result["latency_percentiles"]["p99"], baseline["latency_percentiles"]["p99"]
+    if p99 > baseline_p99 * (1.0 + tolerance):
+        regressions.append(f"p99 {p99 * 1e3:.3f} ms > baseline {baseline_p99 * 1e3:.3f} ms")
+    return regressions
+
+
+def main() -> None:
+    """
+    Run a load test from the command line and print the summary.
+    """
+    parser = argparse.ArgumentParser(description="Load test of /calculateControl/")
+    parser.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", default="http://localhost:7777")
+    parser.add_argument("--path", default="/calculateControl/")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--task", default="4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default=None, help="Replay a recorded log instead of a simulated day")
+    parser.add_argument("--output", default=None, help="Write the result as JSON")
+    parser.add_argument("--baseline", default=None, help="Compare against an earlier JSON result")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.target == "inprocess":
+        # Measure the controller, not the log sink
+        os.environ.setdefault("STUDENTTASK_LOG_MODE", "off")
+        send = inprocess_sender()
+    else:
+        send = http_sender(args.url.rstrip("/") + args.path, args.concurrency)
+    payloads = logged_payloads(args.log, args.requests) if args.log else simulated_payloads(
+        min(args.requests, 86400), args.task, args.seed
+    )
+
+    if args.warmup > 0:
+        run_load(send, payloads, args.warmup, args.concurrency)
+    result = run_load(send, payloads, args.requests, args.concurrency, args.target)
+    percentiles = " ".join(f"{name}={value * 1e3:.3f}ms" for name, value in result.latency_percentiles.items())
+    print(
+        f"target={result.target} requests={result.requests} concurrency={result.concurrency} "
+        f"errors={result.errors} throughput={result.throughput:.0f}/s "
+        f"mean={result.latency_mean * 1e3:.3f}ms {percentiles} max={result.latency_max * 1e3:.3f}ms"
+    )
+
+    record = result.to_dict()
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(record, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(record, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+Lock-free in-process metrics with Prometheus text exposition.
+
+Every thread writes into its own shard (a flat array of doubles), so
+incrementing a counter or observing a histogram value never takes a lock and
+never races with other threads. Scraping sums all shards. The shard of a
+thread that has ended is folded into the retired totals, so a server
+replacing its worker threads does not grow the list of shards forever.
+
+StageTimedRoute observes the decode and encode stages of FastAPI endpoints
+that FastAPI decodes and encodes itself.
+"""
+
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Any
+
+from fastapi.routing import APIRoute
+
+from .control import TASK_SETTINGS
+from .eSteps import eSteps
+
+# Default latency buckets [s], tuned for sub-millisecond request handling
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0,
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+# perf_counter() marks of the request handled by a StageTimedRoute, None outside of one
+_stage_marks: ContextVar[list[float] | None] = ContextVar("_stage_marks", default=None)
+
+
+class _ShardHolder:
+    # Thread-local owner of a shard; collected when its thread ends, which retires the shard
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard: array) -> None:
+        self.shard = shard
+
+
+class MetricsRegistry:
+    """
+    Registry owning the per-thread shards of all registered metrics.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty registry.
+        """
+        self._size = 0
+        self._shards: list[array] = []
+        # Sums of the shards of ended threads
+        self._retired = array("d")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Metric families in registration order: name -> (type, help, [metrics])
+        self._families: dict[str, tuple[str, str, list]] = {}
+
+    def _allocate(self, slots: int) -> int:
+        with self._lock:
+            offset = self._size
+            self._size += slots
+            for shard in self._shards:
+                shard.extend(bytes(8 * slots))
+            self._retired.extend(bytes(8 * slots))
+            return offset
+
+    def shard(self) -> array:
+        """
+        Get the calling thread's shard, creating it on first use.
+
+        Returns:
+            array: Flat array of metric slots owned by this thread
+        """
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            with self._lock:
+                shard = array("d", bytes(8 * self._size))
+                self._shards.append(shard)
+            holder = self._local.holder = _ShardHolder(shard)
+            weakref.finalize(holder, self._retire, shard).atexit = False
+            return shard
+
+    def _retire(self, shard: array) -> None:
+        with self._lock:
+            self._shards.remove(shard)
+            retired = self._retired
+            for index, value in enumerate(shard):
+                retired[index] += value
+
+    @property
+    def shards(self) -> int:
+        """
+        Get the number of live shards.
+
+        Returns:
+            int: Shards of threads that have recorded metrics and not yet ended
+        """
+        return len(self._shards)
+
+    def _register(self, kind: str, name: str, help_text: str, metric: object) -> None:
+        family = self._families.setdefault(name, (kind, help_text, []))
+        if family[0] != kind:
+            raise ValueError(f"Metric '{name}' already registered as {family[0]}")
+        family[2].append(metric)
+
+    def counter(self, name: str, help_text: str, labels: dict[str, str] | None = None) -> "Counter":
+        """
+        Register a counter.
+
+        Args:
+            name: Metric name
+            help_text: Description shown in the exposition
+            labels: Fixed label values of this counter
+
+        Returns:
+            Counter: Handle for incrementing the counter
+        """
+        counter = Counter(self, self._allocate(1), _labels(labels))
+        self._register("counter", name, help_text, counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+        labels: dict[str, str] | None = None,
+    ) -> "Histogram":
+        """
+        Register a histogram.
+
+        Args:
+            name: Metric name
+            help_text: Description shown in the exposition
+            buckets: Upper bounds of the buckets, ascending
+            labels: Fixed label values of this histogram
+
+        Returns:
+            Histogram: Handle for observing values
+        """
+        buckets = tuple(sorted(buckets))
+        # One slot per bucket, one for +Inf, then sum and count
+        histogram = Histogram(self, self._allocate(len(buckets) + 3), _labels(labels), buckets)
+        self._register("histogram", name, help_text, histogram)
+        return histogram
+
+    def _totals(self) -> list[float]:
+        with self._lock:
+            shards = list(self._shards)
+            totals = self._retired.tolist()
+        for shard in shards:
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+    def value(self, metric: "Counter") -> float:
+        """
+        Get the current total of a counter over all threads.
+
+        Args:
+            metric: Counter registered in this registry
+
+        Returns:
+            float: Counter value
+        """
+        return self._totals()[metric.slot]
+
+    def values(self, *metrics: "Counter") -> list[float]:
+        """
+        Get the current totals of several counters, summing the shards only once.
+
+        Args:
+            metrics: Counters registered in this registry
+
+        Returns:
+            list[float]: Counter values in the given order
+        """
+        totals = self._totals()
+        return [totals[metric.slot] for metric in metrics]
+
+    def exposition(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        totals = self._totals()
+        lines = []
+        for name, (kind, help_text, metrics) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                lines.extend(metric.render(name, totals))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict[str, str] | None) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = labels + ((extra,) if extra else ())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    """
+    Monotonically increasing counter.
+    """
+
+    __slots__ = ("_registry", "slot", "labels")
+
+    def __init__(self, registry: MetricsRegistry, slot: int, labels: Labels) -> None:
+        self._registry = registry
+        self.slot = slot
+        self.labels = labels
+
+    def inc(self, amount: float = 1.0) -> None:
+        """
+        Increment the counter.
+
+        Args:
+            amount: Non-negative increment
+        """
+        self._registry.shard()[self.slot] += amount
+
+    def render(self, name: str, totals: list[float]) -> list[str]:
+        return [f"{name}{_format_labels(self.labels)} {_format_value(totals[self.slot])}"]
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets.
+    """
+
+    __slots__ = ("_registry", "slot", "labels", "buckets", "_size")
+
+    def __init__(
+        self, registry: MetricsRegistry, slot: int, labels: Labels, buckets: tuple[float, ...]
+    ) -> None:
+        self._registry = registry
+        self.slot = slot
+        self.labels = labels
+        self.buckets = buckets
+        self._size = len(buckets)
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value: Observed value, e.g. a latency in seconds
+        """
+        self.observe_into(self._registry.shard(), value)
+
+    def observe_into(self, shard: array, value: float) -> None:
+        """
+        Record one observation into an already fetched shard.
+
+        Args:
+            shard: Calling thread's shard, see MetricsRegistry.shard
+            value: Observed value, e.g. a latency in seconds
+        """
+        slot = self.slot
+        shard[slot + bisect_left(self.buckets, value)] += 1
+        shard[slot + self._size + 1] += value
+        shard[slot + self._size + 2] += 1
+
+    def render(self, name: str, totals: list[float]) -> list[str]:
+        lines = []
+        cumulative = 0.0
+        for index, bound in enumerate((*self.buckets, float("inf"))):
+            cumulative += totals[self.slot + index]
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(self.labels, ('le', le))} {_format_value(cumulative)}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {repr(totals[self.slot + self._size + 1])}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {_format_value(totals[self.slot + self._size + 2])}")
+        return lines
+
+
+class ControlMetrics:
+    """
+    Metrics of the control service: latencies per stage and decision counters.
+    """
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        """
+        Register all control metrics.
+
+        Args:
+            registry: Registry to register in, a new one if None
+        """
+        self.registry = registry or MetricsRegistry()
+        latency = "studenttask_stage_latency_seconds"
+        latency_help = "Latency of the request handling stages"
+        self.decode_seconds = self.registry.histogram(latency, latency_help, labels={"stage": "decode"})
+        self.decision_seconds = self.registry.histogram(latency, latency_help, labels={"stage": "decision"})
+        self.encode_seconds = self.registry.histogram(latency, latency_help, labels={"stage": "encode"})
+
+        # Indexed by eSteps value
+        self.decisions = [
+            self.registry.counter(
+                "studenttask_decisions_total", "Decisions per tap changer behavior", {"behavior": step.name}
+            )
+            for step in sorted(eSteps, key=lambda step: step.value)
+        ]
+        self.spreading = self.registry.counter(
+            "studenttask_spreading_detected_total", "Decisions with spreading detected"
+        )
+        self.tasks = {
+            task: self.registry.counter("studenttask_task_requests_total", "Decisions per task mode", {"task": task})
+            for task in TASK_SETTINGS
+        }
+        self.range_factor_increases = self.registry.counter(
+            "studenttask_range_factor_changes_total", "Range control factor changes", {"direction": "increase"}
+        )
+        self.range_factor_decreases = self.registry.counter(
+            "studenttask_range_factor_changes_total", "Range control factor changes", {"direction": "decrease"}
+        )
+        # Indexed by hit (False: miss, True: hit)
+        self.decision_cache = [
+            self.registry.counter(
+                "studenttask_decision_cache_lookups_total", "Decision cache lookups", {"result": result}
+            )
+            for result in ("miss", "hit")
+        ]
+        self.validation_failures = self.registry.counter(
+            "studenttask_validation_failures_total", "Requests rejected by validation"
+        )
+        self.fallbacks = self.registry.counter(
+            "studenttask_fallback_decisions_total", "Fallback decisions returned after the request deadline"
+        )
+        self.shed_requests = self.registry.counter(
+            "studenttask_shed_requests_total", "Control requests rejected by admission control"
+        )
+
+    def record_decision(
+        self,
+        task: str,
+        behavior: eSteps,
+        spreading_detected: bool,
+        previous_range_factor: float,
+        range_factor: float,
+        seconds: float,
+    ) -> None:
+        """
+        Record the counters and latency of one decision.
+
+        Args:
+            task: Task identifier of the request
+            behavior: Decided tap changer behavior
+            spreading_detected: Decided spreading flag
+            previous_range_factor: Range control factor sent with the request
+            range_factor: Decided range control factor
+            seconds: Time spent deciding
+        """
+        # Called once per decision, so the shard is fetched once instead of per counter
+        shard = self.registry.shard()
+        self.decision_seconds.observe_into(shard, seconds)
+        shard[self.decisions[behavior.value].slot] += 1
+        task_counter = self.tasks.get(task)
+        if task_counter is not None:
+            shard[task_counter.slot] += 1
+        if spreading_detected:
+            shard[self.spreading.slot] += 1
+        if range_factor > previous_range_factor:
+            shard[self.range_factor_increases.slot] += 1
+        elif range_factor < previous_range_factor:
+            shard[self.range_factor_decreases.slot] += 1
+
+    def handled_requests(self) -> float:
+        """
+        Get the number of control requests answered so far.
+
+        Returns:
+            float: Decisions plus fallback decisions
+        """
+        return sum(self.registry.values(*self.decisions, self.fallbacks))
+
+
+def _marking(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # Marks when the endpoint starts and returns; the list is shared with the worker thread
+    @wraps(endpoint)
+    def marked(*args: Any, **kwargs: Any) -> Any:
+        marks = _stage_marks.get()
+        if marks is not None:
+            marks.append(perf_counter())
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            if marks is not None:
+                marks.append(perf_counter())
+
+    return marked
+
+
+class StageTimedRoute(APIRoute):
+    """
+    Route observing the decode and encode stage latencies of a synchronous endpoint.
+
+    FastAPI reads and validates the body before calling the endpoint and serializes
+    its result afterwards. The time from entering the route handler to calling the
+    endpoint is observed as decode, the time from its return to the finished response
+    as encode. Requests failing validation are not observed.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], *, metrics: ControlMetrics, **kwargs: Any) -> None:
+        """
+        Create the route.
+
+        Args:
+            path: Route path
+            endpoint: Synchronous endpoint
+            metrics: Metrics to observe the stages in
+            kwargs: Further APIRoute arguments
+        """
+        self.metrics = metrics
+        super().__init__(path, _marking(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable[..., Any]:
+        handler = super().get_route_handler()
+        decode_seconds, encode_seconds = self.metrics.decode_seconds, self.metrics.encode_seconds
+
+        async def timed_handler(request: Any) -> Any:
+            marks = [perf_counter()]
+            token = _stage_marks.set(marks)
+            try:
+                response = await handler(request)
+            finally:
+                _stage_marks.reset(token)
+            if len(marks) == 3:
+                decode_seconds.observe(marks[1] - marks[0])
+                encode_seconds.observe(perf_counter() - marks[2])
+            return response
+
+        return timed_handler
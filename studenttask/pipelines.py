@@ -0,0 +1,231 @@
+"""
+Per-task decision pipelines compiled once from the task settings.
+
+control.decide looks up the feature flags of the task and branches on them
+for every decision. compile_pipeline resolves the flags once instead: it
+returns a specialized function containing only the checks of the enabled
+features, with the limit pair, the range control modifier and the increase
+buffer bound in. A PipelineRegistry holds one compiled pipeline per task and
+is the dispatch table the service selects from by simulator.task. Further
+task modes, including completely custom controllers, are added with
+register, without touching the pipelines of the existing tasks.
+
+Every pipeline takes the same arguments and returns the same ControlDecision
+as control.decide for its task.
+"""
+
+from collections.abc import Callable, Iterator, Mapping
+
+from .control import (
+    RANGE_CONTROL_INCREASE_BUFFER,
+    RANGE_CONTROL_MODIFIER,
+    TASK_SETTINGS,
+    VIOLATION_LOWER,
+    VIOLATION_NONE,
+    VIOLATION_UPPER,
+    ControlDecision,
+)
+from .eSteps import eSteps
+
+# (upper band, lower band, upper safety, lower safety) [V]
+Limits = tuple[float, float, float, float]
+
+# (min voltage, max voltage, tap position, min step, max step, limits, range control factor,
+#  delta higher, delta lower, range increase voltage or None) -> decision
+Pipeline = Callable[[float, float, int, int, int, Limits, float, float, float, float | None], ControlDecision]
+
+# Feature flags of a task: (use_safety_limits, spreading_control, range_control)
+TaskSettings = tuple[bool, bool, bool]
+
+_SWITCHLOWER = eSteps.SWITCHLOWER
+_SWITCHHIGHER = eSteps.SWITCHHIGHER
+_STAY = eSteps.STAY
+
+
+def compile_pipeline(
+    settings: TaskSettings,
+    range_control_modifier: float = RANGE_CONTROL_MODIFIER,
+    range_control_increase_buffer: float = RANGE_CONTROL_INCREASE_BUFFER,
+) -> Pipeline:
+    """
+    Build the decision pipeline of a task mode.
+
+    Args:
+        settings: Feature flags (use_safety_limits, spreading_control, range_control)
+        range_control_modifier: Step size of a range control factor adjustment
+        range_control_increase_buffer: Required buffer to the upper limit before increasing the factor [V]
+
+    Returns:
+        Pipeline: Specialized decision function
+    """
+    use_safety_limits, spreading_control, range_control = settings
+    # Index of the upper and lower limit in the limits tuple
+    upper, lower = (2, 3) if use_safety_limits else (0, 1)
+
+    if not spreading_control:
+        # Range control needs spreading control, so it is off as well
+
+        def limit_pipeline(
+            min_voltage, max_voltage, tap_position, min_step, max_step, limits,
+            range_control_factor, delta_higher, delta_lower, range_increase_voltage,
+        ):
+            upper_limit = limits[upper]
+            lower_limit = limits[lower]
+            if min_voltage < lower_limit:
+                behavior = _SWITCHHIGHER if tap_position < max_step else _STAY
+                return ControlDecision(
+                    behavior, False, range_control_factor, lower_limit, upper_limit, VIOLATION_LOWER
+                )
+            if max_voltage > upper_limit:
+                behavior = _SWITCHLOWER if tap_position > min_step else _STAY
+                return ControlDecision(
+                    behavior, False, range_control_factor, lower_limit, upper_limit, VIOLATION_UPPER
+                )
+            return ControlDecision(_STAY, False, range_control_factor, lower_limit, upper_limit, VIOLATION_NONE)
+
+        return limit_pipeline
+
+    if not range_control:
+
+        def spreading_pipeline(
+            min_voltage, max_voltage, tap_position, min_step, max_step, limits,
+            range_control_factor, delta_higher, delta_lower, range_increase_voltage,
+        ):
+            upper_limit = limits[upper]
+            lower_limit = limits[lower]
+            if min_voltage < lower_limit:
+                # Switching higher must not push U_max over the upper limit
+                if max_voltage - delta_higher > upper_limit:
+                    return ControlDecision(
+                        _STAY, True, range_control_factor, lower_limit, upper_limit, VIOLATION_LOWER
+                    )
+                behavior = _SWITCHHIGHER if tap_position < max_step else _STAY
+                return ControlDecision(
+                    behavior, False, range_control_factor, lower_limit, upper_limit, VIOLATION_LOWER
+                )
+            if max_voltage > upper_limit:
+                # Switching lower must not push U_min under the lower limit
+                if min_voltage - delta_lower < lower_limit:
+                    return ControlDecision(
+                        _STAY, True, range_control_factor, lower_limit, upper_limit, VIOLATION_UPPER
+                    )
+                behavior = _SWITCHLOWER if tap_position > min_step else _STAY
+                return ControlDecision(
+                    behavior, False, range_control_factor, lower_limit, upper_limit, VIOLATION_UPPER
+                )
+            return ControlDecision(_STAY, False, range_control_factor, lower_limit, upper_limit, VIOLATION_NONE)
+
+        return spreading_pipeline
+
+    def range_pipeline(
+        min_voltage, max_voltage, tap_position, min_step, max_step, limits,
+        range_control_factor, delta_higher, delta_lower, range_increase_voltage,
+    ):
+        upper_limit = limits[upper]
+        lower_limit = limits[lower]
+        if range_increase_voltage is None:
+            range_increase_voltage = max_voltage
+        if min_voltage < lower_limit:
+            violation = VIOLATION_LOWER
+            if max_voltage - delta_higher > upper_limit:
+                return ControlDecision(
+                    _STAY,
+                    True,
+                    max(0.0, range_control_factor - range_control_modifier),
+                    lower_limit,
+                    upper_limit,
+                    violation,
+                )
+            if tap_position < max_step:
+                # No increase while switching higher
+                return ControlDecision(
+                    _SWITCHHIGHER, False, range_control_factor, lower_limit, upper_limit, violation
+                )
+            behavior = _STAY
+        elif max_voltage > upper_limit:
+            violation = VIOLATION_UPPER
+            if min_voltage - delta_lower < lower_limit:
+                return ControlDecision(
+                    _STAY,
+                    True,
+                    max(0.0, range_control_factor - range_control_modifier),
+                    lower_limit,
+                    upper_limit,
+                    violation,
+                )
+            behavior = _SWITCHLOWER if tap_position > min_step else _STAY
+        else:
+            violation = VIOLATION_NONE
+            behavior = _STAY
+        if not range_increase_voltage > upper_limit - range_control_increase_buffer:
+            range_control_factor = min(1.0, range_control_factor + range_control_modifier)
+        return ControlDecision(behavior, False, range_control_factor, lower_limit, upper_limit, violation)
+
+    return range_pipeline
+
+
+class PipelineRegistry:
+    """
+    Dispatch table of compiled decision pipelines keyed by task identifier.
+    """
+
+    def __init__(
+        self,
+        settings: Mapping[str, TaskSettings] = TASK_SETTINGS,
+        range_control_modifier: float = RANGE_CONTROL_MODIFIER,
+        range_control_increase_buffer: float = RANGE_CONTROL_INCREASE_BUFFER,
+    ) -> None:
+        """
+        Compile the pipelines of the given task modes.
+
+        Args:
+            settings: Feature flags per task identifier
+            range_control_modifier: Step size of a range control factor adjustment
+            range_control_increase_buffer: Required buffer to the upper limit before increasing the factor [V]
+        """
+        self.range_control_modifier = range_control_modifier
+        self.range_control_increase_buffer = range_control_increase_buffer
+        self._pipelines: dict[str, Pipeline] = {}
+        for task, task_settings in settings.items():
+            self.register_settings(task, task_settings)
+
+    def register(self, task: str, pipeline: Pipeline) -> None:
+        """
+        Register a custom pipeline for a task, replacing any existing one.
+
+        Args:
+            task: Task identifier selecting the pipeline
+            pipeline: Decision function with the Pipeline signature
+        """
+        self._pipelines[task] = pipeline
+
+    def register_settings(self, task: str, settings: TaskSettings) -> None:
+        """
+        Compile and register the pipeline of a task mode given by its feature flags.
+
+        Args:
+            task: Task identifier selecting the pipeline
+            settings: Feature flags (use_safety_limits, spreading_control, range_control)
+        """
+        self.register(
+            task,
+            compile_pipeline(settings, self.range_control_modifier, self.range_control_increase_buffer),
+        )
+
+    def __getitem__(self, task: str) -> Pipeline:
+        """
+        Get the pipeline of a task.
+
+        Raises:
+            KeyError: If no pipeline is registered for the task
+        """
+        return self._pipelines[task]
+
+    def __contains__(self, task: object) -> bool:
+        return task in self._pipelines
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._pipelines)
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
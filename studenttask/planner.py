@@ -0,0 +1,276 @@
+"""
+Model-predictive tap planner.
+
+Searches tap sequences over a short horizon instead of reacting one tap at a
+time. Every step of the horizon may move the tap by at most one position
+(like the simulator); the cost of a sequence is the forecast limit violation
+in volts plus a fixed cost per tap operation, so the planner only switches
+when it pays off within the horizon.
+
+The best cost of the remaining steps only depends on the step and the tap
+position, so subproblems are memoized and the search visits at most
+horizon x positions x 3 nodes. Branches whose partial cost already exceeds
+the best sibling are pruned. A deadline bounds the search time; a search
+that runs out of time reports itself incomplete and the caller keeps the
+one-step kernel decision.
+"""
+
+from collections.abc import MutableMapping, Sequence
+from math import inf
+from time import perf_counter
+from typing import NamedTuple
+
+from .control import ControlDecision
+from .eSteps import eSteps
+from .tap_model import TapModel
+
+# Default number of forecast steps searched
+PLANNER_HORIZON: int = 8
+
+# Default cost of one tap operation, in volts of limit violation
+PLANNER_SWITCH_COST: float = 1.0
+
+# Default time budget of one search [s], far below the simulator's 1 s request timeout
+PLANNER_BUDGET: float = 0.02
+
+# Tap changer behavior per signed tap move
+STEP_BY_MOVE: dict[int, eSteps] = {-1: eSteps.SWITCHLOWER, 0: eSteps.STAY, 1: eSteps.SWITCHHIGHER}
+
+
+class TapPlan(NamedTuple):
+    """
+    Result of a tap sequence search.
+    """
+
+    # Signed tap move of the first step (-1, 0 or 1)
+    move: int
+    # Planned tap position for every step of the horizon
+    taps: tuple[int, ...]
+    # Forecast violation [V] plus switching costs of the plan
+    cost: float
+    # Number of expanded search nodes
+    nodes: int
+    # False if the search ran out of time, the plan is then empty
+    complete: bool
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def linear_forecast(previous: float, current: float, horizon: int) -> list[float]:
+    """
+    Extrapolate a voltage linearly from its last two measurements.
+
+    Args:
+        previous: Previous measurement [V]
+        current: Current measurement [V]
+        horizon: Number of steps to forecast
+
+    Returns:
+        list[float]: Forecast for the next horizon steps
+    """
+    trend = current - previous
+    return [current + trend * step for step in range(1, horizon + 1)]
+
+
+def plan_taps(
+    tap_model: TapModel,
+    tap_position: int,
+    min_step: int,
+    max_step: int,
+    forecast_min: Sequence[float],
+    forecast_max: Sequence[float],
+    lower_limit: float,
+    upper_limit: float,
+    switch_cost: float = PLANNER_SWITCH_COST,
+    deadline: float | None = None,
+) -> TapPlan:
+    """
+    Find the tap sequence with the lowest forecast violation and switching cost.
+
+    The forecasts are the voltages expected at the current tap position; other
+    positions shift them by the difference of the voltage factors.
+
+    Args:
+        tap_model: Tap model of the transformer
+        tap_position: Current tap position
+        min_step: Lowest allowed tap position
+        max_step: Highest allowed tap position
+        forecast_min: Forecast minimum street voltage per step [V]
+        forecast_max: Forecast maximum street voltage per step [V]
+        lower_limit: Lower voltage limit [V]
+        upper_limit: Upper voltage limit [V]
+        switch_cost: Cost of one tap operation [V]
+        deadline: perf_counter() value after which the search gives up, None for no limit
+
+    Returns:
+        TapPlan: Best plan, or an incomplete empty plan if the deadline passed
+    """
+    horizon = min(len(forecast_min), len(forecast_max))
+    low = max(min_step, tap_model.min_position)
+    high = min(max_step, tap_model.max_position)
+    # Checked before the factor lookup, a position outside the table has no factor
+    if not low <= tap_position <= high or horizon == 0:
+        return TapPlan(0, (), 0.0, 0, True)
+    nominal = tap_model.nominal_voltage
+    base = tap_model.factor(tap_position)
+    shifts = {tap: (tap_model.factor(tap) - base) * nominal for tap in range(low, high + 1)}
+    # (step, tap before the step's move) -> (best cost of the remaining steps, next tap)
+    memo: dict[tuple[int, int], tuple[float, int]] = {}
+    nodes = 0
+
+    def search(step: int, tap: int) -> float:
+        nonlocal nodes
+        if step == horizon:
+            return 0.0
+        cached = memo.get((step, tap))
+        if cached is not None:
+            return cached[0]
+        if deadline is not None and perf_counter() > deadline:
+            raise _BudgetExceeded
+        nodes += 1
+
+        best, best_tap = inf, tap
+        # Staying is tried first, so ties never cause a tap operation
+        for next_tap in (tap, tap + 1, tap - 1):
+            shift = shifts.get(next_tap)
+            if shift is None:
+                continue
+            cost = (
+                max(0.0, lower_limit - forecast_min[step] - shift)
+                + max(0.0, forecast_max[step] + shift - upper_limit)
+                + (switch_cost if next_tap != tap else 0.0)
+            )
+            # Remaining costs are never negative, so this branch cannot win
+            if cost >= best:
+                continue
+            cost += search(step + 1, next_tap)
+            if cost < best:
+                best, best_tap = cost, next_tap
+        memo[(step, tap)] = (best, best_tap)
+        return best
+
+    try:
+        cost = search(0, tap_position)
+    except _BudgetExceeded:
+        return TapPlan(0, (), inf, nodes, False)
+
+    taps = []
+    tap = tap_position
+    for step in range(horizon):
+        tap = memo[(step, tap)][1]
+        taps.append(tap)
+    return TapPlan(taps[0] - tap_position, tuple(taps), cost, nodes, True)
+
+
+class TapPlanner:
+    """
+    Planner mode of the controller: replaces the kernel's tap decision by the
+    first move of a planned tap sequence.
+
+    Keeps the last measured voltages of every transformer, relative to its
+    output voltage, for a linear voltage forecast. They live in trends, a dict
+    by default; with several worker processes a SharedTrends of the shared
+    state table, so the forecast does not depend on which worker handled the
+    previous step.
+    """
+
+    def __init__(
+        self,
+        horizon: int = PLANNER_HORIZON,
+        switch_cost: float = PLANNER_SWITCH_COST,
+        budget: float = PLANNER_BUDGET,
+        trends: MutableMapping[str, tuple[float, float]] | None = None,
+    ) -> None:
+        """
+        Create a planner.
+
+        Args:
+            horizon: Number of forecast steps searched
+            switch_cost: Cost of one tap operation [V]
+            budget: Time budget of one search [s]
+            trends: Last grid min/max voltages per transformer ID, a new dict if None
+        """
+        self.horizon = horizon
+        self.switch_cost = switch_cost
+        self.budget = budget
+        self.trends: MutableMapping[str, tuple[float, float]] = {} if trends is None else trends
+        self.plans = 0
+        self.budget_exceeded = 0
+
+    def plan(
+        self,
+        transformer_id: str,
+        tap_model: TapModel,
+        tap_position: int,
+        min_step: int,
+        max_step: int,
+        min_voltage: float,
+        max_voltage: float,
+        decision: ControlDecision,
+        deadline: float | None = None,
+        range_control_factor: float | None = None,
+    ) -> ControlDecision:
+        """
+        Plan the tap sequence of a step and adjust the kernel decision accordingly.
+
+        Spreading decisions are kept unchanged: no tap position can clear a
+        violation of both limits, and the kernel already blocks switching then.
+        So are decisions for a tap position outside the factor table, which has
+        no output voltage to forecast from.
+
+        Args:
+            transformer_id: Identifier of the transformer
+            tap_model: Tap model of the transformer
+            tap_position: Current tap position
+            min_step: Lowest allowed tap position
+            max_step: Highest allowed tap position
+            min_voltage: Measured minimum street voltage [V]
+            max_voltage: Measured maximum street voltage [V]
+            decision: Decision of the one-step kernel, providing the limits
+            deadline: perf_counter() time the search must end by at the latest, e.g. the
+                request deadline; the search budget applies if it is earlier
+            range_control_factor: Range control factor sent with the request, kept if the
+                plan switches higher; None keeps the factor of the kernel decision
+
+        Returns:
+            ControlDecision: Decision with the planned tap changer behavior
+        """
+        if not tap_model.has_position(tap_position):
+            return decision
+        budget_deadline = perf_counter() + self.budget
+        deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        # Trends are taken without the transformer's own output voltage, otherwise the
+        # jump caused by a tap operation would be extrapolated as a trend of the grid
+        output = tap_model.factor(tap_position) * tap_model.nominal_voltage
+        grid_min, grid_max = min_voltage - output, max_voltage - output
+        previous_min, previous_max = self.trends.get(transformer_id, (grid_min, grid_max))
+        self.trends[transformer_id] = (grid_min, grid_max)
+        if decision.spreading_detected:
+            return decision
+
+        result = plan_taps(
+            tap_model,
+            tap_position,
+            min_step,
+            max_step,
+            [output + voltage for voltage in linear_forecast(previous_min, grid_min, self.horizon)],
+            [output + voltage for voltage in linear_forecast(previous_max, grid_max, self.horizon)],
+            decision.lower_limit,
+            decision.upper_limit,
+            self.switch_cost,
+            deadline,
+        )
+        self.plans += 1
+        if not result.complete:
+            self.budget_exceeded += 1
+            return decision
+        behavior = STEP_BY_MOVE[result.move]
+        if behavior is eSteps.SWITCHHIGHER and range_control_factor is not None:
+            # Like the kernel: the factor is never increased in a step that switches higher
+            return decision._replace(
+                tapchanger_behavior=behavior,
+                range_control_factor=min(decision.range_control_factor, range_control_factor),
+            )
+        return decision._replace(tapchanger_behavior=behavior)
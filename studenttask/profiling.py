@@ -0,0 +1,216 @@
+"""
+On-demand CPU and allocation profiling of the running service.
+
+A Profiler does nothing until profile() is called, so a service that is not
+being profiled pays nothing for it: no tracing hook, no sampler thread and
+no allocation tracking. During a profile, the calling thread samples the
+Python stacks of all other threads every interval with sys._current_frames,
+and tracemalloc tracks allocations. Both stop when the window ends or once
+the given number of requests has been handled, whichever comes first.
+
+The CPU samples are returned in the collapsed stack format read by
+flamegraph.pl, speedscope and inferno: one line per distinct stack, the
+thread name first and frames root to leaf separated by ';', followed by the
+number of samples. Threads waiting for work are left out. The allocation
+report lists the source lines that allocated the most memory during the
+window which was still held at its end.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from time import perf_counter
+from types import CodeType, FrameType
+from typing import Any, NamedTuple
+
+# Default seconds between stack samples
+PROFILE_INTERVAL: float = 0.005
+
+# Longest profile window accepted [s]
+PROFILE_MAX_SECONDS: float = 60.0
+
+# Default number of source lines in the allocation report
+PROFILE_TOP_ALLOCATIONS: int = 25
+
+# Seconds between checks of the request count and the thread names
+_CHECK_INTERVAL: float = 0.05
+
+# (file name, function) of leaf frames of threads waiting for work
+IDLE_FRAMES: frozenset[tuple[str, str]] = frozenset(
+    {
+        ("threading.py", "wait"),
+        ("selectors.py", "select"),
+        ("thread.py", "_worker"),
+    }
+)
+
+
+class ProfileReport(NamedTuple):
+    """
+    CPU samples and allocations of one profile window.
+    """
+
+    duration: float
+    requests: int
+    samples: int
+    collapsed: str
+    allocations: list[dict[str, Any]]
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the report into a JSON serializable dict.
+
+        Returns:
+            dict: Report fields
+        """
+        return self._asdict()
+
+
+class Profiler:
+    """
+    Samples stacks and tracks allocations of the process for a bounded window.
+    """
+
+    def __init__(self, request_count: Callable[[], float] | None = None) -> None:
+        """
+        Create an idle profiler.
+
+        Args:
+            request_count: Returns the number of requests handled so far, needed to bound profiles by requests
+        """
+        self.request_count = request_count
+        self._running = threading.Lock()
+        # Frame labels per code object, formatting them on every sample would dominate its cost
+        self._labels: dict[CodeType, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def profile(
+        self,
+        seconds: float,
+        requests: int | None = None,
+        interval: float = PROFILE_INTERVAL,
+        top: int = PROFILE_TOP_ALLOCATIONS,
+        allocations: bool = True,
+    ) -> ProfileReport:
+        """
+        Profile the process, blocking the calling thread until the window ends.
+
+        Args:
+            seconds: Length of the window [s]
+            requests: Stop earlier once this many requests have been handled
+            interval: Seconds between stack samples
+            top: Number of source lines in the allocation report
+            allocations: Whether to track allocations with tracemalloc
+
+        Returns:
+            ProfileReport: Collapsed stacks and top allocations of the window
+
+        Raises:
+            ValueError: If the bounds are invalid or requests is given without request_count
+            RuntimeError: If a profile is already running
+        """
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            raise ValueError(f"Profile window must be longer than 0 and at most {PROFILE_MAX_SECONDS:g} s")
+        if interval <= 0 or top < 0:
+            raise ValueError("Sample interval must be positive and the allocation report size not negative")
+        if requests is not None and (requests <= 0 or self.request_count is None):
+            raise ValueError("Request bound must be positive and needs a request count")
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            return self._profile(seconds, requests, interval, top, allocations)
+        finally:
+            self._running.release()
+
+    def _profile(
+        self, seconds: float, requests: int | None, interval: float, top: int, allocations: bool
+    ) -> ProfileReport:
+        started_tracing = allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        baseline = tracemalloc.take_snapshot() if allocations else None
+        first_request = self.request_count() if self.request_count is not None else 0
+        handled = 0
+
+        own_thread = threading.get_ident()
+        stacks: Counter[str] = Counter()
+        samples = 0
+        names = _thread_names()
+        start = perf_counter()
+        end = start + seconds
+        next_check = start + _CHECK_INTERVAL
+        wait = threading.Event().wait
+        try:
+            while (now := perf_counter()) < end:
+                if now >= next_check:
+                    next_check = now + _CHECK_INTERVAL
+                    names = _thread_names()
+                    if self.request_count is not None:
+                        handled = int(self.request_count() - first_request)
+                        if requests is not None and handled >= requests:
+                            break
+                for ident, frame in sys._current_frames().items():
+                    if ident != own_thread and (stack := self._collapse(frame)) is not None:
+                        stacks[f"{names.get(ident, f'Thread-{ident}')};{stack}"] += 1
+                samples += 1
+                wait(interval)
+            duration = perf_counter() - start
+            if self.request_count is not None:
+                handled = int(self.request_count() - first_request)
+            top_allocations = _top_allocations(baseline, top) if baseline is not None else []
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return ProfileReport(duration, handled, samples, collapsed, top_allocations)
+
+    def _collapse(self, frame: FrameType) -> str | None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        labels = self._labels
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = (
+                    f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return ";".join(stack)
+
+
+def _thread_names() -> dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate() if thread.ident is not None}
+
+
+def _top_allocations(baseline: tracemalloc.Snapshot, top: int) -> list[dict[str, Any]]:
+    # Memory allocated since the baseline and still held, without the profiler's own bookkeeping
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+    differences = snapshot.compare_to(baseline.filter_traces(ignored), "lineno")
+    report = []
+    for difference in differences:
+        if len(report) == top:
+            break
+        if difference.size_diff <= 0:
+            continue
+        frame = difference.traceback[0]
+        report.append(
+            {
+                "location": f"{frame.filename}:{frame.lineno}",
+                "size": difference.size_diff,
+                "count": difference.count_diff,
+            }
+        )
+    return report
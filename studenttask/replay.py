@@ -0,0 +1,274 @@
+"""
+Offline replay of recorded simulation logs through the decision kernel.
+
+Each log file holds one step per line (JSONL) or row (CSV) with the fields of
+SimulatorUpdateData. In CSV files tapchanger_voltage_factors is a JSON
+encoded object. If a step also carries the recorded decision
+(tapchanger_behavior as eSteps value or name, spreading_detected and
+range_control_factor) it is compared against the kernel's decision. Like
+the service, the replay keeps a rolling window of U_max per transformer
+(the optional transformer_id field) that must stay clear of the upper limit
+before the range control factor is increased.
+
+Files are read with generators, so memory stays constant regardless of the
+file size, and independent files are replayed in parallel worker processes.
+
+Usage:
+    python -m studenttask.replay [--workers N] [--window N] FILE [FILE ...]
+"""
+
+import argparse
+import csv
+import json
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from .control import RANGE_CONTROL_WINDOW, decide
+from .eSteps import eSteps
+from .fleet import DEFAULT_TRANSFORMER_ID
+from .rolling import RollingWindow
+from .tap_model import get_tap_model
+
+# Number of diverging step indices kept per file
+MAX_REPORTED_DIVERGENCES: int = 20
+
+# Tolerance when comparing recorded and replayed range control factors
+FACTOR_TOLERANCE: float = 1e-9
+
+_INT_FIELDS = ("min_step_position", "max_step_position", "current_tapchanger_position")
+_FLOAT_FIELDS = (
+    "upper_voltage_band",
+    "lower_voltage_band",
+    "upper_voltage_safety",
+    "lower_voltage_safety",
+    "nominal_voltage",
+    "current_rangecontrol_factor",
+    "min_street_voltage",
+    "max_street_voltage",
+)
+
+
+class ReplayReport(NamedTuple):
+    """
+    Summary of replaying one log file.
+    """
+
+    path: str
+    steps: int
+    compared_steps: int
+    divergences: int
+    divergent_steps: list[int]
+    tap_operations: int
+    recorded_tap_operations: int
+    band_violations: int
+    safety_violations: int
+
+
+def iter_records(path: str | Path) -> Iterator[dict[str, Any]]:
+    """
+    Stream the steps of a log file as dicts with typed values.
+
+    Args:
+        path: JSONL (.jsonl/.json) or CSV (.csv) log file
+
+    Yields:
+        dict: Fields of one step
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with path.open(newline="") as file:
+        if suffix in (".jsonl", ".json"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        elif suffix == ".csv":
+            for row in csv.DictReader(file):
+                yield _coerce_csv_row(row)
+        else:
+            raise ValueError(f"Unsupported log file type '{suffix}'")
+
+
+def _coerce_csv_row(row: dict[str, str]) -> dict[str, Any]:
+    record: dict[str, Any] = dict(row)
+    for name in _INT_FIELDS:
+        record[name] = int(row[name])
+    for name in _FLOAT_FIELDS:
+        record[name] = float(row[name])
+    record["tapchanger_voltage_factors"] = json.loads(row["tapchanger_voltage_factors"])
+    if row.get("spreading_detected"):
+        record["spreading_detected"] = row["spreading_detected"].lower() in ("true", "1")
+    if row.get("range_control_factor"):
+        record["range_control_factor"] = float(row["range_control_factor"])
+    return record
+
+
+def _recorded_behavior(value: Any) -> eSteps | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and not value.lstrip("-").isdigit():
+        return eSteps[value.rsplit(".", 1)[-1]]
+    return eSteps(int(value))
+
+
+def replay_records(
+    records: Iterable[dict[str, Any]], path: str = "", window: int = RANGE_CONTROL_WINDOW
+) -> ReplayReport:
+    """
+    Replay a stream of steps through the decision kernel.
+
+    Args:
+        records: Steps as yielded by iter_records
+        path: Name of the source, used in the report
+        window: Number of U_max measurements per transformer that must stay clear of the
+            upper limit before the range control factor is increased, as RANGE_CONTROL_WINDOW
+
+    Returns:
+        ReplayReport: Divergences, tap operations and violations of the stream
+    """
+    steps = compared = divergences = 0
+    tap_operations = recorded_tap_operations = 0
+    band_violations = safety_violations = 0
+    divergent_steps: list[int] = []
+    previous_tap: int | None = None
+    windows: dict[str, RollingWindow] = {}
+
+    for step, record in enumerate(records):
+        tap = int(record["current_tapchanger_position"])
+        min_step = record["min_step_position"]
+        max_step = record["max_step_position"]
+        min_v = record["min_street_voltage"]
+        max_v = record["max_street_voltage"]
+        tap_model = get_tap_model(record["tapchanger_voltage_factors"], record["nominal_voltage"])
+        delta_higher, delta_lower = tap_model.neighbour_deltas(tap, min_step, max_step)
+        transformer_id = str(record.get("transformer_id", DEFAULT_TRANSFORMER_ID))
+        max_voltage_window = windows.get(transformer_id)
+        if max_voltage_window is None:
+            max_voltage_window = windows[transformer_id] = RollingWindow(window)
+        max_voltage_window.push(max_v)
+
+        decision = decide(
+            str(record["task"]),
+            min_v,
+            max_v,
+            tap,
+            min_step,
+            max_step,
+            record["upper_voltage_band"],
+            record["lower_voltage_band"],
+            record["upper_voltage_safety"],
+            record["lower_voltage_safety"],
+            record["current_rangecontrol_factor"],
+            delta_higher,
+            delta_lower,
+            range_increase_voltage=max_voltage_window.max,
+        )
+
+        steps += 1
+        tap_operations += decision.tapchanger_behavior is not eSteps.STAY
+        if previous_tap is not None and tap != previous_tap:
+            recorded_tap_operations += 1
+        previous_tap = tap
+        band_violations += (
+            min_v < record["lower_voltage_band"] or max_v > record["upper_voltage_band"]
+        )
+        safety_violations += (
+            min_v < record["lower_voltage_safety"] or max_v > record["upper_voltage_safety"]
+        )
+
+        behavior = _recorded_behavior(record.get("tapchanger_behavior"))
+        if behavior is None:
+            continue
+        compared += 1
+        recorded_factor = record.get("range_control_factor", decision.range_control_factor)
+        if (
+            behavior is not decision.tapchanger_behavior
+            or bool(record.get("spreading_detected", decision.spreading_detected))
+            != decision.spreading_detected
+            or abs(recorded_factor - decision.range_control_factor) > FACTOR_TOLERANCE
+        ):
+            divergences += 1
+            if len(divergent_steps) < MAX_REPORTED_DIVERGENCES:
+                divergent_steps.append(step)
+
+    return ReplayReport(
+        path=path,
+        steps=steps,
+        compared_steps=compared,
+        divergences=divergences,
+        divergent_steps=divergent_steps,
+        tap_operations=tap_operations,
+        recorded_tap_operations=recorded_tap_operations,
+        band_violations=band_violations,
+        safety_violations=safety_violations,
+    )
+
+
+def replay_file(path: str | Path, window: int = RANGE_CONTROL_WINDOW) -> ReplayReport:
+    """
+    Replay one log file.
+
+    Args:
+        path: JSONL or CSV log file
+        window: Rolling U_max window length per transformer, see replay_records
+
+    Returns:
+        ReplayReport: Report of the file
+    """
+    return replay_records(iter_records(path), str(path), window)
+
+
+def replay_files(
+    paths: Iterable[str | Path], workers: int | None = None, window: int = RANGE_CONTROL_WINDOW
+) -> Iterator[ReplayReport]:
+    """
+    Replay independent log files in parallel worker processes.
+
+    Args:
+        paths: Log files to replay
+        workers: Number of worker processes, defaults to the CPU count. 1 replays in-process.
+        window: Rolling U_max window length per transformer, see replay_records
+
+    Yields:
+        ReplayReport: One report per file, in the order of paths
+    """
+    paths = [str(path) for path in paths]
+    replay = partial(replay_file, window=window)
+    if workers == 1 or len(paths) <= 1:
+        yield from map(replay, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        yield from pool.map(replay, paths)
+
+
+def main() -> None:
+    """
+    Replay the given log files and print one summary line per file and a total.
+    """
+    parser = argparse.ArgumentParser(description="Replay recorded simulation logs")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--window", type=int, default=RANGE_CONTROL_WINDOW)
+    args = parser.parse_args()
+
+    totals = dict.fromkeys(("steps", "divergences", "tap_operations", "band_violations", "safety_violations"), 0)
+    for report in replay_files(args.files, args.workers, args.window):
+        print(
+            f"{report.path}: steps={report.steps} divergences={report.divergences}/{report.compared_steps} "
+            f"tap_operations={report.tap_operations} (recorded {report.recorded_tap_operations}) "
+            f"band_violations={report.band_violations} safety_violations={report.safety_violations}"
+            + (f" first_divergent_steps={report.divergent_steps}" if report.divergent_steps else "")
+        )
+        for key in totals:
+            totals[key] += getattr(report, key)
+    print("total: " + " ".join(f"{key}={value}" for key, value in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
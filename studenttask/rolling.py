@@ -0,0 +1,165 @@
+"""
+Fixed-size rolling window over a measurement stream.
+
+The window keeps the last samples in a preallocated ring buffer and updates
+its statistics incrementally, so pushing a sample never allocates and all
+statistics are available in constant (amortized) time:
+
+- minimum and maximum through monotonic deques, kept as ring buffers of
+  sample indices,
+- mean through a running sum,
+- exponentially weighted moving average (EWMA).
+"""
+
+from array import array
+
+# Recompute the running sum from the buffer every this many window lengths,
+# so float rounding errors of the incremental updates cannot accumulate
+_RESYNC_WINDOWS: int = 1024
+
+
+class RollingWindow:
+    """
+    Rolling statistics over the last size samples.
+    """
+
+    __slots__ = (
+        "size",
+        "alpha",
+        "ewma",
+        "count",
+        "_values",
+        "_sum",
+        "_max_indices",
+        "_max_head",
+        "_max_tail",
+        "_min_indices",
+        "_min_head",
+        "_min_tail",
+    )
+
+    def __init__(self, size: int, alpha: float | None = None) -> None:
+        """
+        Create an empty window.
+
+        Args:
+            size: Number of samples in the window
+            alpha: EWMA smoothing factor in (0, 1], defaults to 2 / (size + 1)
+
+        Raises:
+            ValueError: If size is not positive or alpha is out of range
+        """
+        if size <= 0:
+            raise ValueError("Rolling window size must be positive")
+        alpha = 2.0 / (size + 1) if alpha is None else alpha
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("EWMA smoothing factor must be in (0, 1]")
+        self.size = size
+        self.alpha = alpha
+        self.ewma = 0.0
+        # Total number of samples pushed, also the index of the next sample
+        self.count = 0
+        self._values = array("d", bytes(8 * size))
+        self._sum = 0.0
+        # Sample indices with decreasing (max) / increasing (min) values, oldest at head
+        self._max_indices = array("q", bytes(8 * size))
+        self._max_head = self._max_tail = 0
+        self._min_indices = array("q", bytes(8 * size))
+        self._min_head = self._min_tail = 0
+
+    def push(self, value: float) -> None:
+        """
+        Add a sample, dropping the oldest one if the window is full.
+
+        Args:
+            value: New sample
+        """
+        size = self.size
+        values = self._values
+        index = self.count
+        position = index % size
+        expired = index - size
+
+        if expired < 0:
+            self._sum += value
+            self.ewma = value if index == 0 else self.ewma + self.alpha * (value - self.ewma)
+        else:
+            if position == 0 and index % (size * _RESYNC_WINDOWS) == 0:
+                self._sum = sum(values)
+            self._sum += value - values[position]
+            self.ewma += self.alpha * (value - self.ewma)
+        values[position] = value
+
+        # Drop the expired sample from the deque heads, its slot was just overwritten
+        indices = self._max_indices
+        head = self._max_head
+        tail = self._max_tail
+        if indices[head % size] <= expired and head < tail:
+            head += 1
+            self._max_head = head
+        while tail > head and values[indices[(tail - 1) % size] % size] <= value:
+            tail -= 1
+        indices[tail % size] = index
+        self._max_tail = tail + 1
+
+        indices = self._min_indices
+        head = self._min_head
+        tail = self._min_tail
+        if indices[head % size] <= expired and head < tail:
+            head += 1
+            self._min_head = head
+        while tail > head and values[indices[(tail - 1) % size] % size] >= value:
+            tail -= 1
+        indices[tail % size] = index
+        self._min_tail = tail + 1
+
+        self.count = index + 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    @property
+    def max(self) -> float:
+        """
+        Get the largest sample in the window.
+
+        Raises:
+            IndexError: If the window is empty
+        """
+        if not self.count:
+            raise IndexError("Rolling window is empty")
+        return self._values[self._max_indices[self._max_head % self.size] % self.size]
+
+    @property
+    def min(self) -> float:
+        """
+        Get the smallest sample in the window.
+
+        Raises:
+            IndexError: If the window is empty
+        """
+        if not self.count:
+            raise IndexError("Rolling window is empty")
+        return self._values[self._min_indices[self._min_head % self.size] % self.size]
+
+    @property
+    def mean(self) -> float:
+        """
+        Get the mean of the samples in the window.
+
+        Raises:
+            IndexError: If the window is empty
+        """
+        if not self.count:
+            raise IndexError("Rolling window is empty")
+        return self._sum / len(self)
+
+    def values(self) -> list[float]:
+        """
+        Get the samples in the window, oldest first.
+
+        Returns:
+            list[float]: Up to size most recent samples
+        """
+        start = max(0, self.count - self.size)
+        return [self._values[i % self.size] for i in range(start, self.count)]
@@ -0,0 +1,179 @@
+"""
+Control sessions caching the static configuration of a simulation run.
+
+The voltage bands, safety limits, step range, nominal voltage, task and
+factor table never change during a run. A session is opened once with these
+fields, which validates the task against the known task modes and builds the tap
+model up front, so each step only carries the measurements, the tap
+position and the range control factor.
+
+Session IDs are derived from the configuration, so opening the same
+configuration again returns the same ID. A client that gets an unknown
+session ID back, e.g. after a restart or from another worker process,
+simply opens its session again.
+"""
+
+from collections import OrderedDict
+from collections.abc import Container
+from hashlib import blake2b
+from typing import Any
+
+from .control import TASK_SETTINGS
+from .tap_model import TapModel, tap_model_for
+
+# Default maximum number of open sessions
+SESSION_CAPACITY: int = 1024
+
+
+class ControlSession:
+    """
+    Resolved static configuration of one simulation run.
+    """
+
+    __slots__ = (
+        "session_id",
+        "transformer_id",
+        "task",
+        "limits",
+        "min_step",
+        "max_step",
+        "tap_model",
+    )
+
+    def __init__(self, session_id: str, config: Any, tasks: Container[str] = TASK_SETTINGS) -> None:
+        """
+        Resolve a static configuration.
+
+        Args:
+            session_id: Identifier of the session
+            config: SessionConfigData or an object with the same fields
+            tasks: Known task identifiers, e.g. a PipelineRegistry
+
+        Raises:
+            ValueError: If the task is unknown or the factor table is invalid
+        """
+        task = str(config.task)
+        if task not in tasks:
+            raise ValueError(f"Unknown task '{task}'")
+        self.session_id = session_id
+        self.transformer_id: str = config.transformer_id
+        self.task = task
+        # (upper band, lower band, upper safety, lower safety), as taken by control.decide
+        self.limits = (
+            float(config.upper_voltage_band),
+            float(config.lower_voltage_band),
+            float(config.upper_voltage_safety),
+            float(config.lower_voltage_safety),
+        )
+        self.min_step = int(config.min_step_position)
+        self.max_step = int(config.max_step_position)
+        self.tap_model: TapModel = tap_model_for(config)
+
+
+def session_id_for(config: Any) -> str:
+    """
+    Derive the session ID of a static configuration.
+
+    Args:
+        config: SessionConfigData or an object with the same fields
+
+    Returns:
+        str: 16 hex digits identifying the configuration
+    """
+    fields = (
+        config.transformer_id,
+        str(config.task),
+        config.matriculation_number,
+        float(config.upper_voltage_band),
+        float(config.lower_voltage_band),
+        float(config.upper_voltage_safety),
+        float(config.lower_voltage_safety),
+        int(config.min_step_position),
+        int(config.max_step_position),
+        float(config.nominal_voltage),
+        sorted(
+            (int(position), float(factor))
+            for position, factor in config.tapchanger_voltage_factors.items()
+        ),
+    )
+    return blake2b(repr(fields).encode(), digest_size=8).hexdigest()
+
+
+class SessionRegistry:
+    """
+    Bounded registry of open sessions, evicting the least recently used one when full.
+    """
+
+    def __init__(self, capacity: int = SESSION_CAPACITY, tasks: Container[str] = TASK_SETTINGS) -> None:
+        """
+        Create an empty registry.
+
+        Args:
+            capacity: Maximum number of open sessions
+            tasks: Known task identifiers, e.g. a PipelineRegistry
+
+        Raises:
+            ValueError: If capacity is not positive
+        """
+        if capacity <= 0:
+            raise ValueError("Session capacity must be positive")
+        self.capacity = capacity
+        self.tasks = tasks
+        self._sessions: OrderedDict[str, ControlSession] = OrderedDict()
+
+    def open(self, config: Any) -> ControlSession:
+        """
+        Open a session for a static configuration, reusing an open one with the same ID.
+
+        Args:
+            config: SessionConfigData or an object with the same fields
+
+        Returns:
+            ControlSession: Open session of the configuration
+
+        Raises:
+            ValueError: If the task is unknown or the factor table is invalid
+        """
+        session_id = session_id_for(config)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ControlSession(session_id, config, self.tasks)
+            if len(self._sessions) >= self.capacity:
+                self._sessions.popitem(last=False)
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get(self, session_id: str) -> ControlSession | None:
+        """
+        Get an open session.
+
+        Args:
+            session_id: Identifier returned by open
+
+        Returns:
+            ControlSession | None: The session, None if it is unknown or was evicted
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def close(self, session_id: str) -> bool:
+        """
+        Close a session.
+
+        Args:
+            session_id: Identifier returned by open
+
+        Returns:
+            bool: True if the session was open
+        """
+        return self._sessions.pop(session_id, None) is not None
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,373 @@
+"""
+Consistent-hash sharding of transformers over several controller replicas.
+
+The router sits between the simulator and a group of StudentTask replicas.
+It speaks the simulator's registration protocol, so a replica joins the
+group by using the router as its backend (BACKEND_URL) and registers and
+re-registers with it like it would with the simulator. The router registers
+the fleet (TRANSFORMER_IDS) with the simulator under its own URL and forwards
+every control request of a transformer to the replica owning it on a hash
+ring, so each transformer's state stays on one replica.
+
+The router sends heartbeats to its replicas. A replica that does not answer
+is taken off the ring: only its transformers move, each to the next replica
+on the ring. It is put back once it answers again (or registers again after
+a restart), which moves the same transformers back.
+
+Usage:
+    BACKEND_URL=http://simulator:8000 STUDENTTASK_ROUTER_URL=http://router:7770 \\
+        TRANSFORMER_IDS=T1,T2 python -m studenttask.sharding
+"""
+
+import os
+import threading
+from bisect import bisect_right
+from collections.abc import Iterable
+from hashlib import blake2b
+
+import requests
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from .api_client import CONNECTION_POOL_SIZE, APIClient, TaskRegistrationInfo
+from .fleet import DEFAULT_TRANSFORMER_ID
+
+# Points per replica on the hash ring, more points spread transformers more evenly
+VIRTUAL_NODES: int = 128
+
+# Request headers passed on to the replicas
+FORWARDED_HEADERS: tuple[str, ...] = ("content-type", "accept")
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping transformer IDs to replica URLs.
+    """
+
+    def __init__(self, replicas: Iterable[str] = (), virtual_nodes: int = VIRTUAL_NODES) -> None:
+        """
+        Create a ring.
+
+        Args:
+            replicas: Initial replica URLs
+            virtual_nodes: Points per replica on the ring
+
+        Raises:
+            ValueError: If virtual_nodes is not positive
+        """
+        if virtual_nodes <= 0:
+            raise ValueError("Hash ring needs at least one point per replica")
+        self.virtual_nodes = virtual_nodes
+        self._replicas: set[str] = set()
+        # Sorted points and their owners, replaced as a whole so lookups need no lock
+        self._ring: tuple[list[int], list[str]] = ([], [])
+        for replica in replicas:
+            self.add(replica)
+
+    def add(self, replica: str) -> bool:
+        """
+        Put a replica on the ring.
+
+        Args:
+            replica: Replica URL
+
+        Returns:
+            bool: True if the replica was not on the ring yet
+        """
+        if replica in self._replicas:
+            return False
+        self._replicas.add(replica)
+        self._rebuild()
+        return True
+
+    def remove(self, replica: str) -> bool:
+        """
+        Take a replica off the ring, moving its transformers to the following replicas.
+
+        Args:
+            replica: Replica URL
+
+        Returns:
+            bool: True if the replica was on the ring
+        """
+        if replica not in self._replicas:
+            return False
+        self._replicas.discard(replica)
+        self._rebuild()
+        return True
+
+    def lookup(self, transformer_id: str) -> str | None:
+        """
+        Get the replica owning a transformer.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            str | None: Replica URL, None if the ring is empty
+        """
+        points, owners = self._ring
+        if not points:
+            return None
+        return owners[bisect_right(points, _ring_hash(transformer_id)) % len(points)]
+
+    @property
+    def replicas(self) -> list[str]:
+        return sorted(self._replicas)
+
+    def __contains__(self, replica: object) -> bool:
+        return replica in self._replicas
+
+    def __len__(self) -> int:
+        return len(self._replicas)
+
+    def _rebuild(self) -> None:
+        ring = sorted(
+            (_ring_hash(f"{replica}#{node}"), replica)
+            for replica in self._replicas
+            for node in range(self.virtual_nodes)
+        )
+        self._ring = ([point for point, _ in ring], [replica for _, replica in ring])
+
+
+class ShardRouter:
+    """
+    Router forwarding control requests to the replica owning the transformer.
+    """
+
+    # Port of the router
+    ROUTER_PORT: int = int(os.environ.get("STUDENTTASK_ROUTER_PORT", "7770"))
+
+    # Seconds between heartbeats to the replicas
+    HEALTH_INTERVAL: float = float(os.environ.get("STUDENTTASK_ROUTER_HEALTH_INTERVAL", "2"))
+
+    # Seconds without heartbeat from the simulator before re-registering
+    HEARTBEAT_TIMEOUT: float = float(os.environ.get("HEARTBEAT_TIMEOUT", "30"))
+
+    def __init__(
+        self,
+        simulator_url: str,
+        router_url: str,
+        replicas: Iterable[str] = (),
+        transformer_ids: Iterable[str] = (),
+        timeout: float = 1.0,
+    ) -> None:
+        """
+        Initialize the router.
+
+        Args:
+            simulator_url: Base URL of the simulator
+            router_url: URL under which the simulator reaches the router
+            replicas: Replica URLs known up front, more can register later
+            transformer_ids: Transformers registered with the simulator, none for a single one
+            timeout: Timeout of forwarded requests and heartbeats [s]
+        """
+        self.router_url = router_url.rstrip("/")
+        self.transformer_ids = list(transformer_ids)
+        self.timeout = timeout
+        self.api_client = APIClient(simulator_url, f"{self.router_url}/", timeout)
+        self.ring = HashRing()
+        # Every replica that ever registered, including those currently off the ring
+        self.members: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_health = threading.Event()
+        self._health: threading.Thread | None = None
+
+        # Pooled keep-alive session reused for all forwarded requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=CONNECTION_POOL_SIZE, pool_maxsize=CONNECTION_POOL_SIZE
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        for replica in replicas:
+            self.add_replica(replica)
+        self._app: FastAPI | None = None
+
+    @property
+    def app(self) -> FastAPI:
+        """
+        Get the FastAPI app, building it on first access.
+
+        Returns:
+            FastAPI: App serving registration and the forwarded control endpoints
+        """
+        if self._app is None:
+            app = self.api_client.get_app()
+            app.post("/api/register/task")(self.register_replica)
+            app.post("/calculateControl/")(self.forward_control)
+            app.post("/calculateControlRaw/")(self.forward_control)
+            # Transformers are registered under the router's fleet URLs, so their heartbeats
+            # arrive here; the router answers them itself and keeps its own watchdog fed
+            app.get("/fleet/{transformer_id}/heartbeat/")(self.api_client.return_if_alive)
+            app.post("/fleet/{transformer_id}/{endpoint:path}")(self.forward_transformer_control)
+            self._app = app
+        return self._app
+
+    def add_replica(self, replica: str) -> None:
+        """
+        Add a replica to the group and put it on the ring.
+
+        Args:
+            replica: Replica URL
+        """
+        replica = replica.rstrip("/")
+        with self._lock:
+            self.members.add(replica)
+            if self.ring.add(replica):
+                logger.info(f"Replica {replica} joined, {len(self.ring)} on the ring")
+
+    def mark_down(self, replica: str) -> None:
+        """
+        Take an unreachable replica off the ring until it answers a heartbeat again.
+
+        Args:
+            replica: Replica URL
+        """
+        with self._lock:
+            if self.ring.remove(replica):
+                logger.warning(f"Replica {replica} is down, {len(self.ring)} left on the ring")
+
+    def register_replica(self, info: TaskRegistrationInfo) -> dict:
+        """
+        Handle the registration of a replica, like the simulator does.
+
+        A replica running in fleet mode registers one URL per transformer; all of
+        them count as the replica's base URL, the router decides which transformers
+        it serves.
+
+        Args:
+            info: URL of the replica
+
+        Returns:
+            dict: Confirmation
+        """
+        self.add_replica(info.studenttask_url.split("/fleet/")[0])
+        return {"registered": True}
+
+    async def forward_control(self, request: Request) -> Response:
+        """
+        Forward a request of the single transformer mode.
+
+        Args:
+            request: Control request from the simulator
+
+        Returns:
+            Response: Answer of the owning replica
+        """
+        return await self._forward(DEFAULT_TRANSFORMER_ID, request.url.path, request)
+
+    async def forward_transformer_control(self, transformer_id: str, endpoint: str, request: Request) -> Response:
+        """
+        Forward a fleet request to the replica owning the transformer.
+
+        Args:
+            transformer_id: Identifier of the transformer
+            endpoint: Path below the transformer's fleet URL
+            request: Control request from the simulator
+
+        Returns:
+            Response: Answer of the owning replica
+        """
+        return await self._forward(transformer_id, request.url.path, request)
+
+    async def _forward(self, transformer_id: str, path: str, request: Request) -> Response:
+        body = await request.body()
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        # A replica failing mid-request is taken off the ring and the next owner is tried
+        for _ in range(len(self.members) + 1):
+            replica = self.ring.lookup(transformer_id)
+            if replica is None:
+                break
+            try:
+                response = await run_in_threadpool(
+                    self.session.post, f"{replica}{path}", data=body, headers=headers, timeout=self.timeout
+                )
+            except requests.RequestException as error:
+                logger.warning(f"Forwarding to {replica} failed: {error}")
+                self.mark_down(replica)
+                continue
+            return Response(
+                response.content,
+                status_code=response.status_code,
+                media_type=response.headers.get("content-type"),
+            )
+        return JSONResponse(status_code=503, content={"detail": "No replica available"})
+
+    def check_replicas(self) -> None:
+        """
+        Send a heartbeat to every replica, moving them on or off the ring.
+        """
+        for replica in sorted(self.members):
+            try:
+                alive = self.session.get(f"{replica}/heartbeat/", timeout=self.timeout).status_code == 200
+            except requests.RequestException:
+                alive = False
+            if alive:
+                self.add_replica(replica)
+            else:
+                self.mark_down(replica)
+
+    def start_health_checks(self) -> None:
+        """
+        Start a background thread checking the replicas every HEALTH_INTERVAL seconds.
+        """
+        if self._health is not None and self._health.is_alive():
+            return
+        self._stop_health.clear()
+        self._health = threading.Thread(target=self._check_loop, name="replica-health", daemon=True)
+        self._health.start()
+
+    def stop_health_checks(self) -> None:
+        """
+        Stop the health check thread.
+        """
+        self._stop_health.set()
+        if self._health is not None:
+            self._health.join()
+            self._health = None
+
+    def _check_loop(self) -> None:
+        while not self._stop_health.wait(self.HEALTH_INTERVAL):
+            self.check_replicas()
+
+    def run(self) -> None:
+        """
+        Register the fleet with the simulator, check the replicas and serve.
+        """
+        urls = [f"{self.router_url}/fleet/{t}/" for t in self.transformer_ids] or [None]
+        self.api_client.start_watchdog(urls, self.HEARTBEAT_TIMEOUT)
+        self.start_health_checks()
+
+        # Imported here, only serving needs the ASGI server
+        import uvicorn
+
+        logger.info(f"Starting shard router on port {self.ROUTER_PORT}")
+        try:
+            uvicorn.run(self.app, host="0.0.0.0", port=self.ROUTER_PORT)
+        finally:
+            self.stop_health_checks()
+            self.api_client.stop_watchdog()
+
+
+def main() -> None:
+    """
+    Start the shard router configured from environment variables.
+    """
+    ShardRouter(
+        os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/"),
+        os.environ.get("STUDENTTASK_ROUTER_URL", f"http://localhost:{ShardRouter.ROUTER_PORT}"),
+        [url.strip() for url in os.environ.get("STUDENTTASK_REPLICAS", "").split(",") if url.strip()],
+        [t.strip() for t in os.environ.get("TRANSFORMER_IDS", "").split(",") if t.strip()],
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
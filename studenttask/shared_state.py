@@ -0,0 +1,447 @@
+"""
+Per-transformer controller state in a shared-memory segment.
+
+Used when serving with several uvicorn worker processes, so every worker
+sees the same counters, range factor history, rolling voltage window and
+planner trend no matter which worker handled the previous step of a
+transformer.
+
+The segment holds fixed-size arrays (struct of arrays) with one row per
+transformer. Rows are found by open addressing on a 64-bit hash of the
+transformer ID. Inserting a new transformer takes a file lock, updating an
+existing row does not: the simulator waits for the answer of a step before
+sending the next one, so a row is never written by two workers at once.
+
+Tap models are not stored in the segment: they are derived deterministically
+from the factor table sent with every update and cached per process.
+"""
+
+import fcntl
+import os
+import tempfile
+from collections.abc import Iterator, MutableMapping
+from hashlib import blake2b
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .control import ControlDecision
+from .fleet import FleetRegistry, TransformerState
+from .tap_model import TapModel
+
+# Magic number and layout version at the start of the segment
+SHARED_STATE_MAGIC: int = 0x53545354  # "STST"
+SHARED_STATE_VERSION: int = 3
+
+# Maximum number of bytes of a transformer ID kept in the segment
+ID_LENGTH: int = 64
+
+# Columns of the counters array
+_LOWER, _HIGHER, _STAY, _STEPS, _SPREADING, _CHANGES = range(6)
+_COUNTER_COLUMNS = 6
+
+# Header fields: magic, version, capacity, history length, window length
+_HEADER_FIELDS = 5
+
+
+def transformer_key(transformer_id: str) -> int:
+    """
+    Get the non-zero 64-bit hash of a transformer ID used as row key.
+
+    Args:
+        transformer_id: Identifier of the transformer
+
+    Returns:
+        int: Row key, never 0 (marks empty rows)
+    """
+    digest = blake2b(transformer_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class SharedStateTable:
+    """
+    Fixed-capacity table of transformer states in shared memory.
+    """
+
+    def __init__(
+        self,
+        name: str | None = None,
+        capacity: int = 4096,
+        history_length: int = TransformerState.HISTORY_LENGTH,
+        window_length: int = TransformerState.WINDOW_LENGTH,
+        create: bool = True,
+    ) -> None:
+        """
+        Create a new segment or attach to an existing one.
+
+        Args:
+            name: Segment name, generated if None when creating
+            capacity: Maximum number of transformers (ignored when attaching)
+            history_length: Range factors kept per transformer (ignored when attaching)
+            window_length: Measurements in the rolling voltage window (ignored when attaching)
+            create: Create a new segment instead of attaching to an existing one
+
+        Raises:
+            ValueError: If an attached segment has a different magic or version
+        """
+        self.created = create
+        if create:
+            size = self._layout(capacity, history_length, window_length)[-1]
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray((_HEADER_FIELDS,), np.int64, self._shm.buf)
+            header[:] = (SHARED_STATE_MAGIC, SHARED_STATE_VERSION, capacity, history_length, window_length)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the creating process may unlink the segment when it exits
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+            header = np.ndarray((_HEADER_FIELDS,), np.int64, self._shm.buf)
+            if header[0] != SHARED_STATE_MAGIC or header[1] != SHARED_STATE_VERSION:
+                self._shm.close()
+                raise ValueError(f"Shared memory segment '{name}' has an incompatible layout")
+            capacity, history_length, window_length = int(header[2]), int(header[3]), int(header[4])
+
+        self.name = self._shm.name
+        self.capacity = capacity
+        self.history_length = history_length
+        self.window_length = window_length
+        offsets = self._layout(capacity, history_length, window_length)
+        buffer = self._shm.buf
+        self.heartbeat = np.ndarray((1,), np.float64, buffer, offsets[0])
+        self.keys = np.ndarray((capacity,), np.uint64, buffer, offsets[1])
+        self.ids = np.ndarray((capacity,), f"S{ID_LENGTH}", buffer, offsets[2])
+        self.counters = np.ndarray((capacity, _COUNTER_COLUMNS), np.uint64, buffer, offsets[3])
+        self.history = np.ndarray((capacity, history_length), np.float64, buffer, offsets[4])
+        self.history_index = np.ndarray((capacity,), np.uint64, buffer, offsets[5])
+        self.windows = np.ndarray((capacity, window_length), np.float64, buffer, offsets[6])
+        self.window_index = np.ndarray((capacity,), np.uint64, buffer, offsets[7])
+        # Last grid min/max voltage of the planner, NaN until the first plan
+        self.trends = np.ndarray((capacity, 2), np.float64, buffer, offsets[8])
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{self.name.lstrip('/')}.lock")
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedStateTable":
+        """
+        Attach to a segment created by another process.
+
+        Args:
+            name: Segment name
+
+        Returns:
+            SharedStateTable: Table backed by the existing segment
+        """
+        return cls(name, create=False)
+
+    @staticmethod
+    def _layout(capacity: int, history_length: int, window_length: int) -> list[int]:
+        # Offsets of heartbeat, keys, ids, counters, history, history index, windows,
+        # window index, planner trends and the total size
+        sizes = (8, 8 * capacity, ID_LENGTH * capacity, 8 * _COUNTER_COLUMNS * capacity,
+                 8 * history_length * capacity, 8 * capacity, 8 * window_length * capacity, 8 * capacity,
+                 16 * capacity)
+        offsets = [8 * _HEADER_FIELDS]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+        return offsets
+
+    def find(self, transformer_id: str) -> int | None:
+        """
+        Find the row of a transformer.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            int | None: Row index or None if the transformer has no row yet
+        """
+        key = transformer_key(transformer_id)
+        index = key % self.capacity
+        for _ in range(self.capacity):
+            row_key = int(self.keys[index])
+            if row_key == key:
+                return index
+            if row_key == 0:
+                return None
+            index = (index + 1) % self.capacity
+        return None
+
+    def row(self, transformer_id: str) -> int:
+        """
+        Get the row of a transformer, inserting it on first access.
+
+        Args:
+            transformer_id: Identifier of the transformer
+
+        Returns:
+            int: Row index
+
+        Raises:
+            RuntimeError: If the table is full
+        """
+        index = self.find(transformer_id)
+        if index is not None:
+            return index
+        key = transformer_key(transformer_id)
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have inserted the row while waiting for the lock
+            index = key % self.capacity
+            for _ in range(self.capacity):
+                row_key = int(self.keys[index])
+                if row_key == key:
+                    return index
+                if row_key == 0:
+                    self.ids[index] = transformer_id.encode()[:ID_LENGTH]
+                    self.trends[index] = np.nan
+                    # Publish the key last, readers treat a set key as a complete row
+                    self.keys[index] = key
+                    return index
+                index = (index + 1) % self.capacity
+        raise RuntimeError(f"Shared state table '{self.name}' is full ({self.capacity} transformers)")
+
+    def transformer_ids(self) -> list[str]:
+        """
+        Get the IDs of all transformers with a row.
+
+        Returns:
+            list[str]: Transformer IDs (truncated to ID_LENGTH bytes)
+        """
+        return [self.ids[i].decode() for i in np.flatnonzero(self.keys)]
+
+    def close(self) -> None:
+        """
+        Detach from the segment and remove it if this process created it.
+        """
+        # Drop the array views first, the buffer cannot be released while exported
+        del self.heartbeat, self.keys, self.ids, self.counters, self.history, self.history_index
+        del self.windows, self.window_index, self.trends
+        try:
+            self._shm.close()
+        except BufferError:
+            # Views held elsewhere (e.g. by transformer states) keep the mapping alive
+            # until they are garbage collected, unlinking below still removes the segment
+            pass
+        if self.created:
+            # Worker processes may share this process' resource tracker and unregister the
+            # segment when attaching, register it again so unlinking does not fail there
+            resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
+            try:
+                os.remove(self._lock_path)
+            except FileNotFoundError:
+                pass
+
+
+class SharedWindow:
+    """
+    Rolling window of maximum street voltages backed by a row of a SharedStateTable.
+
+    Offers push, max, len and values like RollingWindow. The window is short, so
+    the maximum is taken over the samples on every access instead of keeping a
+    monotonic queue in shared memory.
+    """
+
+    __slots__ = ("size", "_table", "_row", "_values")
+
+    def __init__(self, table: SharedStateTable, row: int) -> None:
+        """
+        Bind to the window of a row.
+
+        Args:
+            table: Shared table holding the window
+            row: Row of the transformer
+        """
+        self.size = table.window_length
+        self._table = table
+        self._row = row
+        self._values = table.windows[row]
+
+    @property
+    def count(self) -> int:
+        return int(self._table.window_index[self._row])
+
+    def push(self, value: float) -> None:
+        """
+        Add a sample, dropping the oldest once the window is full.
+
+        Args:
+            value: New sample
+        """
+        index = self.count
+        self._values[index % self.size] = value
+        self._table.window_index[self._row] = index + 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    @property
+    def max(self) -> float:
+        """
+        Get the largest sample in the window.
+
+        Raises:
+            IndexError: If the window is empty
+        """
+        if not self.count:
+            raise IndexError("Rolling window is empty")
+        return float(self._values[: len(self)].max())
+
+    def values(self) -> list[float]:
+        """
+        Get the samples in the window, oldest first.
+
+        Returns:
+            list[float]: Up to size most recent samples
+        """
+        count = self.count
+        return [float(self._values[i % self.size]) for i in range(max(0, count - self.size), count)]
+
+
+class SharedTransformerState:
+    """
+    TransformerState backed by a row of a SharedStateTable.
+
+    Offers the same attributes and methods as TransformerState.
+    """
+
+    HISTORY_LENGTH: int = TransformerState.HISTORY_LENGTH
+
+    __slots__ = (
+        "transformer_id",
+        "tap_model",
+        "max_voltage_window",
+        "_table",
+        "_row",
+        "_counters",
+        "_history",
+    )
+
+    def __init__(self, transformer_id: str, table: SharedStateTable) -> None:
+        """
+        Bind to the transformer's row, inserting it if needed.
+
+        Args:
+            transformer_id: Identifier of the transformer
+            table: Shared table holding the state
+        """
+        self.transformer_id = transformer_id
+        self.tap_model: TapModel | None = None
+        self._table = table
+        self._row = table.row(transformer_id)
+        self.max_voltage_window = SharedWindow(table, self._row)
+        self._counters = table.counters[self._row]
+        self._history = table.history[self._row]
+
+    @property
+    def decision_counts(self) -> np.ndarray:
+        return self._counters[_LOWER:_STAY + 1]
+
+    @property
+    def step_count(self) -> int:
+        return int(self._counters[_STEPS])
+
+    @property
+    def spreading_count(self) -> int:
+        return int(self._counters[_SPREADING])
+
+    @property
+    def range_factor_changes(self) -> int:
+        return int(self._counters[_CHANGES])
+
+    def observe(self, max_voltage: float) -> None:
+        """
+        Add the measured maximum street voltage of a step to the rolling window.
+
+        Args:
+            max_voltage: Maximum measured street voltage [V]
+        """
+        self.max_voltage_window.push(max_voltage)
+
+    def record(self, decision: ControlDecision, previous_range_factor: float) -> None:
+        """
+        Update counters and history with a finished decision.
+
+        Args:
+            decision: Decision returned to the simulator
+            previous_range_factor: Range control factor sent with the update
+        """
+        counters = self._counters
+        counters[decision.tapchanger_behavior.value] += 1
+        if decision.spreading_detected:
+            counters[_SPREADING] += 1
+        if decision.range_control_factor != previous_range_factor:
+            counters[_CHANGES] += 1
+        index = int(self._table.history_index[self._row])
+        self._history[index % self._table.history_length] = decision.range_control_factor
+        self._table.history_index[self._row] = index + 1
+        counters[_STEPS] += 1
+
+    def recent_range_factors(self) -> list[float]:
+        """
+        Get the recorded range control factors, oldest first.
+
+        Returns:
+            list[float]: Up to history_length most recent factors
+        """
+        length = self._table.history_length
+        end = int(self._table.history_index[self._row])
+        start = max(0, end - length)
+        return [float(self._history[i % length]) for i in range(start, end)]
+
+
+class SharedTrends(MutableMapping[str, tuple[float, float]]):
+    """
+    Planner trends per transformer ID backed by a SharedStateTable, see TapPlanner.
+    """
+
+    def __init__(self, table: SharedStateTable) -> None:
+        """
+        Bind to the trends of a table.
+
+        Args:
+            table: Shared table holding the trends
+        """
+        self._table = table
+
+    def _set_row(self, transformer_id: str) -> int | None:
+        index = self._table.find(transformer_id)
+        if index is None or np.isnan(self._table.trends[index, 0]):
+            return None
+        return index
+
+    def __getitem__(self, transformer_id: str) -> tuple[float, float]:
+        index = self._set_row(transformer_id)
+        if index is None:
+            raise KeyError(transformer_id)
+        low, high = self._table.trends[index]
+        return float(low), float(high)
+
+    def __setitem__(self, transformer_id: str, value: tuple[float, float]) -> None:
+        self._table.trends[self._table.row(transformer_id)] = value
+
+    def __delitem__(self, transformer_id: str) -> None:
+        index = self._set_row(transformer_id)
+        if index is None:
+            raise KeyError(transformer_id)
+        self._table.trends[index] = np.nan
+
+    def __iter__(self) -> Iterator[str]:
+        table = self._table
+        for index in np.flatnonzero(table.keys):
+            if not np.isnan(table.trends[index, 0]):
+                yield table.ids[index].decode()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def shared_fleet(table: SharedStateTable) -> FleetRegistry:
+    """
+    Create a fleet registry whose transformer states live in a shared table.
+
+    Args:
+        table: Shared table holding the states, including their rolling voltage windows
+
+    Returns:
+        FleetRegistry: Registry creating SharedTransformerState records
+    """
+    return FleetRegistry(lambda transformer_id: SharedTransformerState(transformer_id, table))
@@ -0,0 +1,394 @@
+"""
+In-process feeder simulator for closed-loop runs without the backend.
+
+Models the minimum and maximum street voltage of a low-voltage feeder from
+load and PV profiles, the tap changer voltage factors and the range control
+factor, and drives a controller such as StudentTask.calculate_control
+directly in a tight loop.
+
+Usage:
+    python -m studenttask.simulation [--task 4] [--steps 86400] [--seed 0]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .control import RANGE_CONTROL_INCREASE_BUFFER, RANGE_CONTROL_MODIFIER, RANGE_CONTROL_WINDOW, decide
+from .eSteps import eSteps
+from .rolling import RollingWindow
+from .tap_model import tap_model_for
+
+# Default 5 position tap changer as used by the course simulator
+DEFAULT_TAP_FACTORS: dict[int, float] = {-2: 0.95, -1: 0.98, 0: 1.0, 1: 1.02, 2: 1.05}
+
+Controller = Callable[["FeederUpdate"], dict]
+
+
+class FeederUpdate:
+    """
+    Mutable stand-in for SimulatorUpdateData reused for every simulation step.
+
+    Offers the same attributes and getters as SimulatorUpdateData, so it can be
+    passed to calculate_control, but is updated in place instead of being
+    rebuilt and validated per step.
+    """
+
+    __slots__ = (
+        "task",
+        "matriculation_number",
+        "upper_voltage_band",
+        "lower_voltage_band",
+        "upper_voltage_safety",
+        "lower_voltage_safety",
+        "min_step_position",
+        "max_step_position",
+        "nominal_voltage",
+        "current_tapchanger_position",
+        "tapchanger_voltage_factors",
+        "current_rangecontrol_factor",
+        "min_street_voltage",
+        "max_street_voltage",
+    )
+
+    def __init__(self, **fields) -> None:
+        """
+        Initialize the update with the given SimulatorUpdateData fields.
+
+        Args:
+            **fields: Values for all SimulatorUpdateData fields
+        """
+        self.task = ""
+        self.matriculation_number = ""
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def get_current_tapchanger_position(self) -> int:
+        return self.current_tapchanger_position
+
+    def get_tapchanger_voltage_factor(self, step: int) -> float:
+        return self.tapchanger_voltage_factors[str(step)]
+
+    def get_range_control_factor(self) -> float:
+        return self.current_rangecontrol_factor
+
+    def get_min_street_voltage(self) -> float:
+        return self.min_street_voltage
+
+    def get_max_street_voltage(self) -> float:
+        return self.max_street_voltage
+
+
+class KernelController:
+    """
+    Lightweight controller calling the decision kernel directly.
+
+    Skips the web layer, fleet state and logging of StudentTask, which makes it
+    cheap to create one per parameter set, e.g. in parameter sweeps.
+    """
+
+    def __init__(
+        self,
+        range_control_modifier: float = RANGE_CONTROL_MODIFIER,
+        range_control_increase_buffer: float = RANGE_CONTROL_INCREASE_BUFFER,
+        use_safety_limits: bool = True,
+        range_control_window: int = RANGE_CONTROL_WINDOW,
+    ) -> None:
+        """
+        Initialize the controller.
+
+        Args:
+            range_control_modifier: Step size of a range control factor adjustment
+            range_control_increase_buffer: Required buffer to the upper limit before increasing the factor [V]
+            use_safety_limits: If False the voltage band is used in place of the safety limits
+            range_control_window: Number of U_max measurements whose maximum must stay
+                below the buffer before the range control factor is increased
+        """
+        self.range_control_modifier = range_control_modifier
+        self.range_control_increase_buffer = range_control_increase_buffer
+        self.use_safety_limits = use_safety_limits
+        self.max_voltage_window = RollingWindow(range_control_window)
+
+    def __call__(self, update: "FeederUpdate") -> dict:
+        tap = update.current_tapchanger_position
+        window = self.max_voltage_window
+        window.push(update.max_street_voltage)
+        delta_higher, delta_lower = tap_model_for(update).neighbour_deltas(
+            tap, update.min_step_position, update.max_step_position
+        )
+        if self.use_safety_limits:
+            upper_safety, lower_safety = update.upper_voltage_safety, update.lower_voltage_safety
+        else:
+            upper_safety, lower_safety = update.upper_voltage_band, update.lower_voltage_band
+        decision = decide(
+            update.task,
+            update.min_street_voltage,
+            update.max_street_voltage,
+            tap,
+            update.min_step_position,
+            update.max_step_position,
+            update.upper_voltage_band,
+            update.lower_voltage_band,
+            upper_safety,
+            lower_safety,
+            update.current_rangecontrol_factor,
+            delta_higher,
+            delta_lower,
+            self.range_control_modifier,
+            self.range_control_increase_buffer,
+            window.max,
+        )
+        return {
+            "tapchanger_behavior": decision.tapchanger_behavior,
+            "spreading_detected": decision.spreading_detected,
+            "range_control_factor": decision.range_control_factor,
+        }
+
+
+class SimulationResult(NamedTuple):
+    """
+    Per-step traces and summary of a closed-loop simulation run.
+    """
+
+    min_voltage: NDArray[np.float64]
+    max_voltage: NDArray[np.float64]
+    tap_position: NDArray[np.int64]
+    spreading_detected: NDArray[np.bool_]
+    range_control_factor: NDArray[np.float64]
+    band_violations: int
+    safety_violations: int
+    tap_operations: int
+    runtime: float
+
+
+def daily_profiles(
+    steps: int = 86400, seed: int = 0
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+    Generate normalized load and PV profiles for one day.
+
+    Load has a morning and an evening peak, PV follows a midday bell curve with
+    random cloud dips. Both are in [0, 1].
+
+    Args:
+        steps: Number of equidistant steps over the day
+        seed: Seed of the random noise
+
+    Returns:
+        tuple: Load profile and PV profile
+    """
+    rng = np.random.default_rng(seed)
+    hours = np.linspace(0.0, 24.0, steps, endpoint=False)
+    load = (
+        0.25
+        + 0.45 * np.exp(-(((hours - 7.5) / 1.5) ** 2))
+        + 0.65 * np.exp(-(((hours - 19.0) / 2.0) ** 2))
+    )
+    load += rng.normal(0.0, 0.03, steps).cumsum() / np.sqrt(steps) * 10
+    pv = np.exp(-(((hours - 13.0) / 3.0) ** 2))
+    clouds = np.repeat(rng.uniform(0.4, 1.0, steps // 600 + 1), 600)[:steps]
+    pv *= clouds
+    return np.clip(load, 0.0, 1.0), np.clip(pv, 0.0, 1.0)
+
+
+class FeederSimulator:
+    """
+    Simple voltage model of one feeder behind an on-load tap changer.
+
+    The voltage at the transformer is nominal_voltage * factor(tap). Load lowers
+    the voltage along the feeder, PV feed-in raises it, and the range control
+    factor scales how much of the PV rise reaches the feeder.
+    """
+
+    def __init__(
+        self,
+        load_profile: NDArray[np.float64],
+        pv_profile: NDArray[np.float64],
+        tap_factors: dict[int, float] | None = None,
+        nominal_voltage: float = 230.0,
+        task: str = "4",
+        upper_voltage_band: float = 253.0,
+        lower_voltage_band: float = 207.0,
+        upper_voltage_safety: float = 248.0,
+        lower_voltage_safety: float = 212.0,
+        load_drop: float = 40.0,
+        pv_rise: float = 35.0,
+        initial_tap: int = 0,
+        initial_range_factor: float = 1.0,
+    ) -> None:
+        """
+        Initialize the simulator.
+
+        Args:
+            load_profile: Normalized load per step
+            pv_profile: Normalized PV feed-in per step
+            tap_factors: Voltage factor per tap position
+            nominal_voltage: Reference voltage level of the grid [V]
+            task: Task identifier sent to the controller
+            upper_voltage_band: Upper voltage band limit [V]
+            lower_voltage_band: Lower voltage band limit [V]
+            upper_voltage_safety: Upper safety voltage limit [V]
+            lower_voltage_safety: Lower safety voltage limit [V]
+            load_drop: Voltage drop at the feeder end at full load [V]
+            pv_rise: Voltage rise at the feeder end at full PV feed-in [V]
+            initial_tap: Tap position at the start of the run
+            initial_range_factor: Range control factor at the start of the run
+
+        Raises:
+            ValueError: If the profiles differ in length
+        """
+        if len(load_profile) != len(pv_profile):
+            raise ValueError("Load and PV profiles must have the same length")
+        self.load_profile = np.asarray(load_profile, dtype=np.float64)
+        self.pv_profile = np.asarray(pv_profile, dtype=np.float64)
+        # Python floats are considerably faster than numpy scalars in the step loop
+        self._load = self.load_profile.tolist()
+        self._pv = self.pv_profile.tolist()
+        self.tap_factors = dict(tap_factors or DEFAULT_TAP_FACTORS)
+        self.nominal_voltage = nominal_voltage
+        self.load_drop = load_drop
+        self.pv_rise = pv_rise
+        self.initial_tap = initial_tap
+        self.initial_range_factor = initial_range_factor
+        self.limits = (upper_voltage_band, lower_voltage_band, upper_voltage_safety, lower_voltage_safety)
+        self.task = task
+
+    def __len__(self) -> int:
+        return len(self.load_profile)
+
+    def street_voltages(self, step: int, tap: int, range_factor: float) -> tuple[float, float]:
+        """
+        Get the minimum and maximum street voltage of a step.
+
+        Args:
+            step: Index into the profiles
+            tap: Current tap position
+            range_factor: Current range control factor
+
+        Returns:
+            tuple[float, float]: Minimum and maximum street voltage [V]
+        """
+        base = self.nominal_voltage * self.tap_factors[tap]
+        load = self._load[step] * self.load_drop
+        rise = self._pv[step] * self.pv_rise * range_factor
+        # Strongly loaded and strongly feeding branches of the feeder
+        return base - load + 0.2 * rise, base + rise - 0.2 * load
+
+    def make_update(self) -> FeederUpdate:
+        """
+        Create the update object passed to the controller.
+
+        Returns:
+            FeederUpdate: Update with the static configuration of this feeder
+        """
+        upper_band, lower_band, upper_safety, lower_safety = self.limits
+        return FeederUpdate(
+            task=self.task,
+            upper_voltage_band=upper_band,
+            lower_voltage_band=lower_band,
+            upper_voltage_safety=upper_safety,
+            lower_voltage_safety=lower_safety,
+            min_step_position=min(self.tap_factors),
+            max_step_position=max(self.tap_factors),
+            nominal_voltage=self.nominal_voltage,
+            tapchanger_voltage_factors={str(k): v for k, v in self.tap_factors.items()},
+            current_tapchanger_position=self.initial_tap,
+            current_rangecontrol_factor=self.initial_range_factor,
+            min_street_voltage=0.0,
+            max_street_voltage=0.0,
+        )
+
+    def run(self, controller: Controller, steps: int | None = None) -> SimulationResult:
+        """
+        Run the closed loop of simulator and controller.
+
+        Args:
+            controller: Callable taking an update and returning the control result dict
+            steps: Number of steps to run, defaults to the profile length
+
+        Returns:
+            SimulationResult: Traces and summary of the run
+        """
+        steps = len(self) if steps is None else min(steps, len(self))
+        min_trace = np.empty(steps)
+        max_trace = np.empty(steps)
+        tap_trace = np.empty(steps, dtype=np.int64)
+        spreading_trace = np.empty(steps, dtype=bool)
+        factor_trace = np.empty(steps)
+
+        update = self.make_update()
+        tap = self.initial_tap
+        range_factor = self.initial_range_factor
+        min_tap, max_tap = update.min_step_position, update.max_step_position
+        street_voltages = self.street_voltages
+        lower, higher = eSteps.SWITCHLOWER, eSteps.SWITCHHIGHER
+
+        start = time.perf_counter()
+        for step in range(steps):
+            min_v, max_v = street_voltages(step, tap, range_factor)
+            update.min_street_voltage = min_v
+            update.max_street_voltage = max_v
+            update.current_tapchanger_position = tap
+            update.current_rangecontrol_factor = range_factor
+
+            result = controller(update)
+
+            min_trace[step] = min_v
+            max_trace[step] = max_v
+            tap_trace[step] = tap
+            spreading_trace[step] = result["spreading_detected"]
+            range_factor = factor_trace[step] = result["range_control_factor"]
+            behavior = result["tapchanger_behavior"]
+            if behavior is higher and tap < max_tap:
+                tap += 1
+            elif behavior is lower and tap > min_tap:
+                tap -= 1
+        runtime = time.perf_counter() - start
+
+        upper_band, lower_band, upper_safety, lower_safety = self.limits
+        return SimulationResult(
+            min_voltage=min_trace,
+            max_voltage=max_trace,
+            tap_position=tap_trace,
+            spreading_detected=spreading_trace,
+            range_control_factor=factor_trace,
+            band_violations=int(np.count_nonzero((min_trace < lower_band) | (max_trace > upper_band))),
+            safety_violations=int(np.count_nonzero((min_trace < lower_safety) | (max_trace > upper_safety))),
+            tap_operations=int(np.count_nonzero(np.diff(tap_trace))),
+            runtime=runtime,
+        )
+
+
+def main() -> None:
+    """
+    Run one simulated day against StudentTask and print the summary.
+    """
+    from .decision_log import StructuredLogger
+    from .StudentTask import StudentTask
+
+    parser = argparse.ArgumentParser(description="Closed-loop feeder simulation")
+    parser.add_argument("--task", default="4")
+    parser.add_argument("--steps", type=int, default=86400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    student_task = StudentTask()
+    # Per-step log records would dominate the runtime of an offline run
+    student_task.structured_log = StructuredLogger(enabled=False)
+
+    load, pv = daily_profiles(args.steps, args.seed)
+    result = FeederSimulator(load, pv, task=args.task).run(student_task.calculate_control)
+    print(
+        f"steps={args.steps} runtime={result.runtime:.3f}s "
+        f"tap_operations={result.tap_operations} band_violations={result.band_violations} "
+        f"safety_violations={result.safety_violations} "
+        f"spreading_steps={int(result.spreading_detected.sum())}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Compact binary snapshots of the controller state for warm restarts.
+
+A snapshot holds everything a restarted controller would otherwise have to
+rebuild from the following steps: per-transformer history, rolling voltage
+windows and counters, the tap models in use and the decision caches. It is
+written periodically and on shutdown, and read with a single file read at
+startup.
+
+Layout (little-endian): a fixed header with magic number, layout version,
+history and window lengths, creation time and a CRC32 of the body, then the
+distinct tap models and one record per transformer referring to them by
+index. A snapshot with another version or other buffer lengths, or one that
+is truncated or corrupt, raises SnapshotError instead of being restored
+partially. Snapshots are written to a temporary file first and renamed, so
+a crash while writing leaves the previous snapshot in place.
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import Callable, Iterable, Mapping
+from pathlib import Path
+from typing import NamedTuple
+
+from .control import ControlDecision
+from .decision_cache import DecisionCache, DecisionKey
+from .eSteps import eSteps
+from .fleet import TransformerState
+from .rolling import RollingWindow
+from .tap_model import TapModel, get_tap_model
+
+# Magic number and layout version at the start of every snapshot
+SNAPSHOT_MAGIC: int = 0x534E5053  # "SNPS"
+SNAPSHOT_VERSION: int = 1
+
+# Default seconds between periodic snapshots
+SNAPSHOT_INTERVAL: float = 30.0
+
+# Header: magic, version, history length, window length, tap models, transformers, creation time, body CRC32
+_HEADER = struct.Struct("<IIIIIIdI")
+# Tap model: nominal voltage, lowest position, number of positions, followed by the factors
+_TAP_MODEL = struct.Struct("<diI")
+# Transformer: ID length, tap model index (-1 for none), decisions per eSteps value, steps,
+# spreading detections, range factor changes, history index, followed by the ID and the history
+_STATE = struct.Struct("<HiQQQQQQQ")
+# Rolling window: sample count, EWMA, running sum, max deque head/tail, min deque head/tail,
+# followed by the samples and both deques
+_WINDOW = struct.Struct("<QddQQQQ")
+# Decision cache: tap model index (-1 for none), resolution, number of entries
+_CACHE = struct.Struct("<idI")
+# Cache entry after the task length and task: key fields, then the decision
+_ENTRY = struct.Struct("<iiidddddqqqB?dddb")
+
+# Attempts at copying a state consistently while requests may update it
+_COPY_ATTEMPTS: int = 4
+
+_STEPS: dict[int, eSteps] = {step.value: step for step in eSteps}
+
+
+class SnapshotError(ValueError):
+    """
+    Raised for snapshots that are incompatible, truncated or corrupt.
+    """
+
+
+class CacheSnapshot(NamedTuple):
+    """
+    Decision cache of one transformer.
+    """
+
+    tap_model: TapModel | None
+    resolution: float
+    entries: list[tuple[DecisionKey, ControlDecision]]
+
+
+class Snapshot(NamedTuple):
+    """
+    Restored controller state.
+    """
+
+    created: float
+    states: list[TransformerState]
+    caches: dict[str, CacheSnapshot]
+
+
+def encode_snapshot(
+    states: Iterable[TransformerState],
+    caches: Mapping[str, DecisionCache],
+    window_length: int,
+    history_length: int = TransformerState.HISTORY_LENGTH,
+    created: float | None = None,
+    on_skip: Callable[[str], None] | None = None,
+) -> bytes:
+    """
+    Encode transformer states and decision caches into a snapshot.
+
+    States may be updated by requests while they are encoded; a state changing
+    while it is copied is copied again. A state still changing after the last
+    attempt is left out with its cache rather than written torn, the restarted
+    controller rebuilds it from the following steps.
+
+    Args:
+        states: In-process transformer states
+        caches: Decision caches per transformer ID
+        window_length: Length of the rolling voltage windows of the states
+        history_length: Length of the range factor histories of the states
+        created: Creation time written to the header, now if None
+        on_skip: Called with the ID of every state left out, e.g. to log it
+
+    Returns:
+        bytes: Snapshot
+
+    Raises:
+        ValueError: If a state has other buffer lengths
+    """
+    tap_models: dict[tuple, int] = {}
+    models = bytearray()
+    body = bytearray()
+
+    def model_index(model: TapModel | None) -> int:
+        if model is None:
+            return -1
+        index = tap_models.get(model.fingerprint)
+        if index is None:
+            index = tap_models[model.fingerprint] = len(tap_models)
+            models.extend(_TAP_MODEL.pack(model.nominal_voltage, model.min_position, len(model)))
+            models.extend(model.factors.tobytes())
+        return index
+
+    count = 0
+    for state in states:
+        window = state.max_voltage_window
+        if window.size != window_length or len(state.range_factor_history) != history_length:
+            raise ValueError(f"State of '{state.transformer_id}' has other buffer lengths than the snapshot")
+        record = _copy_state(state, model_index)
+        if record is None:
+            if on_skip is not None:
+                on_skip(state.transformer_id)
+            continue
+        body.extend(record)
+        cache = caches.get(state.transformer_id)
+        if cache is None:
+            body.extend(_CACHE.pack(-1, 0.0, 0))
+        else:
+            tap_model, entries = cache.entries()
+            body.extend(_CACHE.pack(model_index(tap_model), cache.resolution, len(entries)))
+            for key, decision in entries:
+                task = key[0].encode()
+                body.append(len(task))
+                body.extend(task)
+                body.extend(
+                    _ENTRY.pack(
+                        *key[1:],
+                        decision.tapchanger_behavior.value,
+                        decision.spreading_detected,
+                        decision.range_control_factor,
+                        decision.lower_limit,
+                        decision.upper_limit,
+                        decision.violation,
+                    )
+                )
+        count += 1
+
+    payload = bytes(models + body)
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        history_length,
+        window_length,
+        len(tap_models),
+        count,
+        time.time() if created is None else created,
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def _copy_state(state: TransformerState, model_index: Callable[[TapModel | None], int]) -> bytes | None:
+    # Snapshots copy the private buffers directly, SNAPSHOT_VERSION guards their layout.
+    # step_count and window.count are updated last, so a copy during an update shows in them.
+    window: RollingWindow = state.max_voltage_window
+    transformer_id = state.transformer_id.encode()
+    for _ in range(_COPY_ATTEMPTS):
+        steps, samples = state.step_count, window.count
+        record = b"".join(
+            (
+                _STATE.pack(
+                    len(transformer_id),
+                    model_index(state.tap_model),
+                    *state.decision_counts,
+                    state.step_count,
+                    state.spreading_count,
+                    state.range_factor_changes,
+                    state._history_index,
+                ),
+                transformer_id,
+                state.range_factor_history.tobytes(),
+                _WINDOW.pack(
+                    window.count,
+                    window.ewma,
+                    window._sum,
+                    window._max_head,
+                    window._max_tail,
+                    window._min_head,
+                    window._min_tail,
+                ),
+                window._values.tobytes(),
+                window._max_indices.tobytes(),
+                window._min_indices.tobytes(),
+            )
+        )
+        if state.step_count == steps and window.count == samples:
+            return record
+    # Updated during every attempt
+    return None
+
+
+def decode_snapshot(
+    data: bytes,
+    window_length: int,
+    history_length: int = TransformerState.HISTORY_LENGTH,
+) -> Snapshot:
+    """
+    Decode a snapshot written by encode_snapshot.
+
+    Args:
+        data: Snapshot
+        window_length: Rolling window length the restored states must have
+        history_length: Range factor history length the restored states must have
+
+    Returns:
+        Snapshot: Restored states and decision caches
+
+    Raises:
+        SnapshotError: If the snapshot is of another version or buffer lengths, truncated or corrupt
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, history, window, model_count, state_count, created, crc = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a controller snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {version} is not supported, expected {SNAPSHOT_VERSION}")
+    if history != history_length or window != window_length:
+        raise SnapshotError(
+            f"Snapshot has history length {history} and window length {window}, "
+            f"expected {history_length} and {window_length}"
+        )
+    payload = memoryview(data)[_HEADER.size:]
+    if zlib.crc32(payload) != crc:
+        raise SnapshotError("Snapshot is truncated or corrupt")
+    try:
+        return _decode_payload(payload, window, history, model_count, state_count, created)
+    except (struct.error, ValueError, KeyError, UnicodeDecodeError) as error:
+        raise SnapshotError(f"Snapshot is malformed: {error}") from error
+
+
+def _decode_payload(
+    payload: memoryview, window_length: int, history_length: int, model_count: int, state_count: int, created: float
+) -> Snapshot:
+    offset = 0
+
+    def take(size: int) -> memoryview:
+        nonlocal offset
+        if offset + size > len(payload):
+            raise ValueError("unexpected end of data")
+        chunk = payload[offset:offset + size]
+        offset += size
+        return chunk
+
+    def buffer(typecode: str, length: int) -> array:
+        values = array(typecode)
+        values.frombytes(take(length * values.itemsize))
+        return values
+
+    tap_models = []
+    for _ in range(model_count):
+        nominal_voltage, min_position, length = _TAP_MODEL.unpack(take(_TAP_MODEL.size))
+        factors = buffer("d", length)
+        # Built through the tap model cache, so it is warm for the following updates
+        tap_models.append(
+            get_tap_model({min_position + i: factor for i, factor in enumerate(factors)}, nominal_voltage)
+        )
+
+    def model(index: int) -> TapModel | None:
+        return None if index < 0 else tap_models[index]
+
+    states = []
+    caches = {}
+    for _ in range(state_count):
+        id_length, model_index, lower, higher, stay, steps, spreading, changes, history_index = _STATE.unpack(
+            take(_STATE.size)
+        )
+        state = TransformerState(bytes(take(id_length)).decode(), window_length)
+        state.tap_model = model(model_index)
+        state.decision_counts = array("Q", (lower, higher, stay))
+        state.step_count = steps
+        state.spreading_count = spreading
+        state.range_factor_changes = changes
+        state._history_index = history_index
+        state.range_factor_history = buffer("d", history_length)
+
+        window = state.max_voltage_window
+        (
+            window.count,
+            window.ewma,
+            window._sum,
+            window._max_head,
+            window._max_tail,
+            window._min_head,
+            window._min_tail,
+        ) = _WINDOW.unpack(take(_WINDOW.size))
+        window._values = buffer("d", window_length)
+        window._max_indices = buffer("q", window_length)
+        window._min_indices = buffer("q", window_length)
+        states.append(state)
+
+        model_index, resolution, entry_count = _CACHE.unpack(take(_CACHE.size))
+        entries = []
+        for _ in range(entry_count):
+            task = bytes(take(take(1)[0])).decode()
+            *key, behavior, spreading_detected, factor, lower_limit, upper_limit, violation = _ENTRY.unpack(
+                take(_ENTRY.size)
+            )
+            entries.append(
+                (
+                    (task, *key),
+                    ControlDecision(_STEPS[behavior], spreading_detected, factor, lower_limit, upper_limit, violation),
+                )
+            )
+        if resolution > 0:
+            caches[state.transformer_id] = CacheSnapshot(model(model_index), resolution, entries)
+
+    if offset != len(payload):
+        raise ValueError("trailing data")
+    return Snapshot(created, states, caches)
+
+
+def write_snapshot(path: str | os.PathLike, data: bytes) -> None:
+    """
+    Write a snapshot atomically, replacing the previous one.
+
+    Args:
+        path: Snapshot file
+        data: Snapshot from encode_snapshot
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def read_snapshot(
+    path: str | os.PathLike,
+    window_length: int,
+    history_length: int = TransformerState.HISTORY_LENGTH,
+) -> Snapshot:
+    """
+    Read and decode a snapshot file.
+
+    Args:
+        path: Snapshot file
+        window_length: Rolling window length the restored states must have
+        history_length: Range factor history length the restored states must have
+
+    Returns:
+        Snapshot: Restored states and decision caches
+
+    Raises:
+        OSError: If the file cannot be read
+        SnapshotError: If the snapshot cannot be restored
+    """
+    return decode_snapshot(Path(path).read_bytes(), window_length, history_length)
+
+
+class SnapshotWriter:
+    """
+    Background thread saving snapshots periodically and once more when stopped.
+    """
+
+    def __init__(self, save: Callable[[], None], interval: float = SNAPSHOT_INTERVAL) -> None:
+        """
+        Create a stopped writer.
+
+        Args:
+            save: Takes and writes one snapshot
+            interval: Seconds between snapshots
+        """
+        self.save = save
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """
+        Start saving snapshots every interval seconds.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the thread and save a final snapshot.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.save()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.save()
@@ -0,0 +1,371 @@
+"""
+Parallel parameter sweep for range control tuning.
+
+Runs every sampled parameter set (range control modifier, increase buffer,
+window length and safety/band limit choice) against a number of simulated
+load scenarios in worker processes. Results are streamed to an output
+directory in chunks of columns as they finish, so a crashed sweep keeps all
+finished chunks and memory does not grow with the number of results.
+Configurations are ranked by band violations, then by tap operations.
+
+Output directory:
+    configs.npz          - Parameter columns, indexed by config_index
+    chunk-<n>.npz        - Result columns (SweepResult fields) of one chunk
+
+Read it back with load_results. The best configuration can be applied to the
+service with the environment variables printed at the end.
+
+Usage:
+    python -m studenttask.sweep --method lhs --samples 64 --scenarios 8 --output sweep
+"""
+
+import argparse
+import itertools
+import os
+from array import array
+from collections.abc import Iterator
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .simulation import FeederSimulator, KernelController, daily_profiles
+
+# Default ranges of the continuous parameters: (low, high)
+DEFAULT_MODIFIER_RANGE: tuple[float, float] = (0.02, 0.3)
+DEFAULT_BUFFER_RANGE: tuple[float, float] = (0.0, 3.0)
+DEFAULT_WINDOW_RANGE: tuple[int, int] = (1, 64)
+
+# Results written per chunk file
+SWEEP_CHUNK_SIZE: int = 256
+
+
+class SweepConfig(NamedTuple):
+    """
+    One parameter set of a sweep.
+    """
+
+    range_control_modifier: float
+    range_control_increase_buffer: float
+    use_safety_limits: bool
+    range_control_window: int
+
+
+class SweepResult(NamedTuple):
+    """
+    Outcome of one parameter set on one scenario.
+    """
+
+    config_index: int
+    scenario: int
+    band_violations: int
+    safety_violations: int
+    tap_operations: int
+    spreading_steps: int
+
+
+class RankedConfig(NamedTuple):
+    """
+    Aggregated outcome of one parameter set over all scenarios.
+    """
+
+    config: SweepConfig
+    band_violations: int
+    tap_operations: int
+
+
+def sample_configs(
+    method: str,
+    samples: int,
+    modifier_range: tuple[float, float] = DEFAULT_MODIFIER_RANGE,
+    buffer_range: tuple[float, float] = DEFAULT_BUFFER_RANGE,
+    safety_choices: tuple[bool, ...] = (True, False),
+    seed: int = 0,
+    window_range: tuple[int, int] = DEFAULT_WINDOW_RANGE,
+) -> list[SweepConfig]:
+    """
+    Sample parameter sets.
+
+    Args:
+        method: "grid" (samples points per axis), "random" or "lhs" (Latin hypercube)
+        samples: Points per axis for grid, total samples per safety choice otherwise
+        modifier_range: Range of the range control modifier
+        buffer_range: Range of the range control increase buffer [V]
+        safety_choices: Safety/band limit choices to combine with every sample
+        seed: Random seed for random and lhs sampling
+        window_range: Range of the range control window length, sampled as integers
+
+    Returns:
+        list[SweepConfig]: Sampled parameter sets
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    rng = np.random.default_rng(seed)
+    if method == "grid":
+        unit = np.array(
+            list(itertools.product(np.linspace(0.0, 1.0, samples), repeat=3))
+        ).reshape(-1, 3)
+    elif method == "random":
+        unit = rng.random((samples, 3))
+    elif method == "lhs":
+        # One sample per stratum and axis, strata shuffled independently per axis
+        strata = np.stack([rng.permutation(samples) for _ in range(3)], axis=1)
+        unit = (strata + rng.random((samples, 3))) / samples
+    else:
+        raise ValueError(f"Unknown sampling method '{method}'")
+
+    modifiers = modifier_range[0] + unit[:, 0] * (modifier_range[1] - modifier_range[0])
+    buffers = buffer_range[0] + unit[:, 1] * (buffer_range[1] - buffer_range[0])
+    windows = np.rint(window_range[0] + unit[:, 2] * (window_range[1] - window_range[0])).astype(int)
+    return [
+        SweepConfig(float(modifier), float(buffer), safety, int(window))
+        for safety in safety_choices
+        for modifier, buffer, window in zip(modifiers, buffers, windows)
+    ]
+
+
+@lru_cache(maxsize=64)
+def _scenario_profiles(scenario: int, steps: int) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    # Cached per worker process, every worker runs many configs on the same scenarios
+    return daily_profiles(steps, seed=scenario)
+
+
+def run_job(job: tuple[int, SweepConfig, int, int, str]) -> SweepResult:
+    """
+    Simulate one parameter set on one scenario.
+
+    Args:
+        job: Config index, config, scenario seed, number of steps and task
+
+    Returns:
+        SweepResult: Violations and tap operations of the run
+    """
+    config_index, config, scenario, steps, task = job
+    load, pv = _scenario_profiles(scenario, steps)
+    result = FeederSimulator(load, pv, task=task).run(KernelController(*config))
+    return SweepResult(
+        config_index,
+        scenario,
+        result.band_violations,
+        result.safety_violations,
+        result.tap_operations,
+        int(result.spreading_detected.sum()),
+    )
+
+
+def run_sweep(
+    configs: list[SweepConfig],
+    scenarios: int,
+    steps: int = 86400,
+    task: str = "4",
+    workers: int | None = None,
+) -> Iterator[SweepResult]:
+    """
+    Run all parameter sets on all scenarios in worker processes.
+
+    Args:
+        configs: Parameter sets to evaluate
+        scenarios: Number of load scenarios (seeds 0..scenarios-1)
+        steps: Steps per scenario
+        task: Task identifier sent to the controller
+        workers: Number of worker processes, defaults to the CPU count. 1 runs in-process.
+
+    Yields:
+        SweepResult: Results in completion order
+    """
+    jobs = [
+        (index, config, scenario, steps, task)
+        for scenario in range(scenarios)
+        for index, config in enumerate(configs)
+    ]
+    if workers == 1:
+        yield from map(run_job, jobs)
+        return
+    with Pool(processes=workers or os.cpu_count()) as pool:
+        yield from pool.imap_unordered(run_job, jobs, chunksize=max(1, len(jobs) // 256))
+
+
+class ResultWriter:
+    """
+    Streams sweep results to chunk files and keeps per-config totals for ranking.
+    """
+
+    def __init__(
+        self, directory: str | os.PathLike, configs: list[SweepConfig], chunk_size: int = SWEEP_CHUNK_SIZE
+    ) -> None:
+        """
+        Create the output directory and write the parameter columns.
+
+        Args:
+            directory: Output directory, existing chunk files in it are replaced
+            configs: Parameter sets referenced by config_index
+            chunk_size: Results buffered before a chunk file is written
+
+        Raises:
+            ValueError: If chunk_size is not positive
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob("chunk-*.npz"):
+            stale.unlink()
+        self.configs = configs
+        self.chunk_size = chunk_size
+        self.chunks = 0
+        self.written = 0
+        self._buffer: dict[str, array] = {name: array("q") for name in SweepResult._fields}
+        # Aggregates needed for ranking, one entry per config
+        self.band_violations = np.zeros(len(configs), dtype=np.int64)
+        self.tap_operations = np.zeros(len(configs), dtype=np.int64)
+        _save_atomic(
+            self.directory / "configs.npz",
+            range_control_modifier=np.array([c.range_control_modifier for c in configs]),
+            range_control_increase_buffer=np.array([c.range_control_increase_buffer for c in configs]),
+            use_safety_limits=np.array([c.use_safety_limits for c in configs], dtype=bool),
+            range_control_window=np.array([c.range_control_window for c in configs], dtype=np.int64),
+        )
+
+    def append(self, result: SweepResult) -> None:
+        """
+        Append one result, writing a chunk file once chunk_size results are buffered.
+
+        Args:
+            result: Result to append
+        """
+        for name, value in zip(SweepResult._fields, result):
+            self._buffer[name].append(value)
+        self.band_violations[result.config_index] += result.band_violations
+        self.tap_operations[result.config_index] += result.tap_operations
+        if len(self._buffer["config_index"]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered results as the next chunk file.
+        """
+        buffered = len(self._buffer["config_index"])
+        if not buffered:
+            return
+        _save_atomic(
+            self.directory / f"chunk-{self.chunks:06d}.npz",
+            **{name: np.frombuffer(column, dtype=np.int64).copy() for name, column in self._buffer.items()},
+        )
+        self.chunks += 1
+        self.written += buffered
+        self._buffer = {name: array("q") for name in SweepResult._fields}
+
+    def close(self) -> None:
+        """
+        Write the remaining buffered results.
+        """
+        self.flush()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        # Also on errors, so a crashed sweep keeps everything finished so far
+        self.close()
+
+    def __len__(self) -> int:
+        return self.written + len(self._buffer["config_index"])
+
+    def rank(self) -> list[RankedConfig]:
+        """
+        Rank parameter sets by band violations, then by tap operations.
+
+        Safety violations are not added: the safety limits lie inside the band, so every
+        band violation is a safety violation as well and would be counted twice.
+
+        Returns:
+            list[RankedConfig]: Parameter sets, best first
+        """
+        order = np.lexsort((self.tap_operations, self.band_violations))
+        return [
+            RankedConfig(self.configs[i], int(self.band_violations[i]), int(self.tap_operations[i])) for i in order
+        ]
+
+
+def _save_atomic(path: Path, **columns: NDArray) -> None:
+    # Written under a temporary name and renamed, so a crash never leaves a partial file
+    temporary = path.with_name(f".{path.name}.tmp")
+    with open(temporary, "wb") as file:
+        np.savez(file, **columns)
+    os.replace(temporary, path)
+
+
+def load_results(directory: str | os.PathLike) -> dict[str, NDArray]:
+    """
+    Read the results of a sweep written by ResultWriter.
+
+    Args:
+        directory: Output directory of the sweep
+
+    Returns:
+        dict: Result columns concatenated over all chunks and the parameter columns
+    """
+    directory = Path(directory)
+    columns: dict[str, list[NDArray]] = {name: [] for name in SweepResult._fields}
+    for path in sorted(directory.glob("chunk-*.npz")):
+        with np.load(path) as chunk:
+            for name, parts in columns.items():
+                parts.append(chunk[name])
+    results = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64) for name, parts in columns.items()
+    }
+    with np.load(directory / "configs.npz") as configs:
+        results.update({name: configs[name] for name in configs.files})
+    return results
+
+
+def main() -> None:
+    """
+    Run a sweep from the command line and print the best configurations.
+    """
+    parser = argparse.ArgumentParser(description="Range control parameter sweep")
+    parser.add_argument("--method", choices=("grid", "random", "lhs"), default="lhs")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--scenarios", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=86400)
+    parser.add_argument("--task", default="4")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="sweep", help="Output directory")
+    parser.add_argument("--chunk-size", type=int, default=SWEEP_CHUNK_SIZE)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    configs = sample_configs(args.method, args.samples, seed=args.seed)
+    with ResultWriter(args.output, configs, args.chunk_size) as writer:
+        for result in run_sweep(configs, args.scenarios, args.steps, args.task, args.workers):
+            writer.append(result)
+
+    print(f"{len(configs)} configurations x {args.scenarios} scenarios -> {args.output}/")
+    ranking = writer.rank()
+    for rank, ranked in enumerate(ranking[: args.top], start=1):
+        config = ranked.config
+        print(
+            f"{rank:>3}. modifier={config.range_control_modifier:.3f} "
+            f"buffer={config.range_control_increase_buffer:.2f}V "
+            f"window={config.range_control_window} "
+            f"limits={'safety' if config.use_safety_limits else 'band'} "
+            f"band_violations={ranked.band_violations} tap_operations={ranked.tap_operations}"
+        )
+    if ranking:
+        best = ranking[0].config
+        print("Apply the best configuration with:")
+        print(
+            f"  RANGE_CONTROL_MODIFIER={best.range_control_modifier:.4f} "
+            f"RANGE_CONTROL_INCREASE_BUFFER={best.range_control_increase_buffer:.4f} "
+            f"RANGE_CONTROL_WINDOW={best.range_control_window} "
+            f"RANGE_CONTROL_LIMITS={'safety' if best.use_safety_limits else 'band'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Tap changer model built from the voltage factors sent by the simulator.
+
+A TapModel is immutable and built once per distinct factor table. All
+lookups are O(1) array accesses and searching for the number of steps
+needed for a given voltage shift is a binary search over the factors.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any
+
+# Maximum number of distinct factor tables kept in the cache
+TAP_MODEL_CACHE_SIZE: int = 256
+
+# Tolerance when comparing voltage shifts against factor differences [p.u.]
+_FACTOR_EPSILON: float = 1e-12
+
+Fingerprint = tuple[float, tuple[tuple[int, float], ...]]
+
+
+class TapModel:
+    """
+    Array-backed voltage factor table with a precomputed voltage delta matrix.
+
+    Positions must form a contiguous integer range and the factors must be
+    strictly monotonic over that range.
+    """
+
+    __slots__ = (
+        "fingerprint",
+        "nominal_voltage",
+        "min_position",
+        "max_position",
+        "factors",
+        "_size",
+        "_deltas",
+        "_ascending",
+        "_sorted_factors",
+    )
+
+    def __init__(self, factors: Mapping[int, float], nominal_voltage: float) -> None:
+        """
+        Build the factor table and delta matrix.
+
+        Args:
+            factors: Mapping of tap position to voltage factor
+            nominal_voltage: Reference voltage level of the grid [V]
+
+        Raises:
+            ValueError: If the table is empty, has gaps or is not strictly monotonic
+        """
+        if not factors:
+            raise ValueError("Tap model needs at least one voltage factor")
+
+        positions = sorted(factors)
+        if positions[-1] - positions[0] + 1 != len(positions):
+            raise ValueError(f"Tap positions must be contiguous, got {positions}")
+
+        self.nominal_voltage = float(nominal_voltage)
+        self.min_position = positions[0]
+        self.max_position = positions[-1]
+        self.factors = array("d", (float(factors[p]) for p in positions))
+        self._size = len(self.factors)
+        self.fingerprint = fingerprint_of(factors, nominal_voltage)
+
+        pairs = list(zip(self.factors, self.factors[1:]))
+        self._ascending = all(low < high for low, high in pairs)
+        if not self._ascending and not all(low > high for low, high in pairs):
+            raise ValueError("Tap voltage factors must be strictly monotonic")
+        self._sorted_factors = (
+            self.factors if self._ascending else array("d", reversed(self.factors))
+        )
+
+        # Row-major matrix of (factor[current] - factor[new]) * nominal voltage
+        self._deltas = array(
+            "d",
+            (
+                (current - new) * self.nominal_voltage
+                for current in self.factors
+                for new in self.factors
+            ),
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return (
+            f"TapModel(positions={self.min_position}..{self.max_position}, "
+            f"nominal_voltage={self.nominal_voltage})"
+        )
+
+    def has_position(self, position: int) -> bool:
+        """
+        Check whether a tap position exists in the model.
+
+        Args:
+            position: Tap position to check
+
+        Returns:
+            bool: True if the position has a voltage factor
+        """
+        return self.min_position <= position <= self.max_position
+
+    def factor(self, position: int) -> float:
+        """
+        Get the voltage factor for a tap position.
+
+        Args:
+            position: Tap position
+
+        Returns:
+            float: Voltage factor of the position
+
+        Raises:
+            IndexError: If the position is out of range
+        """
+        if not self.has_position(position):
+            raise IndexError(f"Tap position {position} out of range")
+        return self.factors[position - self.min_position]
+
+    def delta(self, tap_current: int, tap_new: int) -> float:
+        """
+        Get the voltage delta caused by switching between two tap positions.
+
+        The sign follows (factor[current] - factor[new]) * nominal_voltage, so
+        the new street voltage is approximately the old one minus the delta.
+
+        Args:
+            tap_current: Current tap position
+            tap_new: Tap position after switching
+
+        Returns:
+            float: Voltage delta [V]
+
+        Raises:
+            IndexError: If one of the positions is out of range
+        """
+        if not (self.has_position(tap_current) and self.has_position(tap_new)):
+            raise IndexError(f"Tap positions {tap_current}->{tap_new} out of range")
+        return self._deltas[
+            (tap_current - self.min_position) * self._size + tap_new - self.min_position
+        ]
+
+    def neighbour_deltas(
+        self, tap_current: int, min_step: int, max_step: int
+    ) -> tuple[float, float]:
+        """
+        Get the voltage deltas for switching one tap higher and one tap lower.
+
+        Args:
+            tap_current: Current tap position
+            min_step: Lowest allowed tap position
+            max_step: Highest allowed tap position
+
+        Returns:
+            tuple[float, float]: Deltas for switching higher and lower, 0.0 if
+                the neighbouring tap is not reachable
+        """
+        index = tap_current - self.min_position
+        if not 0 <= index < self._size:
+            return 0.0, 0.0
+        row = index * self._size + index
+        delta_higher = (
+            self._deltas[row + 1]
+            if tap_current < max_step and index + 1 < self._size
+            else 0.0
+        )
+        delta_lower = (
+            self._deltas[row - 1] if tap_current > min_step and index > 0 else 0.0
+        )
+        return delta_higher, delta_lower
+
+    def steps_for_shift(self, tap_current: int, voltage_shift: float) -> int | None:
+        """
+        Get the smallest number of tap steps that shifts the voltage by at least voltage_shift.
+
+        Args:
+            tap_current: Current tap position
+            voltage_shift: Required voltage change [V], positive to raise and negative to lower
+
+        Returns:
+            int | None: Signed number of steps (positive = higher position), 0 if no
+                shift is needed or None if the shift cannot be reached within the table
+
+        Raises:
+            IndexError: If the current position is out of range
+        """
+        current = self.factor(tap_current)
+        if voltage_shift == 0:
+            return 0
+        target = current + voltage_shift / self.nominal_voltage
+        if voltage_shift > 0:
+            # Smallest factor >= target
+            idx = bisect_left(self._sorted_factors, target - _FACTOR_EPSILON)
+            if idx >= self._size:
+                return None
+        else:
+            # Largest factor <= target
+            idx = bisect_right(self._sorted_factors, target + _FACTOR_EPSILON) - 1
+            if idx < 0:
+                return None
+        position = (
+            self.min_position + idx if self._ascending else self.max_position - idx
+        )
+        return position - tap_current
+
+
+def fingerprint_of(factors: Mapping[Any, float], nominal_voltage: float) -> Fingerprint:
+    """
+    Build a hashable fingerprint of a factor table.
+
+    Args:
+        factors: Mapping of tap position (int or str) to voltage factor
+        nominal_voltage: Reference voltage level of the grid [V]
+
+    Returns:
+        Fingerprint: Nominal voltage and the sorted (position, factor) pairs
+    """
+    return (
+        float(nominal_voltage),
+        tuple(sorted((int(position), float(factor)) for position, factor in factors.items())),
+    )
+
+
+@lru_cache(maxsize=TAP_MODEL_CACHE_SIZE)
+def _build_tap_model(fingerprint: Fingerprint) -> TapModel:
+    nominal_voltage, items = fingerprint
+    return TapModel(dict(items), nominal_voltage)
+
+
+def get_tap_model(factors: Mapping[Any, float], nominal_voltage: float) -> TapModel:
+    """
+    Get the cached TapModel for a factor table, building it on first use.
+
+    The cache is keyed on the fingerprint of the table, so tables differing only
+    in key order or key type ("1" or 1) share one model.
+
+    Args:
+        factors: Mapping of tap position (int or str) to voltage factor
+        nominal_voltage: Reference voltage level of the grid [V]
+
+    Returns:
+        TapModel: Shared immutable model for this configuration
+
+    Raises:
+        ValueError: If a position is not an integer or the table is not a valid tap model
+    """
+    return _build_tap_model(fingerprint_of(factors, nominal_voltage))
+
+
+def tap_model_for(simulator: Any) -> TapModel:
+    """
+    Get the TapModel matching a simulator update.
+
+    Uses the raw tapchanger_voltage_factors table if present, otherwise queries
+    get_tapchanger_voltage_factor for every position between min and max step.
+
+    Args:
+        simulator: SimulatorUpdateData or an object with the same interface
+
+    Returns:
+        TapModel: Shared immutable model for this configuration
+
+    Raises:
+        ValueError: If the factor table is not a valid tap model
+    """
+    factors = getattr(simulator, "tapchanger_voltage_factors", None)
+    if type(factors) is not dict and not isinstance(factors, Mapping):
+        factors = {
+            position: simulator.get_tapchanger_voltage_factor(position)
+            for position in range(simulator.min_step_position, simulator.max_step_position + 1)
+        }
+    return get_tap_model(factors, simulator.nominal_voltage)
@@ -0,0 +1,232 @@
+"""
+Append-only binary trace of control decisions in memory-mapped files.
+
+Every decision is appended as one fixed-size record (TRACE_DTYPE) to a
+preallocated, memory-mapped trace file. Appending packs the record straight
+into the mapping, without formatting or a write call. The number of valid
+records is kept in the file header and updated after each record, so a trace
+can be read while it is being written. Pages are written back by the OS,
+also if the process dies.
+
+A file holds a fixed number of records. When it is full, the writer moves
+on to a new file and deletes the oldest ones beyond max_files. Files are
+named <prefix>-<pid>-<sequence>.trace, so several worker processes can
+trace into the same directory.
+
+open_trace maps a file read-only as a NumPy structured array without
+copying it, so millions of steps can be analyzed directly:
+
+    records = open_trace(path)
+    records["latency"].mean(), np.bincount(records["behavior"])
+"""
+
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .control import ControlDecision
+from .eSteps import eSteps
+from .shared_state import transformer_key
+
+# Magic number and layout version at the start of every trace file
+TRACE_MAGIC: int = 0x54524345  # "TRCE"
+TRACE_VERSION: int = 1
+
+# Default number of records per file and files kept per process
+TRACE_FILE_RECORDS: int = 1 << 20
+TRACE_MAX_FILES: int = 8
+
+# One decision, little-endian without padding
+TRACE_DTYPE = np.dtype(
+    [
+        ("time", "<f8"),  # Unix time of the decision [s]
+        ("transformer", "<u8"),  # shared_state.transformer_key of the transformer ID
+        ("min_voltage", "<f8"),  # Measured minimum street voltage [V]
+        ("max_voltage", "<f8"),  # Measured maximum street voltage [V]
+        ("range_factor_in", "<f8"),  # Range control factor sent with the update
+        ("range_factor", "<f8"),  # Range control factor returned
+        ("latency", "<f8"),  # Time spent deciding [s]
+        ("tap", "<i4"),  # Tap position sent with the update
+        ("task", "u1"),  # Task number, 0 if not a number from 0 to 255
+        ("behavior", "u1"),  # eSteps value returned
+        ("spreading", "?"),  # Spreading detected
+        ("violation", "i1"),  # control.VIOLATION_* code
+    ]
+)
+
+# Header: magic, version, record size, capacity, record count
+_HEADER = struct.Struct("<IIQQQ")
+HEADER_SIZE: int = 64
+_COUNT_OFFSET: int = 24
+_COUNT = struct.Struct("<Q")
+_RECORD = struct.Struct("<dQdddddiBB?b")
+_pack_record = _RECORD.pack_into
+_pack_count = _COUNT.pack_into
+
+# Codes of eSteps members and task identifiers, looked up instead of converted per record
+_BEHAVIOR_CODE: dict[eSteps, int] = {step: step.value for step in eSteps}
+_TASK_CODE: dict[str, int] = {str(task): task for task in range(256)}
+
+
+class TraceWriter:
+    """
+    Appends decision records to rotating memory-mapped trace files.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        records_per_file: int = TRACE_FILE_RECORDS,
+        max_files: int = TRACE_MAX_FILES,
+        prefix: str = "decisions",
+    ) -> None:
+        """
+        Create the directory and the first trace file.
+
+        Args:
+            directory: Directory of the trace files
+            records_per_file: Capacity of each file
+            max_files: Files of this process kept on disk, older ones are deleted
+            prefix: Start of the file names
+
+        Raises:
+            ValueError: If records_per_file or max_files are not positive
+        """
+        if records_per_file <= 0 or max_files <= 0:
+            raise ValueError("Trace file capacity and file count must be positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.records_per_file = records_per_file
+        self.max_files = max_files
+        self.prefix = f"{prefix}-{os.getpid()}"
+        self.files: list[Path] = []
+        self.records = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._mapping: mmap.mmap | None = None
+        self._count = 0
+        # Hashed transformer IDs, hashing on every append would dominate its cost
+        self._keys: dict[str, int] = {}
+        self._open_file()
+
+    def append(
+        self,
+        transformer_id: str,
+        task: str,
+        tap_position: int,
+        min_voltage: float,
+        max_voltage: float,
+        range_factor_in: float,
+        decision: ControlDecision,
+        latency: float,
+        timestamp: float,
+    ) -> None:
+        """
+        Append one decision.
+
+        Args:
+            transformer_id: Identifier of the transformer
+            task: Task identifier of the update
+            tap_position: Tap position sent with the update
+            min_voltage: Measured minimum street voltage [V]
+            max_voltage: Measured maximum street voltage [V]
+            range_factor_in: Range control factor sent with the update
+            decision: Decision returned to the simulator
+            latency: Time spent deciding [s]
+            timestamp: Unix time of the decision [s]
+        """
+        key = self._keys.get(transformer_id)
+        if key is None:
+            key = self._keys[transformer_id] = transformer_key(transformer_id)
+        with self._lock:
+            count = self._count
+            if count == self.records_per_file:
+                self._open_file()
+                count = 0
+            mapping = self._mapping
+            _pack_record(
+                mapping,
+                HEADER_SIZE + count * _RECORD.size,
+                timestamp,
+                key,
+                min_voltage,
+                max_voltage,
+                range_factor_in,
+                decision.range_control_factor,
+                latency,
+                tap_position,
+                _TASK_CODE.get(task, 0),
+                _BEHAVIOR_CODE[decision.tapchanger_behavior],
+                decision.spreading_detected,
+                decision.violation,
+            )
+            # Publish the record last, readers only look at counted records
+            self._count = count = count + 1
+            _pack_count(mapping, _COUNT_OFFSET, count)
+            self.records += 1
+
+    def close(self) -> None:
+        """
+        Flush and unmap the current file.
+        """
+        with self._lock:
+            if self._mapping is not None:
+                self._mapping.flush()
+                self._mapping.close()
+                self._mapping = None
+
+    def _open_file(self) -> None:
+        if self._mapping is not None:
+            self._mapping.close()
+        path = self.directory / f"{self.prefix}-{self._sequence:06d}.trace"
+        self._sequence += 1
+        size = HEADER_SIZE + self.records_per_file * _RECORD.size
+        with open(path, "w+b") as file:
+            file.truncate(size)
+            self._mapping = mmap.mmap(file.fileno(), size)
+        _HEADER.pack_into(
+            self._mapping, 0, TRACE_MAGIC, TRACE_VERSION, _RECORD.size, self.records_per_file, 0
+        )
+        self._count = 0
+        self.files.append(path)
+        while len(self.files) > self.max_files:
+            self.files.pop(0).unlink(missing_ok=True)
+
+
+def open_trace(path: str | os.PathLike) -> np.ndarray:
+    """
+    Map the records of a trace file read-only, without copying them.
+
+    Args:
+        path: Trace file
+
+    Returns:
+        np.ndarray: Structured array with TRACE_DTYPE, one row per recorded decision
+
+    Raises:
+        ValueError: If the file is not a trace file of this version
+    """
+    with open(path, "rb") as file:
+        magic, version, record_size, capacity, count = _HEADER.unpack(file.read(_HEADER.size))
+    if magic != TRACE_MAGIC or version != TRACE_VERSION or record_size != TRACE_DTYPE.itemsize:
+        raise ValueError(f"'{path}' is not a version {TRACE_VERSION} decision trace")
+    if count == 0:
+        return np.empty(0, TRACE_DTYPE)
+    return np.memmap(path, TRACE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def trace_files(directory: str | os.PathLike) -> list[Path]:
+    """
+    Get the trace files of a directory, oldest first per process.
+
+    Args:
+        directory: Directory of the trace files
+
+    Returns:
+        list[Path]: Trace file paths
+    """
+    return sorted(Path(directory).glob("*.trace"))
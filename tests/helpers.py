@@ -0,0 +1,26 @@
+"""
+Shared helpers of the test modules.
+"""
+
+from studenttask.api_client import SimulatorUpdateData
+
+
+def make_update(**overrides) -> SimulatorUpdateData:
+    """Create a SimulatorUpdateData with default values that can be overridden"""
+    values = dict(
+        task="1",
+        upper_voltage_band=240,
+        lower_voltage_band=220,
+        upper_voltage_safety=238,
+        lower_voltage_safety=222,
+        min_step_position=-2,
+        max_step_position=2,
+        nominal_voltage=230,
+        current_tapchanger_position=0,
+        tapchanger_voltage_factors={"-2": 0.95, "-1": 0.98, "0": 1.0, "1": 1.02, "2": 1.05},
+        current_rangecontrol_factor=1.0,
+        min_street_voltage=230,
+        max_street_voltage=230,
+    )
+    values.update(overrides)
+    return SimulatorUpdateData(**values)
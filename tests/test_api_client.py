@@ -0,0 +1,68 @@
+import time
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from studenttask.api_client import APIClient
+
+
+def response(status_code: int) -> Mock:
+    return Mock(status_code=status_code)
+
+
+@pytest.mark.unit
+class TestAPIClient:
+    @pytest.fixture
+    def api_client(self):
+        client = APIClient("http://simulator:8000/", "http://studenttask:7777/")
+        client.session = Mock()
+        yield client
+        client.stop_watchdog()
+
+    def test_register_with_backoff_retries(self, api_client: APIClient):
+        """Test that failed and rejected registrations are retried until accepted"""
+        api_client.session.post.side_effect = [
+            requests.ConnectionError("backend down"), response(503), response(200)
+        ]
+
+        assert api_client.register_with_backoff(base_delay=0.0)
+        assert api_client.session.post.call_count == 3
+        assert api_client.is_registered
+
+    def test_register_with_backoff_gives_up(self, api_client: APIClient):
+        """Test that registration stops after max_attempts rounds"""
+        api_client.session.post.side_effect = requests.ConnectionError("backend down")
+
+        assert not api_client.register_with_backoff(max_attempts=3, base_delay=0.0)
+        assert api_client.session.post.call_count == 3
+
+    def test_register_only_pending_urls(self, api_client: APIClient):
+        """Test that already accepted URLs are not registered again on retry"""
+        api_client.session.post.side_effect = [response(200), response(500), response(200)]
+
+        assert api_client.register_with_backoff(["http://a/", "http://b/"], base_delay=0.0)
+        urls = [call.kwargs["json"]["studenttask_url"] for call in api_client.session.post.call_args_list]
+        assert urls == ["http://a/", "http://b/", "http://b/"]
+
+    def test_watchdog_reregisters_without_heartbeats(self, api_client: APIClient):
+        """Test that the watchdog registers on start and again once heartbeats stop"""
+        api_client.session.post.return_value = response(200)
+
+        api_client.start_watchdog(heartbeat_timeout=0.05, check_interval=0.01)
+        deadline = time.monotonic() + 2.0
+        while api_client.session.post.call_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert api_client.session.post.call_count >= 2
+
+    def test_heartbeat_keeps_watchdog_quiet(self, api_client: APIClient):
+        """Test that regular heartbeats prevent re-registration"""
+        api_client.session.post.return_value = response(200)
+
+        api_client.start_watchdog(heartbeat_timeout=0.2, check_interval=0.01)
+        for _ in range(30):
+            api_client.return_if_alive()
+            time.sleep(0.01)
+
+        assert api_client.session.post.call_count == 1
@@ -0,0 +1,123 @@
+import itertools
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.control import decide
+from studenttask.control_batch import STEP_BY_CODE, decide_batch
+from studenttask.eSteps import eSteps
+from studenttask.StudentTask import StudentTask
+from studenttask.tap_model import get_tap_model
+from tests.helpers import make_update
+
+DEFAULT_TAP_MODEL = get_tap_model({-2: 0.95, -1: 0.98, 0: 1.0, 1: 1.02, 2: 1.05}, 230)
+LIMITS = dict(upper_band=240, lower_band=220, upper_safety=238, lower_safety=222)
+
+
+@pytest.mark.unit
+class TestDecide:
+    def test_spreading_blocks_switch(self):
+        """Test that a switch which would violate the opposite limit is blocked"""
+        decision = decide("3", 215, 238, 0, -2, 2, **LIMITS, range_control_factor=1.0,
+                          delta_higher=-4.6, delta_lower=4.6)
+
+        assert decision.tapchanger_behavior == eSteps.STAY
+        assert decision.spreading_detected
+        assert decision.range_control_factor == 1.0
+
+    def test_range_control_increases_with_buffer(self):
+        """Test that the range control factor grows when U_max is far from the limit"""
+        decision = decide("4", 230, 230, 0, -2, 2, **LIMITS, range_control_factor=0.5,
+                          delta_higher=-4.6, delta_lower=4.6)
+
+        assert decision.tapchanger_behavior == eSteps.STAY
+        assert decision.range_control_factor == pytest.approx(0.6)
+
+    def test_range_increase_voltage_blocks_increase(self):
+        """Test that a high rolling U_max keeps the range control factor from growing"""
+        decision = decide("4", 230, 230, 0, -2, 2, **LIMITS, range_control_factor=0.5,
+                          delta_higher=-4.6, delta_lower=4.6, range_increase_voltage=237.8)
+
+        assert decision.range_control_factor == 0.5
+
+    def test_batch_matches_scalar_kernel(self):
+        """Test that the vectorized kernel agrees with the scalar kernel element-wise"""
+        cases = list(itertools.product(
+            ("1", "2", "3", "4"), (215, 221, 230), (230, 237.8, 239, 245), (-2, 0, 2), (0.0, 0.5, 1.0)
+        ))
+        expected = []
+        for task, min_v, max_v, tap, factor in cases:
+            higher, lower = DEFAULT_TAP_MODEL.neighbour_deltas(tap, -2, 2)
+            expected.append(decide(task, min_v, max_v, tap, -2, 2, **LIMITS,
+                                   range_control_factor=factor, delta_higher=higher, delta_lower=lower))
+
+        columns = list(zip(*cases))
+        deltas = np.array([DEFAULT_TAP_MODEL.neighbour_deltas(tap, -2, 2) for tap in columns[3]])
+        result = decide_batch(
+            np.array(columns[0], dtype=int), columns[1], columns[2], columns[3], -2, 2,
+            LIMITS["upper_band"], LIMITS["lower_band"], LIMITS["upper_safety"], LIMITS["lower_safety"],
+            columns[4], deltas[:, 0], deltas[:, 1],
+        )
+
+        assert [STEP_BY_CODE[int(code)] for code in result.tapchanger_behavior] == [
+            d.tapchanger_behavior for d in expected
+        ]
+        assert result.spreading_detected.tolist() == [d.spreading_detected for d in expected]
+        assert result.range_control_factor.tolist() == [d.range_control_factor for d in expected]
+
+    def test_batch_matches_scalar_kernel_with_increase_voltage(self):
+        """Test that the vectorized kernel compares the given increase voltages like the scalar kernel"""
+        increase_voltages = (230.0, 237.8, 245.0)
+        expected = [
+            decide("4", 225, 230, 0, -2, 2, **LIMITS, range_control_factor=0.5, delta_higher=-4.6,
+                   delta_lower=4.6, range_increase_voltage=voltage).range_control_factor
+            for voltage in increase_voltages
+        ]
+
+        result = decide_batch(4, 225, 230, 0, -2, 2, LIMITS["upper_band"], LIMITS["lower_band"],
+                              LIMITS["upper_safety"], LIMITS["lower_safety"], 0.5, -4.6, 4.6,
+                              range_increase_voltage=increase_voltages)
+
+        assert result.range_control_factor.tolist() == expected == [0.6, 0.5, 0.5]
+
+    def test_batch_ignores_range_control_window(self):
+        """Test that the stateless batch raises the factor where the fleet window still holds it"""
+        student_task = StudentTask()
+        high = make_update(task="4", min_street_voltage=225, max_street_voltage=237.8, current_rangecontrol_factor=0.5)
+        low = make_update(task="4", min_street_voltage=225, max_street_voltage=230, current_rangecontrol_factor=0.5)
+        student_task.calculate_control(high)
+
+        assert student_task.calculate_control(low)["range_control_factor"] == 0.5
+        assert student_task.calculate_control_batch([low])[0]["range_control_factor"] == 0.6
+
+    def test_calculate_control_batch(self):
+        """Test that the batch endpoint returns one decision per update in order"""
+        updates = [
+            make_update(max_street_voltage=245),
+            make_update(min_street_voltage=215),
+            make_update(task="3", min_street_voltage=215, max_street_voltage=238),
+        ]
+
+        results = StudentTask().calculate_control_batch(updates)
+
+        assert [r["tapchanger_behavior"] for r in results] == [
+            eSteps.SWITCHLOWER, eSteps.SWITCHHIGHER, eSteps.STAY
+        ]
+        assert [r["spreading_detected"] for r in results] == [False, False, True]
+
+    @pytest.mark.parametrize("task", ["", "x", "9", "0"])
+    def test_batch_rejects_unknown_task(self, task):
+        """Test that the batch endpoint answers unknown tasks with 422 instead of failing"""
+        client = TestClient(StudentTask().app)
+        body = "[" + ",".join(update.model_dump_json() for update in (make_update(), make_update(task=task))) + "]"
+
+        result = client.post("/calculateControlBatch/", content=body)
+
+        assert result.status_code == 422
+        assert repr(task) in result.json()["detail"]
+
+    def test_batch_kernel_rejects_out_of_range_task(self):
+        """Test that the vectorized kernel raises for task identifiers beyond the lookup tables"""
+        with pytest.raises(IndexError):
+            decide_batch(5, 230, 230, 0, -2, 2, 240, 220, 238, 222, 1.0, -4.6, 4.6)
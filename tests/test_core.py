@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+import pytest
+
+from studenttask.StudentTask import StudentTask
+
+# Packages the core must not import
+HEAVY_MODULES = ("fastapi", "pydantic", "requests", "uvicorn", "loguru", "numpy")
+
+
+@pytest.mark.unit
+class TestCore:
+    def test_core_import_is_light(self):
+        """Test that importing the core pulls in none of the web or numeric packages"""
+        script = (
+            "import sys, studenttask.core\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == ""
+
+    def test_app_built_lazily(self):
+        """Test that routes are only registered when the app is first used"""
+        student_task = StudentTask()
+
+        assert student_task._app is None
+        app = student_task.app
+
+        assert student_task.app is app
+        paths = {route.path for route in app.routes}
+        assert {"/calculateControl/", "/heartbeat/", "/metrics/"} <= paths
@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from studenttask.deadline import AdmissionMiddleware, request_deadline
+from studenttask.eSteps import eSteps
+from studenttask.fleet import DEFAULT_TRANSFORMER_ID
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+def deadline_app() -> FastAPI:
+    """Create an app answering with whether a request deadline is set"""
+    app = FastAPI()
+    app.get("/probe/")(lambda: {"deadline": request_deadline.get() is not None})
+    app.post("/probe/")(lambda: {"deadline": request_deadline.get() is not None})
+    return app
+
+
+@pytest.mark.unit
+class TestDeadline:
+    def test_fallback_after_deadline(self):
+        """Test that a request past its deadline gets STAY with the unchanged range factor"""
+        student_task = StudentTask()
+        update = make_update(task="4", min_street_voltage=215, current_rangecontrol_factor=0.7)
+
+        token = request_deadline.set(0.0)
+        try:
+            result = student_task.calculate_control(update)
+        finally:
+            request_deadline.reset(token)
+
+        assert result == {"tapchanger_behavior": eSteps.STAY, "spreading_detected": False, "range_control_factor": 0.7}
+        assert student_task.metrics.registry.value(student_task.metrics.fallbacks) == 1
+        assert student_task.fleet.get(DEFAULT_TRANSFORMER_ID).step_count == 0
+
+    def test_decision_within_deadline(self):
+        """Test that requests within their budget are decided normally"""
+        student_task = StudentTask()
+
+        result = TestClient(student_task.app).post(
+            "/calculateControl/", content=make_update(min_street_voltage=215).model_dump_json()
+        )
+
+        assert result.json()["tapchanger_behavior"] == eSteps.SWITCHHIGHER.value
+        assert student_task.metrics.registry.value(student_task.metrics.fallbacks) == 0
+
+    def test_exhausted_budget_over_http(self, monkeypatch):
+        """Test that the endpoint answers with the fallback once the budget is used up"""
+        monkeypatch.setattr(StudentTask, "REQUEST_BUDGET", 1e-9)
+        client = TestClient(StudentTask().app)
+
+        result = client.post("/calculateControl/", content=make_update(min_street_voltage=215).model_dump_json())
+
+        assert result.json()["tapchanger_behavior"] == eSteps.STAY.value
+        assert "studenttask_fallback_decisions_total 1" in client.get("/metrics/").text
+
+    def test_sheds_posts_beyond_limit(self):
+        """Test that control requests beyond the limit get 503 while GETs still pass"""
+        shed = []
+        middleware = AdmissionMiddleware(deadline_app(), max_in_flight=1, on_shed=lambda: shed.append(1))
+        client = TestClient(middleware)
+
+        admitted = client.post("/probe/")
+        middleware.in_flight = 1
+        rejected = client.post("/probe/")
+        probe = client.get("/probe/")
+
+        assert admitted.json() == {"deadline": True}
+        assert rejected.status_code == 503 and rejected.headers["retry-after"] == "1"
+        assert probe.status_code == 200 and probe.json() == {"deadline": False}
+        assert shed == [1]
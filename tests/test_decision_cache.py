@@ -0,0 +1,68 @@
+import pytest
+
+from studenttask.control import ControlDecision
+from studenttask.decision_cache import DecisionCache
+from studenttask.eSteps import eSteps
+from studenttask.StudentTask import StudentTask
+from studenttask.tap_model import get_tap_model
+from tests.helpers import make_update
+
+FACTORS = {-1: 0.98, 0: 1.0, 1: 1.02}
+DECISION = ControlDecision(eSteps.STAY, False, 1.0, 222, 238, 0)
+
+
+def cache_key(cache: DecisionCache, min_voltage: float, max_voltage: float) -> tuple:
+    return cache.key("1", 0, -1, 1, 240, 220, 238, 222, 1.0, min_voltage, max_voltage, max_voltage)
+
+
+@pytest.mark.unit
+class TestDecisionCache:
+    def test_quantized_voltages_hit(self):
+        """Test that voltages within the resolution share an entry and others do not"""
+        cache = DecisionCache(resolution=0.1)
+        tap_model = get_tap_model(FACTORS, 230)
+        cache.put(cache_key(cache, 230.0, 235.0), DECISION)
+
+        assert cache.get(tap_model, cache_key(cache, 230.02, 234.96)) is DECISION
+        assert cache.get(tap_model, cache_key(cache, 230.2, 235.0)) is None
+        assert cache.stats()[:2] == (1, 1)
+        assert cache.stats().hit_rate == 0.5
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used decision is evicted when full"""
+        cache = DecisionCache(maxsize=2)
+        tap_model = get_tap_model(FACTORS, 230)
+        for voltage in (230, 231):
+            cache.put(cache_key(cache, voltage, voltage), DECISION)
+        cache.get(tap_model, cache_key(cache, 230, 230))
+
+        cache.put(cache_key(cache, 232, 232), DECISION)
+
+        assert cache.get(tap_model, cache_key(cache, 230, 230)) is DECISION
+        assert cache.get(tap_model, cache_key(cache, 231, 231)) is None
+        assert len(cache) == 2
+
+    def test_invalidated_on_tap_factor_change(self):
+        """Test that a different factor table clears the cache"""
+        cache = DecisionCache()
+        key = cache_key(cache, 230, 230)
+        cache.get(get_tap_model(FACTORS, 230), key)
+        cache.put(key, DECISION)
+
+        assert cache.get(get_tap_model({-1: 0.97, 0: 1.0, 1: 1.03}, 230), key) is None
+        assert cache.stats().invalidations == 1 and len(cache) == 0
+
+    def test_cached_decisions_match_kernel(self, monkeypatch):
+        """Test that the endpoint returns the same decisions with and without the cache"""
+        voltages = [(230, 245), (230, 245.001), (215, 230), (230, 230), (215, 230)]
+        uncached = StudentTask()
+        assert uncached.decision_cache("default") is None
+        monkeypatch.setattr(StudentTask, "DECISION_CACHE_SIZE", 16)
+        cached = StudentTask()
+
+        for low, high in voltages:
+            update = make_update(task="4", min_street_voltage=low, max_street_voltage=high)
+            assert cached.calculate_control(update) == uncached.calculate_control(update)
+
+        assert cached.decision_cache("default").stats()[:2] == (2, 3)
+        assert cached.metrics.registry.value(cached.metrics.decision_cache[True]) == 2
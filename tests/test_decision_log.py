@@ -0,0 +1,55 @@
+import pytest
+from loguru import logger
+
+from studenttask.decision_log import StructuredLogger
+
+
+@pytest.fixture
+def records():
+    """Collect emitted loguru records in a list"""
+    collected = []
+    sink_id = logger.add(lambda message: collected.append(message.record), level="TRACE")
+    yield collected
+    logger.remove(sink_id)
+
+
+@pytest.mark.unit
+class TestStructuredLogger:
+    def test_one_structured_record(self, records):
+        """Test that fields are bound as extras of a single record"""
+        StructuredLogger().emit("decision", lambda: {"tap": 1, "behavior": "STAY"})
+
+        assert len(records) == 1
+        assert records[0]["extra"] == {"category": "decision", "tap": 1, "behavior": "STAY"}
+
+    def test_sampling(self, records):
+        """Test that only every n-th record of a category is emitted"""
+        structured_log = StructuredLogger(sample_rates={"decision": 3})
+
+        for tap in range(7):
+            structured_log.emit("decision", {"tap": tap})
+
+        assert [r["extra"]["tap"] for r in records] == [0, 3, 6]
+
+    def test_gated_records_are_not_built(self, records):
+        """Test that disabled or level gated records never build their fields"""
+        def fail():
+            raise AssertionError("fields built for a dropped record")
+
+        StructuredLogger(enabled=False).emit("decision", fail)
+        StructuredLogger(level="INFO").emit("heartbeat", fail)
+
+        assert records == []
+
+    def test_from_env(self, monkeypatch):
+        """Test configuration through environment variables"""
+        monkeypatch.setenv("STUDENTTASK_LOG_MODE", "sampled")
+        monkeypatch.setenv("STUDENTTASK_LOG_SAMPLE", "decision=5")
+        structured_log = StructuredLogger.from_env()
+
+        assert structured_log.enabled
+        assert structured_log.sample_rates["decision"] == 5
+        assert structured_log.sample_rates["heartbeat"] == 1000
+
+        monkeypatch.setenv("STUDENTTASK_LOG_MODE", "off")
+        assert not StructuredLogger.from_env().enabled
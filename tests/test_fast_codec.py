@@ -0,0 +1,138 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from studenttask.eSteps import eSteps
+from studenttask.fast_codec import (
+    BINARY_CONTENT_TYPE,
+    FastDecoder,
+    decode_control_result_binary,
+    decode_update_binary,
+    encode_control_result,
+    encode_control_result_binary,
+    encode_update_binary,
+)
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestFastCodec:
+    def test_validates_only_on_schema_change(self):
+        """Test that only the first message and schema changes are strictly validated"""
+        decoder = FastDecoder()
+        body = make_update().model_dump_json()
+
+        first = decoder.decode(body)
+        second = decoder.decode(body)
+        changed = decoder.decode(body.replace('"min_street_voltage":230.0', '"min_street_voltage":230'))
+
+        assert first == second
+        assert changed.min_street_voltage == 230
+        assert decoder.validations == 2
+        assert decoder.fast_decodes == 1
+
+    def test_invalid_first_message_rejected(self):
+        """Test that an invalid message raises instead of being accepted unvalidated"""
+        data = json.loads(make_update().model_dump_json())
+        del data["nominal_voltage"]
+
+        with pytest.raises(ValidationError):
+            FastDecoder().decode(json.dumps(data))
+
+    def test_revalidates_changed_factor_values(self):
+        """Test that factor tables with other value types are validated instead of passed through"""
+        decoder = FastDecoder()
+        body = make_update().model_dump_json()
+        decoder.decode(body)
+
+        with pytest.raises(ValidationError):
+            decoder.decode(body.replace('"0":1.0', '"0":null'))
+        with pytest.raises(ValidationError):
+            decoder.decode(body.replace('"0":1.0', '"0":"one"'))
+        assert decoder.fast_decodes == 0
+
+    def test_coerced_strings_stay_validated(self):
+        """Test that a message pydantic only accepts by coercion never opens the fast path"""
+        decoder = FastDecoder()
+        body = make_update().model_dump_json().replace('"0":1.0', '"0":"1.0"')
+        decoder.decode(body)
+
+        with pytest.raises(ValidationError):
+            decoder.decode(body.replace('"0":"1.0"', '"0":"one"'))
+
+    def test_raw_endpoint_rejects_null_factor_after_valid_body(self):
+        """Test that a null factor sent after a valid body is answered with 422"""
+        client = TestClient(StudentTask().app)
+        body = make_update().model_dump_json()
+
+        assert client.post("/calculateControlRaw/", content=body).status_code == 200
+        assert client.post("/calculateControlRaw/", content=body.replace('"0":1.0', '"0":null')).status_code == 422
+
+    def test_encode_control_result(self):
+        """Test that the encoded response is the JSON of the result"""
+        body = encode_control_result(
+            {"tapchanger_behavior": eSteps.SWITCHHIGHER, "spreading_detected": False, "range_control_factor": 0.7}
+        )
+
+        assert json.loads(body) == {
+            "tapchanger_behavior": 1, "spreading_detected": False, "range_control_factor": 0.7
+        }
+
+    def test_raw_endpoint_matches_validated_endpoint(self):
+        """Test that the fast path returns the same body as the pydantic path"""
+        client = TestClient(StudentTask().app)
+        body = make_update(task="4", min_street_voltage=215, max_street_voltage=238).model_dump_json()
+
+        raw = client.post("/calculateControlRaw/", content=body)
+        validated = client.post("/calculateControl/", content=body)
+        invalid = client.post("/calculateControlRaw/", content=b"{}")
+
+        assert raw.status_code == 200
+        assert raw.json() == validated.json()
+        assert invalid.status_code == 422
+
+    def test_binary_update_round_trip(self):
+        """Test that an update survives the binary layout apart from the matriculation number"""
+        update = make_update(task="4", min_street_voltage=215.5, max_street_voltage=238.25)
+
+        decoded = decode_update_binary(encode_update_binary(update))
+
+        assert decoded == update.model_copy(update={"matriculation_number": ""})
+
+    def test_binary_update_rejects_bad_length(self):
+        """Test that truncated binary updates raise instead of reading garbage"""
+        body = encode_update_binary(make_update())
+
+        with pytest.raises(ValueError):
+            decode_update_binary(body[:-1])
+
+    def test_binary_result_round_trip(self):
+        """Test that a result survives the binary layout"""
+        result = {"tapchanger_behavior": eSteps.SWITCHLOWER, "spreading_detected": True, "range_control_factor": 0.75}
+
+        assert decode_control_result_binary(encode_control_result_binary(result)) == result
+
+    def test_raw_endpoint_negotiates_binary(self):
+        """Test that binary bodies are answered in binary unless JSON is asked for"""
+        client = TestClient(StudentTask().app)
+        update = make_update(task="4", min_street_voltage=215, max_street_voltage=238)
+        headers = {"Content-Type": BINARY_CONTENT_TYPE}
+
+        expected = client.post("/calculateControlRaw/", content=update.model_dump_json()).json()
+        binary = client.post("/calculateControlRaw/", content=encode_update_binary(update), headers=headers)
+        json_answer = client.post(
+            "/calculateControlRaw/",
+            content=encode_update_binary(update),
+            headers={**headers, "Accept": "application/json"},
+        )
+        invalid = client.post("/calculateControlRaw/", content=b"\x01", headers=headers)
+
+        assert binary.headers["content-type"] == BINARY_CONTENT_TYPE
+        result = decode_control_result_binary(binary.content)
+        assert result["tapchanger_behavior"].value == expected["tapchanger_behavior"]
+        assert result["range_control_factor"] == expected["range_control_factor"]
+        assert json_answer.json() == expected
+        assert invalid.status_code == 422
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.control import ControlDecision
+from studenttask.eSteps import eSteps
+from studenttask.fleet import DEFAULT_TRANSFORMER_ID, FleetRegistry, TransformerState
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestFleet:
+    def test_registry_creates_state_once(self):
+        """Test that states are created on first access and reused afterwards"""
+        registry = FleetRegistry()
+
+        state = registry.get("T1")
+
+        assert registry.get("T1") is state
+        assert "T1" in registry and "T2" not in registry
+        assert len(registry) == 1
+
+    def test_history_ring_buffer_wraps(self):
+        """Test that only the most recent range control factors are kept"""
+        state = TransformerState("T1")
+        total = TransformerState.HISTORY_LENGTH + 3
+
+        for step in range(total):
+            decision = ControlDecision(eSteps.STAY, False, float(step), 222, 238, 0)
+            state.record(decision, float(step))
+
+        assert state.step_count == total
+        assert state.decision_counts[eSteps.STAY.value] == total
+        assert state.recent_range_factors() == [float(s) for s in range(3, total)]
+
+    def test_updates_routed_by_transformer_id(self):
+        """Test that each transformer keeps its own counters and tap model"""
+        student_task = StudentTask()
+
+        student_task.calculate_transformer_control("T1", make_update(max_street_voltage=245))
+        student_task.calculate_transformer_control("T1", make_update())
+        student_task.calculate_transformer_control(
+            "T2", make_update(task="3", min_street_voltage=215, max_street_voltage=238)
+        )
+        student_task.calculate_control(make_update())
+
+        t1, t2 = student_task.fleet.get("T1"), student_task.fleet.get("T2")
+        assert t1.step_count == 2
+        assert t1.decision_counts[eSteps.SWITCHLOWER.value] == 1
+        assert t2.spreading_count == 1
+        assert t2.tap_model is not None and len(t2.tap_model) == 5
+        assert student_task.fleet.get(DEFAULT_TRANSFORMER_ID).step_count == 1
+
+    def test_fleet_heartbeat(self):
+        """Test that heartbeats sent to a transformer's registered URL are answered"""
+        student_task = StudentTask()
+        student_task.api_client.last_heartbeat = 0.0
+
+        result = TestClient(student_task.app).get("/fleet/T1/heartbeat/")
+
+        assert result.status_code == 200
+        assert result.json()["is_alive"] is True
+        assert student_task.api_client.last_heartbeat > 0.0
+
+    def test_concurrent_first_access(self):
+        """Test that threads racing on a new transformer all get the same state"""
+        registry = FleetRegistry()
+        barrier = threading.Barrier(8)
+        states = []
+
+        def access():
+            barrier.wait()
+            states.append(registry.get("T1"))
+
+        threads = [threading.Thread(target=access) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(state) for state in states}) == 1
+        assert len(registry) == 1
+
+    def test_fleet_url(self):
+        """Test that fleet registrations point at the transformer's route prefix"""
+        student_task = StudentTask()
+        student_task.own_studenttask_url = "http://studenttask:7777/"
+
+        assert student_task.fleet_url("T1") == "http://studenttask:7777/fleet/T1/"
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from studenttask.api_client import SimulatorUpdateData
+from studenttask.loadtest import compare, inprocess_sender, logged_payloads, run_load, simulated_payloads
+
+
+@pytest.mark.unit
+class TestLoadTest:
+    def test_simulated_payloads_are_valid_updates(self):
+        """Test that the simulated payloads validate as SimulatorUpdateData"""
+        payloads = simulated_payloads(50)
+
+        updates = [SimulatorUpdateData.model_validate_json(body) for body in payloads]
+
+        assert len(updates) == 50
+        assert {update.task for update in updates} == {"4"}
+        assert len({update.max_street_voltage for update in updates}) > 1
+
+    def test_logged_payloads_keep_update_fields_only(self, tmp_path):
+        """Test that recorded decisions are stripped from replayed log lines"""
+        update = json.loads(simulated_payloads(1)[0])
+        log = tmp_path / "run.jsonl"
+        log.write_text(json.dumps({**update, "tapchanger_behavior": 2}) + "\n")
+
+        (body,) = logged_payloads(str(log))
+
+        assert json.loads(body) == update
+
+    def test_run_load_counts_requests_and_errors(self):
+        """Test that every request is sent once and failures are counted"""
+        sent = []
+
+        def send(body: bytes) -> bool:
+            sent.append(body)
+            return body != b"bad"
+
+        result = run_load(send, [b"good", b"bad"], requests=10, concurrency=3, target="fake")
+
+        assert len(sent) == 10
+        assert result.errors == 5
+        assert result.throughput == pytest.approx(5 / result.duration)
+        assert result.latency_percentiles["p50"] <= result.latency_percentiles["p99"] <= result.latency_max
+
+    def test_run_load_counts_raising_sender_as_errors(self):
+        """Test that a raising sender fails its requests instead of ending its client"""
+        def send(body: bytes) -> bool:
+            if body == b"bad":
+                raise ConnectionError("reset")
+            return True
+
+        result = run_load(send, [b"good", b"bad"], requests=10, concurrency=2)
+
+        assert result.errors == 5
+        assert result.throughput == pytest.approx(5 / result.duration)
+
+    def test_inprocess_target_counts_rejected_bodies(self):
+        """Test that bodies the endpoint would reject count as errors in-process"""
+        payloads = simulated_payloads(2)
+        unknown_task = json.dumps({**json.loads(payloads[0]), "task": "9"}).encode()
+
+        result = run_load(inprocess_sender(), [payloads[1], b"{}", unknown_task], requests=6, concurrency=1)
+
+        assert result.errors == 4
+
+    def test_inprocess_target(self):
+        """Test that the in-process target runs the controller without errors"""
+        result = run_load(inprocess_sender(), simulated_payloads(20), requests=40, concurrency=2)
+
+        assert result.errors == 0
+        assert json.loads(json.dumps(result.to_dict()))["requests"] == 40
+
+    def test_compare_reports_regressions(self):
+        """Test that throughput drops and p99 increases beyond the tolerance are reported"""
+        baseline = {"throughput": 1000.0, "latency_percentiles": {"p99": 0.002}}
+
+        within = compare({"throughput": 950.0, "latency_percentiles": {"p99": 0.0021}}, baseline)
+        regressed = compare({"throughput": 800.0, "latency_percentiles": {"p99": 0.003}}, baseline)
+
+        assert within == []
+        assert len(regressed) == 2
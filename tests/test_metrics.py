@@ -0,0 +1,80 @@
+import gc
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.metrics import MetricsRegistry
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestMetrics:
+    def test_counter_sums_thread_shards(self):
+        """Test that increments from many threads are all counted"""
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert registry.value(counter) == 4000
+
+    def test_ended_threads_are_retired(self):
+        """Test that shards of ended threads are folded into the totals and released"""
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+        counter.inc()
+
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc, args=(2.0,))
+            thread.start()
+            thread.join()
+        gc.collect()
+        late = registry.counter("late_total", "Registered after threads ended")
+
+        assert registry.shards == 1
+        assert registry.values(counter, late) == [41.0, 0.0]
+
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count in the exposition"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), labels={"stage": "x"})
+        for value in (0.05, 0.5, 2.0):
+            histogram.observe(value)
+
+        text = registry.exposition()
+
+        assert "# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{stage="x",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{stage="x",le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{stage="x",le="+Inf"} 3' in text
+        assert 'latency_seconds_sum{stage="x"} 2.55' in text
+        assert 'latency_seconds_count{stage="x"} 3' in text
+
+    def test_metrics_endpoint(self):
+        """Test that decisions, task modes, stage latencies and validation failures show up on /metrics/"""
+        client = TestClient(StudentTask().app)
+        client.post("/calculateControl/", content=make_update(task="2", max_street_voltage=239).model_dump_json())
+        client.post("/calculateControlRaw/", content=make_update(task="4").model_dump_json())
+        client.post("/calculateControl/", content=b"{}")
+        client.post("/fleet/T1/calculateControl/", content=make_update().model_dump_json())
+
+        response = client.get("/metrics/")
+
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'studenttask_decisions_total{behavior="SWITCHLOWER"} 1' in response.text
+        assert 'studenttask_decisions_total{behavior="STAY"} 2' in response.text
+        assert 'studenttask_task_requests_total{task="4"} 1' in response.text
+        assert 'studenttask_validation_failures_total 1' in response.text
+        assert 'studenttask_stage_latency_seconds_count{stage="decode"} 3' in response.text
+        assert 'studenttask_stage_latency_seconds_count{stage="decision"} 3' in response.text
+        assert 'studenttask_stage_latency_seconds_count{stage="encode"} 3' in response.text
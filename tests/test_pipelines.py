@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from studenttask.control import TASK_SETTINGS, ControlDecision, decide
+from studenttask.eSteps import eSteps
+from studenttask.pipelines import PipelineRegistry, compile_pipeline
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+LIMITS = (240.0, 220.0, 238.0, 222.0)
+
+
+@pytest.mark.unit
+class TestPipelines:
+    @pytest.mark.parametrize("task", sorted(TASK_SETTINGS))
+    def test_pipeline_matches_decide(self, task):
+        """Test that every compiled task pipeline decides exactly like the generic kernel"""
+        pipeline = PipelineRegistry()[task]
+        rng = random.Random(int(task))
+
+        for _ in range(5000):
+            min_voltage = rng.uniform(210.0, 235.0)
+            max_voltage = min_voltage + rng.uniform(0.0, 30.0)
+            tap = rng.randint(-2, 2)
+            factor = rng.choice((0.0, 0.35, 1.0))
+            deltas = (-rng.uniform(0.0, 12.0), rng.uniform(0.0, 12.0))
+            increase_voltage = rng.choice((None, max_voltage + rng.uniform(-1.0, 1.0)))
+
+            expected = decide(task, min_voltage, max_voltage, tap, -2, 2, *LIMITS, factor, *deltas,
+                              range_increase_voltage=increase_voltage)
+            actual = pipeline(min_voltage, max_voltage, tap, -2, 2, LIMITS, factor, *deltas, increase_voltage)
+
+            assert actual == expected
+
+    def test_range_control_needs_spreading_control(self):
+        """Test that range control without spreading control compiles to the plain limit pipeline"""
+        pipeline = compile_pipeline((True, False, True))
+
+        decision = pipeline(230.0, 230.0, 0, -2, 2, LIMITS, 0.5, -4.6, 4.6, None)
+
+        assert decision == ControlDecision(eSteps.STAY, False, 0.5, 222.0, 238.0, 0)
+
+    def test_custom_pipeline_selected_by_task(self):
+        """Test that a registered custom controller is used for its task only"""
+        student_task = StudentTask()
+        calls = []
+
+        def always_lower(min_voltage, max_voltage, tap, min_step, max_step, limits, factor, *_):
+            calls.append(tap)
+            return ControlDecision(eSteps.SWITCHLOWER, False, factor, limits[1], limits[0], 0)
+
+        student_task.pipelines.register("custom", always_lower)
+        custom = student_task.calculate_control(make_update(task="custom"))
+        builtin = student_task.calculate_control(make_update(task="1"))
+
+        assert custom["tapchanger_behavior"] == eSteps.SWITCHLOWER
+        assert builtin["tapchanger_behavior"] == eSteps.STAY
+        assert calls == [0]
+        assert "custom" in student_task.sessions.tasks
+
+    def test_unknown_task_raises(self):
+        """Test that tasks without pipeline fail like the generic kernel"""
+        with pytest.raises(KeyError):
+            PipelineRegistry()["9"]
@@ -0,0 +1,85 @@
+from time import perf_counter
+
+import pytest
+
+from studenttask.control import ControlDecision
+from studenttask.eSteps import eSteps
+from studenttask.planner import TapPlanner, linear_forecast, plan_taps
+from studenttask.StudentTask import StudentTask
+from studenttask.tap_model import get_tap_model
+from tests.helpers import make_update
+
+# 230 V per 0.02 factor step -> 4.6 V per tap
+TAP_MODEL = get_tap_model({-2: 0.96, -1: 0.98, 0: 1.0, 1: 1.02, 2: 1.04}, 230)
+
+
+@pytest.mark.unit
+class TestPlanner:
+    def test_linear_forecast(self):
+        """Test that the forecast continues the last trend"""
+        assert linear_forecast(230.0, 231.0, 3) == [232.0, 233.0, 234.0]
+
+    def test_plans_enough_steps_for_persistent_violation(self):
+        """Test that a violation of 7 V over the horizon is cleared by two lower taps"""
+        plan = plan_taps(TAP_MODEL, 0, -2, 2, [230.0] * 4, [247.0] * 4, 220, 240)
+
+        assert plan.complete
+        assert plan.move == -1
+        assert plan.taps == (-1, -2, -2, -2)
+
+    def test_ignores_transient_violation(self):
+        """Test that a violation lasting one step is not worth two tap operations"""
+        plan = plan_taps(TAP_MODEL, 0, -2, 2, [225.0] * 4, [240.5, 235, 235, 235], 220, 240)
+
+        assert plan.move == 0 and plan.cost == pytest.approx(0.5)
+
+    def test_respects_step_limits(self):
+        """Test that positions outside min/max step are never planned"""
+        plan = plan_taps(TAP_MODEL, 0, 0, 2, [225.0] * 3, [250.0] * 3, 220, 240)
+
+        assert plan.taps == (0, 0, 0)
+
+    def test_deadline(self):
+        """Test that a search past its deadline is reported incomplete"""
+        plan = plan_taps(TAP_MODEL, 0, -2, 2, [225.0] * 4, [247.0] * 4, 220, 240, deadline=perf_counter() - 1)
+
+        assert not plan.complete and plan.taps == ()
+
+    def test_planner_keeps_spreading_decision(self):
+        """Test that spreading decisions are passed through unchanged"""
+        decision = ControlDecision(eSteps.STAY, True, 0.9, 222, 238, 1)
+
+        planned = TapPlanner().plan("T1", TAP_MODEL, 0, -2, 2, 215, 245, decision)
+
+        assert planned is decision
+
+    def test_no_factor_increase_when_planning_higher(self):
+        """Test that a planned switch higher keeps the range control factor of the request"""
+        decision = ControlDecision(eSteps.STAY, False, 1.0, 220, 240, 0)
+
+        planned = TapPlanner().plan("T1", TAP_MODEL, 0, -2, 2, 215, 230, decision, None, 0.9)
+
+        assert planned.tapchanger_behavior == eSteps.SWITCHHIGHER
+        assert planned.range_control_factor == 0.9
+
+    def test_tap_outside_factor_table(self, monkeypatch):
+        """Test that a tap position without a factor keeps the kernel decision instead of failing"""
+        decision = ControlDecision(eSteps.STAY, False, 1.0, 220, 240, 0)
+        monkeypatch.setattr(StudentTask, "PLANNER_HORIZON", 4)
+        student_task = StudentTask()
+        update = make_update(current_tapchanger_position=3, max_step_position=3, max_street_voltage=245)
+
+        assert TapPlanner().plan("T1", TAP_MODEL, 5, -2, 5, 215, 230, decision) is decision
+        assert plan_taps(TAP_MODEL, 5, -2, 5, [230.0] * 4, [247.0] * 4, 220, 240).taps == ()
+        assert student_task.calculate_control(update)["tapchanger_behavior"] == eSteps.SWITCHLOWER
+        assert student_task.planner.plans == 0
+
+    def test_planner_mode_endpoint(self, monkeypatch):
+        """Test that the planner mode switches on persistent violations"""
+        monkeypatch.setattr(StudentTask, "PLANNER_HORIZON", 4)
+        student_task = StudentTask()
+
+        result = student_task.calculate_control(make_update(max_street_voltage=245))
+
+        assert result["tapchanger_behavior"] == eSteps.SWITCHLOWER
+        assert student_task.planner.plans == 1
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.profiling import Profiler
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+def busy_loop(stop: threading.Event) -> None:
+    """Keep a thread on the CPU until stopped"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def hold_allocations(held: list, stop: threading.Event) -> None:
+    """Allocate memory that is still held at the end of the window"""
+    while not stop.is_set() and len(held) < 20000:
+        held.append(bytearray(1024))
+    stop.wait()
+
+
+@pytest.mark.unit
+class TestProfiling:
+    def test_samples_busy_thread(self):
+        """Test that the collapsed stacks contain the function busy in another thread"""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+        worker.start()
+        try:
+            report = Profiler().profile(0.2, interval=0.001, allocations=False)
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = report.collapsed.splitlines()
+        assert report.samples > 0
+        assert any(line.startswith("busy;") and "busy_loop (test_profiling.py:" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert report.allocations == []
+
+    def test_reports_held_allocations(self):
+        """Test that allocations made during the window show up with their source line"""
+        held: list = []
+        stop = threading.Event()
+        worker = threading.Thread(target=hold_allocations, args=(held, stop))
+        profiler = Profiler()
+
+        def start_worker():
+            worker.start()
+
+        timer = threading.Timer(0.02, start_worker)
+        timer.start()
+        try:
+            report = profiler.profile(0.3, top=5)
+        finally:
+            stop.set()
+            timer.join()
+            worker.join()
+
+        assert any("test_profiling.py" in entry["location"] and entry["size"] > 1e6 for entry in report.allocations)
+        assert len(report.allocations) <= 5
+
+    def test_stops_after_requests(self):
+        """Test that a request bound ends the window before its length"""
+        count = iter(range(1000))
+        report = Profiler(lambda: next(count)).profile(30.0, requests=3, allocations=False)
+
+        assert report.requests >= 3
+        assert report.duration < 5.0
+
+    def test_invalid_bounds(self):
+        """Test that unbounded windows and request bounds without a count are rejected"""
+        with pytest.raises(ValueError):
+            Profiler().profile(0.0)
+        with pytest.raises(ValueError):
+            Profiler().profile(1000.0)
+        with pytest.raises(ValueError):
+            Profiler().profile(1.0, requests=10)
+
+    def test_one_profile_at_a_time(self):
+        """Test that a second profile is rejected while one is running"""
+        profiler = Profiler()
+        thread = threading.Thread(target=profiler.profile, args=(0.5,), kwargs={"allocations": False})
+        thread.start()
+        try:
+            while not profiler.running:
+                pass
+            with pytest.raises(RuntimeError):
+                profiler.profile(0.1)
+        finally:
+            thread.join()
+
+    def test_endpoint_disabled_without_token(self):
+        """Test that the profile endpoint does not exist unless a token is configured"""
+        client = TestClient(StudentTask().app)
+
+        assert client.post("/admin/profile/?seconds=0.1").status_code == 404
+
+    def test_endpoint_requires_token(self, monkeypatch):
+        """Test that the profile endpoint rejects missing and wrong tokens"""
+        monkeypatch.setattr(StudentTask, "ADMIN_TOKEN", "secret")
+        client = TestClient(StudentTask().app)
+
+        assert client.post("/admin/profile/?seconds=0.1").status_code == 403
+        assert client.post("/admin/profile/?seconds=0.1", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    def test_endpoint_profiles_requests(self, monkeypatch):
+        """Test that the profile endpoint counts the control requests answered during the window"""
+        monkeypatch.setattr(StudentTask, "ADMIN_TOKEN", "secret")
+        client = TestClient(StudentTask().app)
+        body = make_update().model_dump_json()
+        sender = threading.Thread(target=lambda: [client.post("/calculateControl/", content=body) for _ in range(20)])
+
+        threading.Timer(0.05, sender.start).start()
+        result = client.post(
+            "/admin/profile/?seconds=10&requests=20&top=3", headers={"X-Admin-Token": "secret"}
+        )
+        sender.join()
+
+        assert result.status_code == 200
+        report = result.json()
+        assert report["requests"] >= 20
+        assert report["duration"] < 10
+        assert len(report["allocations"]) <= 3
+
+    def test_endpoint_collapsed_output(self, monkeypatch):
+        """Test that the collapsed output is plain flamegraph input"""
+        monkeypatch.setattr(StudentTask, "ADMIN_TOKEN", "secret")
+        client = TestClient(StudentTask().app)
+
+        result = client.post(
+            "/admin/profile/?seconds=0.1&output=collapsed&allocations=false", headers={"X-Admin-Token": "secret"}
+        )
+        invalid = client.post("/admin/profile/?seconds=0.1&output=svg", headers={"X-Admin-Token": "secret"})
+
+        assert result.status_code == 200
+        assert result.headers["content-type"].startswith("text/plain")
+        assert invalid.status_code == 422
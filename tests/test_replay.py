@@ -0,0 +1,90 @@
+import csv
+import json
+
+import pytest
+
+from studenttask.replay import replay_file, replay_files
+from tests.helpers import make_update
+
+
+def write_jsonl(path, records):
+    with path.open("w") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def steps():
+    """Three recorded steps: in band, upper violation with switch, and a wrong recorded decision"""
+    in_band = json.loads(make_update(task="2").model_dump_json())
+    in_band.update(tapchanger_behavior=2, spreading_detected=False, range_control_factor=1.0)
+    upper = json.loads(make_update(task="2", max_street_voltage=239).model_dump_json())
+    upper.update(tapchanger_behavior="SWITCHLOWER", spreading_detected=False, range_control_factor=1.0)
+    wrong = json.loads(make_update(task="2", current_tapchanger_position=-1, min_street_voltage=221).model_dump_json())
+    wrong.update(tapchanger_behavior="eSteps.STAY", spreading_detected=False, range_control_factor=1.0)
+    return [in_band, upper, wrong]
+
+
+@pytest.mark.unit
+class TestReplay:
+    def test_replay_jsonl(self, tmp_path, steps):
+        """Test divergences, tap operations and violations of a JSONL log"""
+        path = tmp_path / "run.jsonl"
+        write_jsonl(path, steps)
+
+        report = replay_file(path)
+
+        assert report.steps == 3
+        assert report.compared_steps == 3
+        assert report.divergences == 1
+        assert report.divergent_steps == [2]
+        assert report.tap_operations == 2
+        assert report.recorded_tap_operations == 1
+        assert report.safety_violations == 2
+        assert report.band_violations == 0
+
+    def test_replay_csv_without_decisions(self, tmp_path, steps):
+        """Test that CSV logs without recorded decisions are replayed but not compared"""
+        path = tmp_path / "run.csv"
+        fields = [key for key in steps[0] if key not in ("tapchanger_behavior", "spreading_detected", "range_control_factor")]
+        with path.open("w", newline="") as file:
+            writer = csv.DictWriter(file, fields)
+            writer.writeheader()
+            for step in steps:
+                row = {key: step[key] for key in fields}
+                row["tapchanger_voltage_factors"] = json.dumps(row["tapchanger_voltage_factors"])
+                writer.writerow(row)
+
+        report = replay_file(path)
+
+        assert report.steps == 3
+        assert report.compared_steps == 0
+        assert report.tap_operations == 2
+
+    def test_replay_files_in_parallel(self, tmp_path, steps):
+        """Test that parallel replay returns one report per file in order"""
+        paths = []
+        for index in range(3):
+            paths.append(tmp_path / f"run{index}.jsonl")
+            write_jsonl(paths[-1], steps[: index + 1])
+
+        reports = list(replay_files(paths, workers=2))
+
+        assert [report.steps for report in reports] == [1, 2, 3]
+
+    def test_replay_keeps_window_per_transformer(self, tmp_path):
+        """Test that a recent high U_max holds off the factor increase of its own transformer only"""
+        def step(transformer_id, max_voltage, factor):
+            record = json.loads(
+                make_update(
+                    task="4", min_street_voltage=225, max_street_voltage=max_voltage, current_rangecontrol_factor=0.5
+                ).model_dump_json()
+            )
+            record.update(transformer_id=transformer_id, tapchanger_behavior=2, range_control_factor=factor)
+            return record
+
+        path = tmp_path / "fleet.jsonl"
+        write_jsonl(path, [step("T1", 237.8, 0.5), step("T1", 230, 0.5), step("T2", 230, 0.6)])
+
+        assert replay_file(path).divergences == 0
+        assert replay_file(path, window=1).divergent_steps == [1]
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from studenttask.rolling import RollingWindow
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestRollingWindow:
+    def test_statistics_match_brute_force(self):
+        """Test min, max and mean against a recomputation over the last samples"""
+        rng = random.Random(0)
+        window = RollingWindow(7)
+        samples = []
+
+        for _ in range(500):
+            value = rng.choice([rng.uniform(220, 240), 230.0])
+            window.push(value)
+            samples.append(value)
+            last = samples[-7:]
+            assert window.max == max(last)
+            assert window.min == min(last)
+            assert window.mean == pytest.approx(sum(last) / len(last))
+            assert window.values() == last
+
+    def test_ewma(self):
+        """Test that the EWMA starts at the first sample and moves by alpha"""
+        window = RollingWindow(4, alpha=0.5)
+        for value in (230.0, 240.0, 240.0):
+            window.push(value)
+
+        assert window.ewma == pytest.approx(237.5)
+
+    def test_empty_window(self):
+        """Test that statistics of an empty window raise and bad sizes are rejected"""
+        with pytest.raises(IndexError):
+            RollingWindow(3).max
+        with pytest.raises(ValueError):
+            RollingWindow(0)
+
+    def test_range_control_waits_for_quiet_window(self, monkeypatch):
+        """Test that the factor is only increased once U_max stayed clear for a whole window"""
+        monkeypatch.setattr(StudentTask, "RANGE_CONTROL_WINDOW", 3)
+        student_task = StudentTask()
+        factors = []
+
+        for max_voltage in (237.8, 230, 230, 230):
+            result = student_task.calculate_control(
+                make_update(task="4", max_street_voltage=max_voltage, current_rangecontrol_factor=0.5)
+            )
+            factors.append(result["range_control_factor"])
+
+        assert factors == [0.5, 0.5, 0.5, pytest.approx(0.6)]
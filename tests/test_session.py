@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.api_client import SessionConfigData
+from studenttask.session import SessionRegistry, session_id_for
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+STEP_FIELDS = (
+    "current_tapchanger_position",
+    "current_rangecontrol_factor",
+    "min_street_voltage",
+    "max_street_voltage",
+)
+
+
+def make_config(**overrides) -> SessionConfigData:
+    """Create a SessionConfigData from the static fields of make_update"""
+    update = make_update(**overrides).model_dump(exclude=set(STEP_FIELDS))
+    return SessionConfigData(**update)
+
+
+@pytest.mark.unit
+class TestSession:
+    def test_same_configuration_same_session(self):
+        """Test that reopening a configuration reuses its session"""
+        registry = SessionRegistry()
+
+        first = registry.open(make_config(task="4"))
+        second = registry.open(make_config(task="4"))
+        other = registry.open(make_config(task="3"))
+
+        assert first is second
+        assert other.session_id != first.session_id
+        assert len(registry) == 2
+
+    def test_session_id_ignores_factor_order(self):
+        """Test that the session ID does not depend on the order of the factor table"""
+        config = make_config()
+        reordered = config.model_copy(
+            update={"tapchanger_voltage_factors": dict(reversed(config.tapchanger_voltage_factors.items()))}
+        )
+
+        assert session_id_for(reordered) == session_id_for(config)
+
+    def test_unknown_task_rejected(self):
+        """Test that an unknown task fails when opening instead of on every step"""
+        with pytest.raises(ValueError):
+            SessionRegistry().open(make_config(task="9"))
+
+    def test_least_recently_used_session_evicted(self):
+        """Test that a full registry evicts the session used longest ago"""
+        registry = SessionRegistry(capacity=2)
+        first = registry.open(make_config(task="1"))
+        second = registry.open(make_config(task="2"))
+
+        registry.get(first.session_id)
+        registry.open(make_config(task="3"))
+
+        assert first.session_id in registry
+        assert second.session_id not in registry
+
+    def test_session_endpoint_matches_full_update(self):
+        """Test that session steps decide like full updates"""
+        student_task = StudentTask()
+        client = TestClient(student_task.app)
+        update = make_update(task="4", min_street_voltage=215, max_street_voltage=238)
+
+        session_id = client.post("/session/", json=make_config(task="4").model_dump()).json()["session_id"]
+        step = client.post(
+            f"/session/{session_id}/calculateControl/", json=update.model_dump(include=set(STEP_FIELDS))
+        )
+        full = StudentTask().calculate_control(update)
+
+        assert step.status_code == 200
+        assert step.json() == {**full, "tapchanger_behavior": full["tapchanger_behavior"].value}
+        assert student_task.fleet.get("default").step_count == 1
+
+    def test_unknown_session_and_close(self):
+        """Test that steps of unknown or closed sessions are answered with 404"""
+        client = TestClient(StudentTask().app)
+        session_id = client.post("/session/", json=make_config().model_dump()).json()["session_id"]
+        step = make_update().model_dump(include=set(STEP_FIELDS))
+
+        closed = client.delete(f"/session/{session_id}/")
+        unknown = client.post(f"/session/{session_id}/calculateControl/", json=step)
+        invalid = client.post("/session/", json=make_config(task="9").model_dump())
+
+        assert closed.status_code == 204
+        assert unknown.status_code == 404
+        assert invalid.status_code == 422
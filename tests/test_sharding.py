@@ -0,0 +1,117 @@
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from studenttask.eSteps import eSteps
+from studenttask.sharding import HashRing, ShardRouter
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+REPLICAS = [f"http://replica-{index}:7777" for index in range(4)]
+
+
+class ReplicaNetwork:
+    """Stand-in for the router's HTTP session dispatching to in-process replicas by host"""
+
+    def __init__(self, replicas: dict[str, StudentTask]) -> None:
+        self.clients = {url: TestClient(student_task.app) for url, student_task in replicas.items()}
+        self.down: set[str] = set()
+
+    def _client(self, url: str) -> tuple[TestClient, str]:
+        parts = urlsplit(url)
+        base = f"{parts.scheme}://{parts.netloc}"
+        if base in self.down:
+            raise requests.ConnectionError(f"{base} is down")
+        return self.clients[base], parts.path
+
+    def post(self, url: str, data: bytes, headers: dict, timeout: float):
+        client, path = self._client(url)
+        return client.post(path, content=data, headers=headers)
+
+    def get(self, url: str, timeout: float):
+        client, path = self._client(url)
+        return client.get(path)
+
+
+@pytest.mark.unit
+class TestSharding:
+    def test_ring_spreads_transformers(self):
+        """Test that every replica owns a share of the transformers"""
+        ring = HashRing(REPLICAS)
+
+        owners = [ring.lookup(f"T{index}") for index in range(2000)]
+
+        assert {replica: owners.count(replica) > 300 for replica in REPLICAS} == dict.fromkeys(REPLICAS, True)
+        assert HashRing().lookup("T1") is None
+
+    def test_removal_moves_only_removed_shards(self):
+        """Test that removing a replica only moves its own transformers and re-adding moves them back"""
+        ring = HashRing(REPLICAS)
+        transformers = [f"T{index}" for index in range(2000)]
+        before = {t: ring.lookup(t) for t in transformers}
+
+        ring.remove(REPLICAS[0])
+        after = {t: ring.lookup(t) for t in transformers}
+        ring.add(REPLICAS[0])
+
+        moved = {t for t in transformers if before[t] != after[t]}
+        assert moved == {t for t in transformers if before[t] == REPLICAS[0]}
+        assert REPLICAS[0] not in after.values()
+        assert {t: ring.lookup(t) for t in transformers} == before
+
+    def test_router_keeps_transformer_on_one_replica(self):
+        """Test that all steps of a transformer reach the same replica"""
+        replicas = {url: StudentTask() for url in REPLICAS[:2]}
+        router = ShardRouter("http://simulator:8000", "http://router:7770")
+        router.session = ReplicaNetwork(replicas)
+        client = TestClient(router.app)
+        for url in REPLICAS[:2]:
+            client.post("/api/register/task", json={"studenttask_url": f"{url}/fleet/T9/"})
+        body = make_update(min_street_voltage=215).model_dump_json()
+
+        answers = [client.post(f"/fleet/T{index}/calculateControl/", content=body) for index in range(8) for _ in range(2)]
+
+        assert router.ring.replicas == REPLICAS[:2]
+        assert {answer.json()["tapchanger_behavior"] for answer in answers} == {eSteps.SWITCHHIGHER.value}
+        for url, student_task in replicas.items():
+            for state in student_task.fleet:
+                assert router.ring.lookup(state.transformer_id) == url
+                assert state.step_count == 2
+
+    def test_router_fails_over_and_recovers(self):
+        """Test that a dead replica's transformers move to the others and back once it answers again"""
+        network = ReplicaNetwork({url: StudentTask() for url in REPLICAS[:2]})
+        router = ShardRouter("http://simulator:8000", "http://router:7770", REPLICAS[:2])
+        router.session = network
+        client = TestClient(router.app)
+        transformer = next(f"T{index}" for index in range(100) if router.ring.lookup(f"T{index}") == REPLICAS[0])
+
+        network.down.add(REPLICAS[0])
+        answer = client.post(f"/fleet/{transformer}/calculateControl/", content=make_update().model_dump_json())
+        failed_over = router.ring.lookup(transformer)
+        network.down.clear()
+        router.check_replicas()
+
+        assert answer.status_code == 200
+        assert failed_over == REPLICAS[1]
+        assert router.ring.lookup(transformer) == REPLICAS[0]
+
+    def test_router_without_replicas(self):
+        """Test that the router answers 503 while no replica is available"""
+        client = TestClient(ShardRouter("http://simulator:8000", "http://router:7770").app)
+
+        assert client.post("/calculateControl/", content=make_update().model_dump_json()).status_code == 503
+
+    def test_router_answers_fleet_heartbeats(self):
+        """Test that heartbeats sent to the registered fleet URLs are answered by the router"""
+        router = ShardRouter("http://simulator:8000", "http://router:7770")
+        client = TestClient(router.app)
+        router.api_client.last_heartbeat = 0.0
+
+        answer = client.get("/fleet/T1/heartbeat/")
+
+        assert answer.status_code == 200
+        assert answer.json() == {"is_alive": True}
+        assert router.api_client.last_heartbeat > 0
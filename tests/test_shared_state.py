@@ -0,0 +1,132 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.control import ControlDecision
+from studenttask.eSteps import eSteps
+from studenttask.fleet import TransformerState
+from studenttask.rolling import RollingWindow
+from studenttask.shared_state import SharedStateTable, SharedTrends, shared_fleet
+from studenttask.StudentTask import SHARED_STATE_ENV, StudentTask
+from tests.helpers import make_update
+
+
+def record_in_worker(name: str, transformer_id: str, steps: int) -> None:
+    table = SharedStateTable.attach(name)
+    state = shared_fleet(table).get(transformer_id)
+    for _ in range(steps):
+        state.record(ControlDecision(eSteps.SWITCHLOWER, True, 0.5, 222, 238, 1), 0.6)
+
+
+def observe_in_worker(name: str, transformer_id: str, voltages: list[float]) -> None:
+    table = SharedStateTable.attach(name)
+    state = shared_fleet(table).get(transformer_id)
+    for voltage in voltages:
+        state.observe(voltage)
+
+
+@pytest.fixture
+def table():
+    table = SharedStateTable(capacity=8, history_length=4, window_length=3)
+    yield table
+    table.close()
+
+
+@pytest.mark.unit
+class TestSharedState:
+    def test_state_matches_in_process_state(self, table):
+        """Test that shared states count and wrap their history like TransformerState"""
+        shared = shared_fleet(table).get("T1")
+        local = TransformerState("T1")
+
+        for step in range(6):
+            decision = ControlDecision(eSteps.STAY, step % 2 == 0, float(step), 222, 238, 0)
+            shared.record(decision, 0.0)
+            local.record(decision, 0.0)
+
+        assert shared.step_count == local.step_count == 6
+        assert shared.spreading_count == local.spreading_count == 3
+        assert shared.range_factor_changes == local.range_factor_changes == 5
+        assert list(shared.decision_counts) == list(local.decision_counts)
+        assert shared.recent_range_factors() == [2.0, 3.0, 4.0, 5.0]
+
+    def test_worker_processes_share_state(self, table):
+        """Test that updates recorded by other processes are visible to all of them"""
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=record_in_worker, args=(table.name, transformer_id, 3))
+            # One writer per transformer, like the simulator waiting for each answer
+            for transformer_id in ("T1", "T2", "T3")
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        fleet = shared_fleet(table)
+        assert fleet.get("T1").step_count == 3
+        assert fleet.get("T2").decision_counts[eSteps.SWITCHLOWER.value] == 3
+        assert fleet.get("T3").recent_range_factors() == [0.5, 0.5, 0.5]
+        assert sorted(table.transformer_ids()) == ["T1", "T2", "T3"]
+
+    def test_full_table(self, table):
+        """Test that inserting more transformers than the capacity fails"""
+        for index in range(table.capacity):
+            table.row(f"T{index}")
+
+        with pytest.raises(RuntimeError):
+            table.row("one too many")
+
+    def test_attach_rejects_foreign_segment(self):
+        """Test that segments without the expected header are rejected"""
+        segment = shared_memory.SharedMemory(create=True, size=64)
+        try:
+            with pytest.raises(ValueError):
+                SharedStateTable.attach(segment.name)
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def test_worker_app_uses_shared_state(self, table, monkeypatch):
+        """Test that an app started with the segment name records into the shared table"""
+        monkeypatch.setenv(SHARED_STATE_ENV, table.name)
+        client = TestClient(StudentTask().app)
+
+        client.post("/fleet/T1/calculateControl/", content=make_update(max_street_voltage=245).model_dump_json())
+        client.get("/heartbeat/")
+
+        assert shared_fleet(table).get("T1").decision_counts[eSteps.SWITCHLOWER.value] == 1
+        assert table.heartbeat[0] > 0
+
+    def test_window_shared_between_workers(self, table):
+        """Test that the rolling voltage window sees the steps handled by every worker"""
+        context = multiprocessing.get_context("spawn")
+        worker = context.Process(target=observe_in_worker, args=(table.name, "T1", [231.0, 239.0]))
+        worker.start()
+        worker.join()
+        window = shared_fleet(table).get("T1").max_voltage_window
+        local = RollingWindow(3)
+        for voltage in (231.0, 239.0):
+            local.push(voltage)
+
+        assert window.max == local.max == 239.0
+        for voltage in (232.0, 233.0, 230.0):
+            window.push(voltage)
+            local.push(voltage)
+            assert window.max == local.max
+            assert window.values() == local.values()
+
+    def test_planner_trends_shared_between_workers(self, table, monkeypatch):
+        """Test that a worker plans with the trend left by the worker handling the previous step"""
+        monkeypatch.setenv(SHARED_STATE_ENV, table.name)
+        monkeypatch.setattr(StudentTask, "PLANNER_HORIZON", 4)
+        first, second = StudentTask(), StudentTask()
+
+        first.calculate_transformer_control("T1", make_update(min_street_voltage=225, max_street_voltage=236))
+
+        assert isinstance(second.planner.trends, SharedTrends)
+        assert second.planner.trends["T1"] == first.planner.trends["T1"] == (225 - 230.0, 236 - 230.0)
+        assert list(second.planner.trends) == ["T1"]
+        assert "T2" not in second.planner.trends
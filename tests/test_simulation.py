@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from studenttask.decision_log import StructuredLogger
+from studenttask.eSteps import eSteps
+from studenttask.simulation import FeederSimulator, daily_profiles
+from studenttask.StudentTask import StudentTask
+
+
+@pytest.fixture
+def student_task():
+    student_task = StudentTask()
+    student_task.structured_log = StructuredLogger(enabled=False)
+    return student_task
+
+
+@pytest.mark.unit
+class TestFeederSimulator:
+    def test_tap_follows_controller(self, student_task: StudentTask):
+        """Test that an undervoltage makes the controller switch up until the band is met"""
+        simulator = FeederSimulator(np.full(5, 0.6), np.zeros(5), task="1", load_drop=40)
+
+        result = simulator.run(student_task.calculate_control)
+
+        assert result.min_voltage[0] < 207
+        assert result.tap_position.tolist() == [0, 1, 1, 1, 1]
+        assert result.tap_operations == 1
+        assert result.band_violations == 1
+
+    def test_range_control_reduces_spreading(self, student_task: StudentTask):
+        """Test that range control lowers the factor and the violations compared to task 3"""
+        load, pv = (profile[::4] for profile in daily_profiles())
+
+        task_3 = FeederSimulator(load, pv, task="3").run(student_task.calculate_control)
+        task_4 = FeederSimulator(load, pv, task="4").run(student_task.calculate_control)
+
+        assert task_3.spreading_detected.any()
+        assert task_4.range_control_factor.min() < 1.0
+        assert task_4.safety_violations <= task_3.safety_violations
+
+    def test_custom_controller(self):
+        """Test that any callable with the calculate_control signature can be driven"""
+        simulator = FeederSimulator(np.zeros(3), np.zeros(3))
+        updates = []
+
+        def controller(update):
+            updates.append((update.get_current_tapchanger_position(), update.get_range_control_factor()))
+            return {"tapchanger_behavior": eSteps.SWITCHLOWER, "spreading_detected": False, "range_control_factor": 0.5}
+
+        result = simulator.run(controller)
+
+        assert updates == [(0, 1.0), (-1, 0.5), (-2, 0.5)]
+        assert result.tap_position.tolist() == [0, -1, -2]
@@ -0,0 +1,165 @@
+import struct
+
+import pytest
+
+from studenttask.fleet import DEFAULT_TRANSFORMER_ID, TransformerState
+from studenttask.snapshot import (
+    SNAPSHOT_VERSION,
+    SnapshotError,
+    SnapshotWriter,
+    decode_snapshot,
+    encode_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+VOLTAGES = [(215.0, 236.0), (221.0, 247.5), (226.0, 239.0), (219.5, 252.0), (230.0, 238.5)] * 7
+
+
+def drive(student_task: StudentTask, transformer_id: str, steps) -> list[dict]:
+    """Send a sequence of updates to one transformer, feeding back the range control factor"""
+    results = []
+    factor = 1.0
+    for min_voltage, max_voltage in steps:
+        result = student_task.calculate_transformer_control(
+            transformer_id,
+            make_update(
+                task="4",
+                min_street_voltage=min_voltage,
+                max_street_voltage=max_voltage,
+                current_rangecontrol_factor=factor,
+            ),
+        )
+        factor = result["range_control_factor"]
+        results.append(result)
+    return results
+
+
+class TornState(TransformerState):
+    """State changing during every copy, like one a busy request thread keeps updating"""
+
+    __slots__ = ("_reads",)
+
+    @property
+    def step_count(self) -> int:
+        self._reads += 1
+        return self._reads
+
+    @step_count.setter
+    def step_count(self, value: int) -> None:
+        self._reads = value
+
+
+@pytest.fixture
+def snapshot_task(monkeypatch, tmp_path):
+    """Configure StudentTask to snapshot into a temporary directory with decision caching"""
+    monkeypatch.setattr(StudentTask, "SNAPSHOT_PATH", str(tmp_path / "controller.snapshot"))
+    monkeypatch.setattr(StudentTask, "DECISION_CACHE_SIZE", 16)
+    return StudentTask
+
+
+@pytest.mark.unit
+class TestSnapshot:
+    def test_restart_continues_like_running_controller(self, snapshot_task):
+        """Test that a restored controller decides exactly like the one that kept running"""
+        running = snapshot_task()
+        for transformer_id in ("T1", "T2"):
+            drive(running, transformer_id, VOLTAGES[:20])
+        running.save_snapshot()
+
+        restored = snapshot_task()
+
+        for transformer_id in ("T1", "T2"):
+            before, after = running.fleet.get(transformer_id), restored.fleet.get(transformer_id)
+            assert after.step_count == before.step_count == 20
+            assert list(after.decision_counts) == list(before.decision_counts)
+            assert after.recent_range_factors() == before.recent_range_factors()
+            assert after.max_voltage_window.values() == before.max_voltage_window.values()
+            assert after.max_voltage_window.ewma == before.max_voltage_window.ewma
+            assert after.tap_model is before.tap_model
+            assert restored.decision_caches[transformer_id].entries() == running.decision_caches[transformer_id].entries()
+            assert drive(restored, transformer_id, VOLTAGES[20:]) == drive(running, transformer_id, VOLTAGES[20:])
+
+    def test_missing_snapshot_starts_cold(self, snapshot_task):
+        """Test that the controller starts empty without a snapshot file"""
+        student_task = snapshot_task()
+
+        assert not student_task.restore_snapshot()
+        assert len(student_task.fleet) == 0
+
+    def test_corrupt_snapshot_starts_cold(self, snapshot_task):
+        """Test that a damaged snapshot is ignored instead of restored partially"""
+        running = snapshot_task()
+        drive(running, DEFAULT_TRANSFORMER_ID, VOLTAGES)
+        running.save_snapshot()
+        with open(running.SNAPSHOT_PATH, "r+b") as file:
+            file.seek(-3, 2)
+            file.write(b"\xff\xff\xff")
+
+        restored = snapshot_task()
+
+        assert len(restored.fleet) == 0
+
+    def test_rejects_incompatible_snapshots(self, snapshot_task):
+        """Test that snapshots of another version, window length or truncated ones are rejected"""
+        running = snapshot_task()
+        drive(running, DEFAULT_TRANSFORMER_ID, VOLTAGES)
+        data = encode_snapshot(list(running.fleet), running.decision_caches, running.RANGE_CONTROL_WINDOW)
+
+        other_version = data[:4] + struct.pack("<I", SNAPSHOT_VERSION + 1) + data[8:]
+        with pytest.raises(SnapshotError, match="version"):
+            decode_snapshot(other_version, running.RANGE_CONTROL_WINDOW)
+        with pytest.raises(SnapshotError, match="window length"):
+            decode_snapshot(data, running.RANGE_CONTROL_WINDOW + 1)
+        with pytest.raises(SnapshotError):
+            decode_snapshot(data[:-10], running.RANGE_CONTROL_WINDOW)
+        with pytest.raises(SnapshotError):
+            decode_snapshot(b"not a snapshot at all, just text....", running.RANGE_CONTROL_WINDOW)
+
+    def test_ignores_caches_of_other_resolution(self, snapshot_task, monkeypatch):
+        """Test that cached decisions quantized with another resolution are not restored"""
+        running = snapshot_task()
+        drive(running, DEFAULT_TRANSFORMER_ID, VOLTAGES)
+        running.save_snapshot()
+        monkeypatch.setattr(StudentTask, "DECISION_CACHE_RESOLUTION", 0.5)
+
+        restored = snapshot_task()
+
+        assert restored.fleet.get(DEFAULT_TRANSFORMER_ID).step_count == len(VOLTAGES)
+        assert DEFAULT_TRANSFORMER_ID not in restored.decision_caches
+
+    def test_writer_saves_on_stop(self, tmp_path):
+        """Test that stopping the writer saves a final snapshot"""
+        path = tmp_path / "state" / "controller.snapshot"
+        writer = SnapshotWriter(lambda: write_snapshot(path, encode_snapshot([], {}, 16)), interval=60.0)
+
+        writer.start()
+        writer.stop()
+
+        assert read_snapshot(path, 16).states == []
+        assert [file.name for file in path.parent.iterdir()] == ["controller.snapshot"]
+
+    def test_skips_states_changing_during_every_copy(self):
+        """Test that a state that cannot be copied consistently is left out instead of written torn"""
+        skipped = []
+        states = [TransformerState("T1", 16), TornState("T2", 16)]
+
+        data = encode_snapshot(states, {}, 16, on_skip=skipped.append)
+
+        assert skipped == ["T2"]
+        assert [state.transformer_id for state in decode_snapshot(data, 16).states] == ["T1"]
+
+    def test_save_logs_states_not_fitting_the_layout(self, snapshot_task):
+        """Test that a transformer ID too long for its length field fails the save without raising"""
+        running = snapshot_task()
+        drive(running, DEFAULT_TRANSFORMER_ID, VOLTAGES[:2])
+        running.save_snapshot()
+        drive(running, "T" * 70000, VOLTAGES[:2])
+
+        running.save_snapshot()
+
+        assert [state.transformer_id for state in read_snapshot(running.SNAPSHOT_PATH, 16).states] == [
+            DEFAULT_TRANSFORMER_ID
+        ]
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestStreaming:
+    def test_frame_answered_like_post(self):
+        """Test that a streamed update gets the same decision as the POST endpoint"""
+        student_task = StudentTask()
+        client = TestClient(student_task.app)
+        body = make_update(task="2", max_street_voltage=239).model_dump_json()
+        expected = client.post("/calculateControl/", content=body).json()
+
+        with client.websocket_connect("/ws/calculateControl/") as websocket:
+            websocket.send_text(body)
+            assert json.loads(websocket.receive_text()) == expected
+
+    def test_pipelined_frames_answered_in_order(self):
+        """Test that frames sent without waiting are all answered in order"""
+        student_task = StudentTask()
+        client = TestClient(student_task.app)
+        voltages = [245, 230, 215] * 4
+
+        with client.websocket_connect("/fleet/T1/ws/calculateControl/") as websocket:
+            for voltage in voltages:
+                websocket.send_text(
+                    make_update(min_street_voltage=voltage, max_street_voltage=voltage).model_dump_json()
+                )
+            behaviors = [json.loads(websocket.receive_text())["tapchanger_behavior"] for _ in voltages]
+
+        assert behaviors == [0, 2, 1] * 4
+        assert student_task.fleet.get("T1").step_count == len(voltages)
+
+    def test_ndjson_frame_with_invalid_line(self):
+        """Test that every line of a frame is answered and invalid lines get an error detail"""
+        client = TestClient(StudentTask().app)
+        frame = "\n".join((make_update().model_dump_json(), "{}", make_update().model_dump_json()))
+
+        with client.websocket_connect("/ws/calculateControl/") as websocket:
+            websocket.send_bytes(frame.encode())
+            answers = [json.loads(line) for line in websocket.receive_text().splitlines()]
+
+        assert len(answers) == 3
+        assert answers[0]["tapchanger_behavior"] == answers[2]["tapchanger_behavior"] == 2
+        assert answers[1]["detail"][0]["type"] == "missing"
+
+    def test_undecidable_lines_keep_stream_open(self):
+        """Test that unknown tasks and invalid factor tables are answered with a detail line"""
+        student_task = StudentTask()
+        client = TestClient(student_task.app)
+        frame = "\n".join(
+            (
+                make_update(task="9").model_dump_json(),
+                make_update(tapchanger_voltage_factors={"-1": 1.0, "1": 0.9}).model_dump_json(),
+                make_update().model_dump_json(),
+            )
+        )
+
+        with client.websocket_connect("/fleet/T1/ws/calculateControl/") as websocket:
+            websocket.send_text(frame)
+            answers = [json.loads(line) for line in websocket.receive_text().splitlines()]
+            websocket.send_text(make_update().model_dump_json())
+            assert json.loads(websocket.receive_text())["tapchanger_behavior"] == 2
+
+        assert "Unknown task '9'" in answers[0]["detail"]
+        assert "detail" in answers[1]
+        assert answers[2]["tapchanger_behavior"] == 2
+        assert student_task.fleet.get("T1").step_count == 2
+
+    def test_unexpected_error_keeps_stream_open(self, monkeypatch):
+        """Test that a line failing unexpectedly is answered with a detail and the next line still decided"""
+        student_task = StudentTask()
+        decide_body = student_task._decide_body
+
+        def failing_decide_body(transformer_id, body, *args):
+            if '"task":"3"' in (body.decode() if isinstance(body, bytes) else body):
+                raise RuntimeError("bug")
+            return decide_body(transformer_id, body, *args)
+
+        monkeypatch.setattr(student_task, "_decide_body", failing_decide_body)
+        client = TestClient(student_task.app)
+
+        with client.websocket_connect("/ws/calculateControl/") as websocket:
+            websocket.send_text(make_update(task="3").model_dump_json())
+            failed = json.loads(websocket.receive_text())
+            websocket.send_text(make_update().model_dump_json())
+            decided = json.loads(websocket.receive_text())
+
+        assert failed == {"detail": "Internal error: RuntimeError"}
+        assert decided["tapchanger_behavior"] == 2
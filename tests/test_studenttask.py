@@ -1,9 +1,11 @@
 from unittest.mock import Mock
 
 import pytest
+from fastapi.testclient import TestClient
 
 from studenttask.eSteps import eSteps
 from studenttask.StudentTask import StudentTask
+from tests.helpers import make_update
 
 
 @pytest.mark.unit
@@ -178,3 +180,26 @@ class TestStudentTask:
         assert result["tapchanger_behavior"] == eSteps.STAY
         assert result["spreading_detected"] == True
         assert result["range_control_factor"] != 1.0
+
+    @pytest.mark.parametrize(
+        "factors", [{"0": 1.0, "1": 1.0}, {"0": 1.0, "2": 1.05}, {"zero": 1.0}]
+    )
+    def test_invalid_factor_table_rejected(self, student_task: StudentTask, factors: dict):
+        """Test that factor tables which are not a valid tap model are answered with 422"""
+        client = TestClient(student_task.app)
+        body = make_update(min_step_position=0, max_step_position=1, tapchanger_voltage_factors=factors)
+
+        for endpoint in ("/calculateControl/", "/calculateControlRaw/"):
+            result = client.post(endpoint, content=body.model_dump_json())
+
+            assert result.status_code == 422
+        assert client.post("/calculateControlBatch/", content=f"[{body.model_dump_json()}]").status_code == 422
+
+    def test_unknown_task_rejected(self, student_task: StudentTask):
+        """Test that an unknown task is answered with 422 and leaves the transformer state untouched"""
+        client = TestClient(student_task.app)
+        body = make_update(task="9").model_dump_json()
+
+        for endpoint in ("/calculateControl/", "/calculateControlRaw/", "/fleet/T1/calculateControl/"):
+            assert client.post(endpoint, content=body).status_code == 422
+        assert student_task.fleet.get("T1").step_count == 0
@@ -0,0 +1,72 @@
+import pytest
+
+from studenttask.eSteps import eSteps
+from studenttask.StudentTask import StudentTask
+from studenttask.sweep import ResultWriter, SweepConfig, SweepResult, load_results, run_sweep, sample_configs
+from tests.helpers import make_update
+
+
+@pytest.mark.unit
+class TestSweep:
+    def test_grid_and_lhs_sampling(self):
+        """Test grid size and that Latin hypercube samples hit every stratum once"""
+        grid = sample_configs("grid", 3, safety_choices=(True,), window_range=(1, 5))
+        lhs = sample_configs("lhs", 8, modifier_range=(0.0, 1.0), safety_choices=(True, False))
+
+        assert len(grid) == 27
+        assert sorted({c.range_control_window for c in grid}) == [1, 3, 5]
+        assert len(lhs) == 16
+        strata = sorted(int(c.range_control_modifier * 8) for c in lhs if c.use_safety_limits)
+        assert strata == list(range(8))
+        assert all(isinstance(c.range_control_window, int) for c in lhs)
+
+    def test_unknown_method(self):
+        """Test that unknown sampling methods are rejected"""
+        with pytest.raises(ValueError):
+            sample_configs("sobol", 4)
+
+    def test_run_streams_chunks(self, tmp_path):
+        """Test that results are written chunk by chunk and read back completely"""
+        configs = [SweepConfig(0.1, 0.5, True, 16), SweepConfig(0.1, 0.5, False, 4)]
+
+        with ResultWriter(tmp_path, configs, chunk_size=3) as writer:
+            for result in run_sweep(configs, scenarios=2, steps=2000, workers=1):
+                writer.append(result)
+            assert len(list(tmp_path.glob("chunk-*.npz"))) == 1
+        saved = load_results(tmp_path)
+
+        assert len(writer) == 4
+        assert len(list(tmp_path.glob("chunk-*.npz"))) == 2
+        assert sorted(saved["config_index"].tolist()) == [0, 0, 1, 1]
+        assert saved["use_safety_limits"].tolist() == [True, False]
+        assert saved["range_control_window"].tolist() == [16, 4]
+
+    def test_rank_orders_by_band_violations_then_tap_operations(self, tmp_path):
+        """Test that the ranking counts band violations only, then tap operations"""
+        configs = [SweepConfig(0.1, 0.5, True, 16), SweepConfig(0.2, 0.5, True, 16), SweepConfig(0.3, 0.5, True, 16)]
+        writer = ResultWriter(tmp_path, configs)
+        for result in (
+            SweepResult(0, 0, 5, 5, 1, 0),
+            SweepResult(1, 0, 1, 9, 9, 0),
+            SweepResult(2, 0, 1, 0, 3, 0),
+        ):
+            writer.append(result)
+
+        ranked = writer.rank()
+
+        assert [r.config.range_control_modifier for r in ranked] == [0.3, 0.2, 0.1]
+        assert ranked[0].band_violations == 1 and ranked[0].tap_operations == 3
+
+    def test_band_limits_setting(self, monkeypatch):
+        """Test that RANGE_CONTROL_LIMITS=band makes the safety tasks act on the band"""
+        update = make_update(task="2", max_street_voltage=239.0, min_street_voltage=225.0)
+        safety = StudentTask()
+        monkeypatch.setattr(StudentTask, "RANGE_CONTROL_LIMITS", "band")
+        band = StudentTask()
+
+        assert safety.calculate_control(update)["tapchanger_behavior"] == eSteps.SWITCHLOWER
+        assert band.calculate_control(update)["tapchanger_behavior"] == eSteps.STAY
+        assert band.calculate_control_batch([update])[0]["tapchanger_behavior"] == eSteps.STAY
+        monkeypatch.setattr(StudentTask, "RANGE_CONTROL_LIMITS", "both")
+        with pytest.raises(ValueError):
+            StudentTask()
@@ -0,0 +1,56 @@
+import pytest
+
+from studenttask.tap_model import TapModel, get_tap_model
+
+# 17 position on-load tap changer with 1.25 % per step
+OLTC_FACTORS = {str(pos): 1.0 + pos * 0.0125 for pos in range(-8, 9)}
+
+
+@pytest.mark.unit
+class TestTapModel:
+    def test_delta_lookup(self):
+        """Test that deltas use the sent factors and nominal voltage"""
+        model = get_tap_model(OLTC_FACTORS, 400)
+
+        assert len(model) == 17
+        assert model.delta(0, 1) == pytest.approx(-5.0)
+        assert model.delta(8, -8) == pytest.approx(80.0)
+        assert model.neighbour_deltas(8, -8, 8) == (0.0, pytest.approx(5.0))
+
+    def test_cached_per_configuration(self):
+        """Test that equal factor tables share one model and different ones do not"""
+        assert get_tap_model(dict(OLTC_FACTORS), 400) is get_tap_model(dict(OLTC_FACTORS), 400)
+        assert get_tap_model(OLTC_FACTORS, 400) is not get_tap_model(OLTC_FACTORS, 230)
+
+    def test_cache_ignores_key_order_and_type(self):
+        """Test that tables differing only in key order or key type share one model"""
+        reordered = dict(reversed(list(OLTC_FACTORS.items())))
+        integer_keys = {int(position): factor for position, factor in OLTC_FACTORS.items()}
+
+        assert get_tap_model(reordered, 400) is get_tap_model(OLTC_FACTORS, 400)
+        assert get_tap_model(integer_keys, 400) is get_tap_model(OLTC_FACTORS, 400)
+
+    def test_steps_for_shift(self):
+        """Test the binary search for the number of steps clearing a violation"""
+        model = get_tap_model(OLTC_FACTORS, 400)
+
+        assert model.steps_for_shift(0, 5.0) == 1
+        assert model.steps_for_shift(0, 5.1) == 2
+        assert model.steps_for_shift(0, -12.0) == -3
+        assert model.steps_for_shift(6, 20.0) is None
+        assert model.steps_for_shift(0, 0.0) == 0
+
+    def test_descending_factors(self):
+        """Test that tables with factors decreasing over the positions are supported"""
+        model = TapModel({1: 1.05, 2: 1.025, 3: 1.0, 4: 0.975, 5: 0.95}, 230)
+
+        assert model.steps_for_shift(3, 5.0) == -1
+        assert model.steps_for_shift(3, -10.0) == 2
+
+    @pytest.mark.parametrize(
+        "factors", [{}, {0: 1.0, 2: 1.02}, {0: 1.0, 1: 1.02, 2: 1.01}]
+    )
+    def test_invalid_tables_rejected(self, factors):
+        """Test that empty, sparse and non-monotonic tables are rejected"""
+        with pytest.raises(ValueError):
+            TapModel(factors, 230)
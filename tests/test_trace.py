@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from studenttask.control import ControlDecision
+from studenttask.eSteps import eSteps
+from studenttask.shared_state import transformer_key
+from studenttask.StudentTask import StudentTask
+from studenttask.trace import TRACE_DTYPE, TraceWriter, open_trace, trace_files
+from tests.helpers import make_update
+
+
+def append_steps(writer: TraceWriter, count: int) -> None:
+    """Append count decisions with the step number as tap position"""
+    for step in range(count):
+        decision = ControlDecision(eSteps.SWITCHHIGHER, step % 2 == 0, 0.5, 222, 238, -1)
+        writer.append("T1", "4", step, 215.0, 236.0, 0.6, decision, 1e-5, 1000.0 + step)
+
+
+@pytest.mark.unit
+class TestTrace:
+    def test_records_round_trip(self, tmp_path):
+        """Test that appended records are read back field by field"""
+        writer = TraceWriter(tmp_path, records_per_file=8)
+        append_steps(writer, 3)
+
+        records = open_trace(writer.files[0])
+
+        assert records.dtype == TRACE_DTYPE and TRACE_DTYPE.itemsize == 64
+        assert len(records) == 3
+        assert list(records["tap"]) == [0, 1, 2]
+        assert list(records["spreading"]) == [True, False, True]
+        assert np.all(records["transformer"] == transformer_key("T1"))
+        assert np.all(records["behavior"] == eSteps.SWITCHHIGHER.value)
+        assert np.all(records["violation"] == -1)
+        assert records["task"][0] == 4 and records["range_factor"][0] == 0.5
+
+    def test_reader_maps_without_copy(self, tmp_path):
+        """Test that the reader returns a read-only view of the file and sees later appends"""
+        writer = TraceWriter(tmp_path, records_per_file=8)
+        append_steps(writer, 2)
+
+        records = open_trace(writer.files[0])
+        append_steps(writer, 1)
+
+        assert isinstance(records, np.memmap) and not records.flags.writeable
+        assert len(open_trace(writer.files[0])) == 3
+
+    def test_rotation_keeps_newest_files(self, tmp_path):
+        """Test that full files are rotated and the oldest ones deleted"""
+        writer = TraceWriter(tmp_path, records_per_file=4, max_files=2)
+        append_steps(writer, 10)
+
+        files = trace_files(tmp_path)
+
+        assert writer.records == 10
+        assert files == writer.files and len(files) == 2
+        assert [len(open_trace(path)) for path in files] == [4, 2]
+        assert list(open_trace(files[-1])["tap"]) == [8, 9]
+
+    def test_student_task_traces_decisions(self, tmp_path, monkeypatch):
+        """Test that the service appends one record per decision when tracing is enabled"""
+        monkeypatch.setattr(StudentTask, "TRACE_DIR", str(tmp_path))
+        student_task = StudentTask()
+
+        student_task.calculate_control(make_update(task="4", min_street_voltage=215, max_street_voltage=236))
+        result = student_task.calculate_control(make_update(task="4", current_tapchanger_position=1))
+
+        records = open_trace(student_task.trace.files[0])
+        assert list(records["tap"]) == [0, 1]
+        assert records["behavior"][-1] == result["tapchanger_behavior"].value
+        assert np.all(records["latency"] > 0)